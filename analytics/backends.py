@@ -0,0 +1,250 @@
+# analytics/backends.py
+
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from analytics.cube import CUBE_TABLES, build_cube, cube_kpis, cube_table, slice_cube
+from analytics.kpis import (
+    DIMENSION_TABLES, MONTHLY_COLUMNS, SEGMENT_COLUMNS, add_growth_columns, sort_dimension_table
+)
+from config.settings import BACKEND_CONFIG
+
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:  # duckdb é opcional: sem ele só o backend pandas fica disponível
+    duckdb = None
+    DUCKDB_AVAILABLE = False
+
+class PandasBackend:
+    """Padrão: cubo pré-agregado em memória, fatiado a cada filtro"""
+
+    name = 'pandas'
+    artifact = 'cube'  # nome na sessão (o append incremental atualiza o cubo no lugar)
+
+    def prepare(self, df: pd.DataFrame) -> dict:
+        return build_cube(df)
+
+    def kpis(self, cube: dict, start_date, end_date, states=None, tables=None) -> dict:
+        return cube_kpis(slice_cube(cube, start_date, end_date, states), tables=tables)
+
+    def table(self, cube: dict, start_date, end_date, states, key: str):
+        return cube_table(slice_cube(cube, start_date, end_date, states), key)
+
+class DuckDBSource:
+    """Conexão DuckDB com a view 'orders' sobre o dataset (dataframe ou arquivo Parquet)"""
+
+    def __init__(self, con, columns: list, states: set, has_null_state: bool):
+        self.con = con
+        self.columns = columns
+        self.states = states
+        self.has_null_state = has_null_state
+        # Uma conexão DuckDB não deve ser usada por duas threads ao mesmo tempo
+        self.lock = threading.Lock()
+
+class DuckDBBackend:
+    """
+    Mesmas consultas dos KPIs, abas e insights em SQL no DuckDB (embutido,
+    colunar, multi-thread e com spill em disco). Lê o dataframe da sessão
+    sem cópia ou um Parquet direto do disco.
+    """
+
+    name = 'duckdb'
+    artifact = 'duckdb_source'
+
+    @staticmethod
+    def version() -> str:
+        return duckdb.__version__
+
+    def __init__(self, threads: int = None):
+        if not DUCKDB_AVAILABLE:
+            raise RuntimeError("duckdb não está instalado (pip install duckdb)")
+        self.threads = threads or BACKEND_CONFIG['threads']
+
+    def _connect(self):
+        con = duckdb.connect()
+        if self.threads:
+            con.execute(f"SET threads = {int(self.threads)}")
+        if BACKEND_CONFIG['memory_limit']:
+            con.execute(f"SET memory_limit = '{BACKEND_CONFIG['memory_limit']}'")
+        temp_dir = Path(BACKEND_CONFIG['temp_directory'])
+        temp_dir.mkdir(parents=True, exist_ok=True)
+        con.execute(f"SET temp_directory = '{_quote(str(temp_dir))}'")
+        return con
+
+    def prepare(self, source) -> DuckDBSource:
+        """source: dataframe processado ou caminho de um Parquet com as mesmas colunas"""
+        con = self._connect()
+        if isinstance(source, pd.DataFrame):
+            con.register('orders', source)
+        else:
+            con.execute(f"CREATE VIEW orders AS SELECT * FROM read_parquet('{_quote(str(source))}')")
+        columns = [row[0] for row in con.execute("DESCRIBE orders").fetchall()]
+        states = set()
+        if 'customer_state' in columns:
+            states = {row[0] for row in con.execute(
+                "SELECT DISTINCT CAST(customer_state AS VARCHAR) FROM orders WHERE customer_state IS NOT NULL"
+            ).fetchall()}
+        has_null_state = 'customer_state' in columns and con.execute(
+            "SELECT count(*) FROM orders WHERE customer_state IS NULL"
+        ).fetchone()[0] > 0
+        return DuckDBSource(con, columns, states, has_null_state)
+
+    def _filter(self, source: DuckDBSource, start_date, end_date, states):
+        """WHERE e parâmetros do filtro, com a mesma regra do cubo (dia inteiro, estados)"""
+        where = ["CAST(order_date AS DATE) BETWEEN ? AND ?"]
+        params = [pd.Timestamp(start_date).date(), pd.Timestamp(end_date).date()]
+        covers_all = not source.has_null_state and source.states.issubset(states or [])
+        if states and 'customer_state' in source.columns and not covers_all:
+            where.append("list_contains(?, CAST(customer_state AS VARCHAR))")
+            params.append([str(s) for s in states])
+        return ' AND '.join(where), params
+
+    def _measures(self, source: DuckDBSource) -> dict:
+        """Expressões SQL das medidas (sem order_id/customer_id cada linha conta uma vez)"""
+        columns = source.columns
+        return {
+            'revenue': "coalesce(sum(total_value), 0)" if 'total_value' in columns else "0.0",
+            'items': "CAST(coalesce(sum(quantity), 0) AS BIGINT)" if 'quantity' in columns else "count(*)",
+            'orders': "count(DISTINCT order_id)" if 'order_id' in columns else "count(*)",
+            'customers': "count(DISTINCT customer_id)" if 'customer_id' in columns else "count(*)",
+            'ticket_revenue': (
+                "coalesce(sum(total_value) FILTER (WHERE order_id IS NOT NULL), 0)"
+                if 'order_id' in columns else "coalesce(sum(total_value), 0)"
+            )
+        }
+
+    def _query(self, source: DuckDBSource, sql: str, params: list) -> pd.DataFrame:
+        with source.lock:
+            return source.con.execute(sql, params).df()
+
+    def _monthly(self, source, where, params) -> pd.DataFrame:
+        m = self._measures(source)
+        monthly = self._query(source, f"""
+            SELECT strftime(CAST(order_date AS DATE), '%Y-%m') AS period,
+                   {m['orders']} AS orders, {m['revenue']} AS revenue,
+                   {m['customers']} AS customers, {m['items']} AS items
+            FROM orders WHERE {where} GROUP BY 1 ORDER BY 1
+        """, params)
+        if len(monthly) == 0:
+            return pd.DataFrame(columns=MONTHLY_COLUMNS)
+        monthly = monthly.astype({'orders': 'int64', 'revenue': 'float64', 'customers': 'int64', 'items': 'int64'})
+        return add_growth_columns(monthly).reset_index(drop=True)
+
+    def table(self, source: DuckDBSource, start_date, end_date, states, key: str):
+        where, params = self._filter(source, start_date, end_date, states)
+        m = self._measures(source)
+        if key == 'daily':
+            daily = self._query(source, f"""
+                SELECT CAST(order_date AS DATE) AS order_date, {m['revenue']} AS revenue, {m['orders']} AS orders
+                FROM orders WHERE {where} GROUP BY 1 ORDER BY 1
+            """, params)
+            daily['order_date'] = pd.to_datetime(daily['order_date']).dt.date
+            return daily.astype({'revenue': 'float64', 'orders': 'int64'})
+        if key == 'segment_monthly':
+            return self._segment_monthly(source, where, params)
+        for column, table_key in DIMENSION_TABLES.items():
+            if table_key == key and column in source.columns:
+                table = self._query(source, f"""
+                    SELECT CAST({column} AS VARCHAR) AS {column}, {m['revenue']} AS revenue,
+                           {m['orders']} AS orders, {m['items']} AS qty
+                    FROM orders WHERE {where} AND {column} IS NOT NULL GROUP BY 1 ORDER BY 1
+                """, params)
+                return sort_dimension_table(table.astype({'revenue': 'float64', 'orders': 'int64', 'qty': 'int64'}), column)
+        return None
+
+    def _segment_monthly(self, source, where, params) -> pd.DataFrame:
+        """Receita por (dimensão, segmento, mês) de todas as dimensões numa consulta só"""
+        m = self._measures(source)
+        columns = [c for c in DIMENSION_TABLES if c in source.columns]
+        if not columns:
+            return pd.DataFrame(columns=SEGMENT_COLUMNS)
+        parts = [f"""
+            SELECT '{column}' AS dimension, CAST({column} AS VARCHAR) AS segment,
+                   strftime(CAST(order_date AS DATE), '%Y-%m') AS period, {m['revenue']} AS revenue
+            FROM orders WHERE {where} AND {column} IS NOT NULL GROUP BY 1, 2, 3
+        """ for column in columns]
+        table = self._query(source, ' UNION ALL '.join(parts) + " ORDER BY 1, 2, 3", params * len(parts))
+        return table.astype({'revenue': 'float64'})
+
+    def kpis(self, source: DuckDBSource, start_date, end_date, states=None, tables=None) -> dict:
+        where, params = self._filter(source, start_date, end_date, states)
+        m = self._measures(source)
+        with source.lock:
+            totals = source.con.execute(f"""
+                SELECT count(*), {m['revenue']}, {m['items']}, {m['orders']}, {m['customers']},
+                       {m['ticket_revenue']}, min(CAST(order_date AS DATE)), max(CAST(order_date AS DATE))
+                FROM orders WHERE {where}
+            """, params).fetchone()
+        rows, revenue, items, orders, customers, ticket_revenue, min_date, max_date = totals
+
+        kpis = {
+            'total_orders': int(orders),
+            'total_revenue': float(revenue),
+            'total_customers': int(customers),
+            'total_items': int(items),
+            'avg_ticket': float(ticket_revenue) / orders if orders > 0 else 0.0,
+            'monthly': self._monthly(source, where, params),
+            'rows': int(rows),
+            'min_date': pd.Timestamp(min_date) if min_date is not None else None,
+            'max_date': pd.Timestamp(max_date) if max_date is not None else None
+        }
+        for key in (CUBE_TABLES if tables is None else tables):
+            table = self.table(source, start_date, end_date, states, key)
+            if table is not None:
+                kpis[key] = table
+        return kpis
+
+def _quote(text: str) -> str:
+    """Literal de string SQL (aspas simples duplicadas)"""
+    return text.replace("'", "''")
+
+_BACKENDS = {}
+
+def get_backend(name: str = None):
+    """Backend configurado (BACKEND_CONFIG['engine']); sem duckdb instalado, volta ao pandas"""
+    name = name or BACKEND_CONFIG['engine']
+    if name not in _BACKENDS:
+        if name == 'duckdb' and DUCKDB_AVAILABLE:
+            _BACKENDS[name] = DuckDBBackend()
+        else:
+            if name != 'pandas':
+                print(f"Aviso: backend '{name}' indisponível, usando pandas")
+            _BACKENDS[name] = PandasBackend()
+    return _BACKENDS[name]
+
+def kpis_differences(expected: dict, actual: dict, rtol: float = 1e-9) -> list:
+    """
+    Diferenças entre dois dicionários de KPIs (totais e tabelas). Contagens
+    precisam ser iguais; somas de receita toleram só o arredondamento da ordem
+    de soma, que muda entre engines.
+    """
+    differences = []
+    for key, value in expected.items():
+        if key not in actual:
+            differences.append(f"{key}: ausente")
+            continue
+        other = actual[key]
+        if isinstance(value, pd.DataFrame):
+            if list(value.columns) != list(other.columns) or len(value) != len(other):
+                differences.append(f"{key}: formato {value.shape} != {other.shape}")
+                continue
+            for column in value.columns:
+                a = value[column].reset_index(drop=True)
+                b = other[column].reset_index(drop=True)
+                if pd.api.types.is_float_dtype(a) or pd.api.types.is_float_dtype(b):
+                    equal = np.allclose(a.to_numpy(dtype='float64'), b.to_numpy(dtype='float64'),
+                                        rtol=rtol, atol=1e-6, equal_nan=True)
+                else:
+                    equal = a.astype(str).equals(b.astype(str))
+                if not equal:
+                    differences.append(f"{key}.{column}: valores diferentes")
+        elif isinstance(value, float):
+            if not np.isclose(value, other, rtol=rtol, atol=1e-6):
+                differences.append(f"{key}: {value!r} != {other!r}")
+        elif value != other:
+            differences.append(f"{key}: {value!r} != {other!r}")
+    return differences
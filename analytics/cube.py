@@ -0,0 +1,311 @@
+# analytics/cube.py
+
+import pandas as pd
+import numpy as np
+
+from analytics.hll import build_sketch, count_distinct, relative_error
+from analytics.kpis import (
+    DIMENSION_TABLES, MONTHLY_COLUMNS, add_growth_columns, segment_table, sort_dimension_table
+)
+from config.settings import HLL_CONFIG
+from utils.date_index import DateStateIndex, sort_by_date
+
+# Grão do cubo: dia x estado x categoria x pagamento (as que existirem no dataset)
+CUBE_DIMENSIONS = ['customer_state', 'product_category', 'payment_method']
+
+def build_cube(df: pd.DataFrame, approximate: bool = None, order_detail: bool = False) -> dict:
+    """
+    Pré-agrega o dataset processado no grão (dia, estado, categoria, pagamento).
+
+    Medidas aditivas (receita, itens, linhas) ficam em 'cells'. Contagens
+    distintas não somam entre células, então:
+    - pedidos: se cada order_id cai numa única célula, a contagem por célula
+      é aditiva; senão usa a ponte 'order_bridge' (célula x pedido, sem repetição);
+    - clientes: ponte 'customer_bridge' no grão (dia, estado, cliente), que é
+      tudo o que os filtros e a tabela mensal precisam.
+
+    Com approximate (padrão: HLL_CONFIG['enabled']) as pontes viram sketches
+    HyperLogLog esparsos no mesmo grão ('order_sketch'/'customer_sketch'):
+    filtrar mescla registradores em vez de contar IDs.
+
+    order_detail força a ponte/sketch de pedidos mesmo com contagem aditiva
+    (necessário para mesclar o cubo de um delta num cubo não aditivo).
+    """
+    if approximate is None:
+        approximate = HLL_CONFIG['enabled']
+    precision = HLL_CONFIG['precision']
+    dims = [c for c in CUBE_DIMENSIONS if c in df.columns]
+    keys = ['date', 'period'] + dims
+
+    frame = pd.DataFrame({'date': df['order_date'].dt.normalize()})
+    # O mês vai junto em cada tabela para a série mensal não recalcular períodos
+    frame['period'] = frame['date'].dt.to_period('M').astype(str).astype('category')
+    for col in dims:
+        frame[col] = df[col]
+    frame['revenue'] = df['total_value'].fillna(0)
+    frame['items'] = df['quantity'] if 'quantity' in df.columns else 1
+
+    # Sem order_id/customer_id o calculate_kpis conta um pedido/cliente por linha
+    has_orders = 'order_id' in df.columns
+    has_customers = 'customer_id' in df.columns
+    if has_orders:
+        frame['order_id'] = df['order_id']
+        frame['ticket_revenue'] = frame['revenue'].where(df['order_id'].notna(), 0.0)
+    else:
+        frame['ticket_revenue'] = frame['revenue']
+    if has_customers:
+        frame['customer_id'] = df['customer_id']
+
+    grouped = frame.groupby(keys, observed=True, dropna=False, sort=True)
+    cells = grouped.agg(
+        revenue=('revenue', 'sum'),
+        ticket_revenue=('ticket_revenue', 'sum'),
+        items=('items', 'sum'),
+        rows=('revenue', 'size')
+    )
+
+    order_bridge = None
+    order_sketch = None
+    if has_orders:
+        cells['orders'] = grouped['order_id'].nunique()
+        orders_additive = int(cells['orders'].sum()) == int(df['order_id'].nunique())
+        if (not orders_additive or order_detail) and approximate:
+            order_sketch = _sketch(frame, keys, 'order_id', precision)
+        elif not orders_additive or order_detail:
+            order_bridge = frame[keys + ['order_id']].dropna(subset=['order_id']).drop_duplicates()
+            order_bridge = sort_by_date(order_bridge.reset_index(drop=True), 'date')
+    else:
+        cells['orders'] = cells['rows']
+        orders_additive = True
+
+    customer_bridge = None
+    customer_sketch = None
+    if has_customers:
+        customer_keys = ['date', 'period'] + (['customer_state'] if 'customer_state' in dims else [])
+        if approximate:
+            customer_sketch = _sketch(frame, customer_keys, 'customer_id', precision)
+        else:
+            customer_bridge = frame[customer_keys + ['customer_id']].dropna(subset=['customer_id']).drop_duplicates()
+            customer_bridge = sort_by_date(customer_bridge.reset_index(drop=True), 'date')
+
+    cube = {
+        'cells': cells.reset_index(),
+        'dimensions': dims,
+        'orders_additive': orders_additive,
+        'order_bridge': order_bridge,
+        'customer_bridge': customer_bridge,
+        'order_sketch': order_sketch,
+        'customer_sketch': customer_sketch,
+        'approximate': approximate,
+        'precision': precision
+    }
+    # Todas as tabelas estão ordenadas por data: o filtro vira busca binária
+    cube['indexes'] = {
+        name: DateStateIndex(cube[name], date_col='date')
+        for name in TABLES if cube[name] is not None
+    }
+    return cube
+
+TABLES = ['cells', 'order_bridge', 'customer_bridge', 'order_sketch', 'customer_sketch']
+
+def _sketch(frame: pd.DataFrame, keys: list, id_col: str, precision: int) -> pd.DataFrame:
+    """Sketch HLL dos IDs não nulos no grão das chaves (ordenado por data, como as pontes)"""
+    frame = frame[frame[id_col].notna()]
+    return build_sketch(frame, keys, pd.util.hash_array(frame[id_col].to_numpy()), precision)
+
+# Como combinar linhas de mesma chave vindas do cubo e do delta
+_MERGE_RULES = {
+    'cells': 'sum',
+    'order_bridge': 'distinct',
+    'customer_bridge': 'distinct',
+    'order_sketch': 'max',
+    'customer_sketch': 'max'
+}
+
+def _align_categories(old: pd.DataFrame, new: pd.DataFrame):
+    """Mesmas categorias nas duas tabelas (as novas entram no fim; códigos antigos não mudam)"""
+    old = old.copy(deep=False)
+    new = new.copy(deep=False)
+    for col in old.columns:
+        if isinstance(old[col].dtype, pd.CategoricalDtype) and col in new.columns:
+            categories = old[col].cat.categories
+            extra = pd.Index(np.asarray(new[col].dropna().unique())).difference(categories)
+            if len(extra):
+                # Um mês anterior ao histórico reordena os períodos
+                sort = col == 'period' and len(categories) > 0 and extra.min() < categories.max()
+                old[col] = old[col].cat.add_categories(extra)
+                if sort:
+                    old[col] = old[col].cat.reorder_categories(sorted(old[col].cat.categories))
+            new[col] = pd.Categorical(new[col], categories=old[col].cat.categories)
+    return old, new
+
+def _merge_table(name: str, old: pd.DataFrame, new: pd.DataFrame, index: DateStateIndex):
+    """
+    Junta a tabela do delta à do cubo. Só as linhas do cubo a partir da primeira
+    data do delta podem ter a mesma chave: esse trecho é recombinado e o resto
+    é mantido como está. Retorna (tabela, posição a partir da qual mudou).
+    """
+    old, new = _align_categories(old, new)
+    if len(new) == 0:
+        return old, len(old)
+    start = index.date_bounds(new['date'].iloc[0], new['date'].iloc[0])[0]
+    tail = pd.concat([old.iloc[start:], new], ignore_index=True)
+
+    rule = _MERGE_RULES[name]
+    if rule == 'distinct':
+        tail = tail.drop_duplicates()
+        tail = tail.sort_values('date', kind='mergesort')
+    else:
+        keys = [c for c in tail.columns if c in ['date', 'period', 'reg'] + CUBE_DIMENSIONS]
+        grouped = tail.groupby(keys, observed=True, dropna=False, sort=True)
+        tail = grouped.sum() if rule == 'sum' else grouped['rho'].max()
+        tail = tail.reset_index()[old.columns]
+    return pd.concat([old.iloc[:start], tail], ignore_index=True), start
+
+def merge_cubes(cube: dict, delta: pd.DataFrame) -> dict:
+    """
+    Cubo do dataset com as linhas do delta, sem reprocessar o histórico.
+    O delta não pode repetir pedidos do cubo (ver append_dataframe): então
+    somas e contagens por célula se somam e pontes/sketches só se juntam.
+    Custo proporcional ao delta (mais os dias do histórico que ele alcança).
+    ValueError se o delta exige detalhe de pedidos que o cubo não guardou.
+    """
+    delta_cube = build_cube(delta, approximate=cube['approximate'],
+                            order_detail=not cube['orders_additive'])
+    if cube['orders_additive'] and not delta_cube['orders_additive']:
+        raise ValueError("O delta tem pedidos em várias células: reconstrua o cubo")
+    if delta_cube['dimensions'] != cube['dimensions']:
+        raise ValueError("O delta não tem as mesmas dimensões do cubo")
+
+    merged = dict(cube, indexes={})
+    for name in TABLES:
+        if cube[name] is None:
+            continue
+        table, start = _merge_table(name, cube[name], delta_cube[name], cube['indexes'][name])
+        merged[name] = table
+        merged['indexes'][name] = cube['indexes'][name].extend(table, start)
+    return merged
+
+def slice_cube(cube: dict, start_date, end_date, states=None) -> dict:
+    """Aplica o filtro de período e estados às células e às pontes do cubo"""
+    sliced = dict(cube, indexes={})
+    for name, index in cube['indexes'].items():
+        sliced[name] = index.filter(cube[name], start_date, end_date, states)
+    return sliced
+
+def _distinct_orders(cube: dict, by=None):
+    """Pedidos distintos no total ou agrupados por uma coluna do cubo"""
+    if cube['orders_additive']:
+        cells = cube['cells']
+        if by is None:
+            return int(cells['orders'].sum())
+        return cells.groupby(by, observed=True)['orders'].sum()
+    if cube['order_sketch'] is not None:
+        return count_distinct(cube['order_sketch'], cube['precision'], by)
+    bridge = cube['order_bridge']
+    if by is None:
+        return int(bridge['order_id'].nunique())
+    return bridge.groupby(by, observed=True)['order_id'].nunique()
+
+def _distinct_customers(cube: dict, by=None):
+    if cube['customer_sketch'] is not None:
+        return count_distinct(cube['customer_sketch'], cube['precision'], by)
+    bridge = cube['customer_bridge']
+    if bridge is None:
+        # Sem customer_id: um cliente por linha
+        cells = cube['cells']
+        if by is None:
+            return int(cells['rows'].sum())
+        return cells.groupby(by, observed=True)['rows'].sum()
+    if by is None:
+        return int(bridge['customer_id'].nunique())
+    return bridge.groupby(by, observed=True)['customer_id'].nunique()
+
+def _monthly(cube: dict) -> pd.DataFrame:
+    cells = cube['cells']
+    if len(cells) == 0:
+        return pd.DataFrame(columns=MONTHLY_COLUMNS)
+    sums = cells.groupby('period', observed=True).agg(revenue=('revenue', 'sum'), items=('items', 'sum'))
+    monthly = pd.DataFrame({
+        'period': sums.index.astype(str),
+        'orders': _distinct_orders(cube, 'period').reindex(sums.index, fill_value=0).astype('int64').to_numpy(),
+        'revenue': sums['revenue'].to_numpy(),
+        'customers': _distinct_customers(cube, 'period').reindex(sums.index, fill_value=0).astype('int64').to_numpy(),
+        'items': sums['items'].astype('int64').to_numpy()
+    })
+    return add_growth_columns(monthly).reset_index(drop=True)
+
+def _daily(cube: dict) -> pd.DataFrame:
+    cells = cube['cells']
+    sums = cells.groupby('date')['revenue'].sum()
+    orders = _distinct_orders(cube, 'date').reindex(sums.index, fill_value=0)
+    return pd.DataFrame({
+        'order_date': sums.index.date,
+        'revenue': sums.to_numpy(),
+        'orders': orders.astype('int64').to_numpy()
+    })
+
+def dimension_table(cube: dict, column: str) -> pd.DataFrame:
+    """Receita, pedidos distintos e quantidade por valor da dimensão"""
+    cells = cube['cells']
+    sums = cells.groupby(column, observed=True).agg(revenue=('revenue', 'sum'), qty=('items', 'sum'))
+    table = pd.DataFrame({
+        column: sums.index,
+        'revenue': sums['revenue'].to_numpy(),
+        'orders': _distinct_orders(cube, column).reindex(sums.index, fill_value=0).astype('int64').to_numpy(),
+        'qty': sums['qty'].astype('int64').to_numpy()
+    })
+    return sort_dimension_table(table, column)
+
+def segment_monthly(cube: dict) -> pd.DataFrame:
+    """Receita por (dimensão, segmento, mês): um groupby por dimensão sobre as células"""
+    cells = cube['cells']
+    return segment_table({
+        column: cells.groupby([column, 'period'], observed=True)['revenue'].sum()
+        for column in DIMENSION_TABLES if column in cube['dimensions']
+    })
+
+# Tabelas opcionais de cube_kpis (as abas e os insights pedem sob demanda via cube_table)
+CUBE_TABLES = ['daily'] + list(DIMENSION_TABLES.values()) + ['segment_monthly']
+
+def cube_table(cube: dict, key: str):
+    """Tabela 'daily', 'segment_monthly' ou de uma dimensão ('by_category'...); None se a dimensão não existe"""
+    if key == 'daily':
+        return _daily(cube)
+    if key == 'segment_monthly':
+        return segment_monthly(cube)
+    for column, table_key in DIMENSION_TABLES.items():
+        if table_key == key and column in cube['dimensions']:
+            return dimension_table(cube, column)
+    return None
+
+def cube_kpis(cube: dict, tables=None) -> dict:
+    """
+    KPIs no formato de calculate_kpis (sem 'df'), mais as tabelas diária e por
+    dimensão listadas em tables (padrão: todas de CUBE_TABLES)
+    """
+    cells = cube['cells']
+    total_orders = _distinct_orders(cube)
+    ticket_revenue = float(cells['ticket_revenue'].sum())
+
+    kpis = {
+        'total_orders': total_orders,
+        'total_revenue': float(cells['revenue'].sum()),
+        'total_customers': _distinct_customers(cube),
+        'total_items': int(cells['items'].sum()),
+        'avg_ticket': ticket_revenue / total_orders if total_orders > 0 else 0.0,
+        'monthly': _monthly(cube),
+        'rows': int(cells['rows'].sum()),
+        'min_date': cells['date'].min() if len(cells) else None,
+        'max_date': cells['date'].max() if len(cells) else None
+    }
+    # Contagens estimadas por HLL: os cards mostram o erro documentado
+    approximate = [name for name, sketch in [('orders', 'order_sketch'), ('customers', 'customer_sketch')]
+                   if cube[sketch] is not None]
+    if approximate:
+        kpis['approximate'] = {'counts': approximate, 'relative_error': relative_error(cube['precision'])}
+    for key in (CUBE_TABLES if tables is None else tables):
+        table = cube_table(cube, key)
+        if table is not None:
+            kpis[key] = table
+    return kpis
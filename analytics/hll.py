@@ -0,0 +1,69 @@
+# analytics/hll.py
+
+import numpy as np
+import pandas as pd
+
+# Constantes do estimador HyperLogLog (Flajolet et al., 2007)
+def _alpha(m: int) -> float:
+    return 0.7213 / (1 + 1.079 / m)
+
+def relative_error(precision: int) -> float:
+    """Erro padrão relativo documentado do HLL com 2^precision registradores"""
+    return 1.04 / np.sqrt(1 << precision)
+
+def _leading_zeros(x: np.ndarray) -> np.ndarray:
+    """Zeros à esquerda de cada uint64 (busca binária vetorizada, exata)"""
+    x = x.copy()
+    zeros = np.zeros(len(x), dtype='uint8')
+    for shift in (32, 16, 8, 4, 2, 1):
+        empty = x < np.uint64(1 << (64 - shift))
+        zeros[empty] += shift
+        x[empty] <<= np.uint64(shift)
+    return zeros
+
+def hll_registers(hashes: np.ndarray, precision: int):
+    """
+    Registrador e rank (posição do primeiro bit 1) de cada hash de 64 bits.
+    Os primeiros `precision` bits escolhem o registrador; o resto dá o rank.
+    """
+    hashes = np.asarray(hashes, dtype='uint64')
+    registers = (hashes >> np.uint64(64 - precision)).astype('uint16' if precision <= 16 else 'uint32')
+    rest = hashes << np.uint64(precision)
+    rank = _leading_zeros(rest) + 1
+    rank = np.where(rest == 0, 64 - precision + 1, rank).astype('uint8')
+    return registers, rank
+
+def _estimate(n_zero, inverse_sum, precision: int):
+    """Estimativa com a correção de pequenos valores (linear counting)"""
+    m = 1 << precision
+    n_zero = np.asarray(n_zero, dtype='float64')
+    raw = _alpha(m) * m * m / (n_zero + np.asarray(inverse_sum, dtype='float64'))
+    linear = m * np.log(m / np.maximum(n_zero, 1))
+    return np.where((raw <= 2.5 * m) & (n_zero > 0), linear, raw)
+
+def build_sketch(frame: pd.DataFrame, keys: list, hashes: np.ndarray, precision: int) -> pd.DataFrame:
+    """
+    Sketch HLL esparso por chave: uma linha (chaves..., reg, rho) por registrador
+    ocupado, com o maior rank. Mesclar sketches de várias chaves = max por reg.
+    """
+    reg, rho = hll_registers(hashes, precision)
+    sketch = frame[keys].reset_index(drop=True)
+    sketch['reg'] = reg
+    sketch['rho'] = rho
+    return sketch.groupby(keys + ['reg'], observed=True, sort=True)['rho'].max().reset_index()
+
+def count_distinct(sketch: pd.DataFrame, precision: int, by=None):
+    """Distintos estimados nas linhas (já filtradas) do sketch, no total ou por coluna"""
+    m = 1 << precision
+    if by is None:
+        ranks = sketch.groupby('reg')['rho'].max()
+        if len(ranks) == 0:
+            return 0
+        inverse = float(np.exp2(-ranks.to_numpy(dtype='float64')).sum())
+        return int(round(float(_estimate(m - len(ranks), inverse, precision))))
+
+    ranks = sketch.groupby([by, 'reg'], observed=True)['rho'].max()
+    inverse = pd.Series(np.exp2(-ranks.to_numpy(dtype='float64')), index=ranks.index)
+    per_group = inverse.groupby(level=0, observed=True).agg(['size', 'sum'])
+    estimate = _estimate(m - per_group['size'].to_numpy(), per_group['sum'].to_numpy(), precision)
+    return pd.Series(np.round(estimate).astype('int64'), index=per_group.index)
@@ -1,6 +1,154 @@
 import pandas as pd
 import numpy as np
 
+from config.settings import INSIGHTS_CONFIG
+
+SEGMENT_LABELS = {
+    'customer_state': 'estado',
+    'product_category': 'categoria',
+    'payment_method': 'pagamento'
+}
+
+def _dimension_revenue(kpis: dict, df: pd.DataFrame, column: str, kpi_key: str):
+    """Receita por dimensão, ordenada; usa a tabela agregada dos KPIs quando existir"""
+    table = kpis.get(kpi_key)
+    if table is not None:
+        return table.set_index(column)['revenue'].sort_values(ascending=False)
+    if df is not None and column in df.columns:
+        return df.groupby(column, observed=True)['total_value'].sum().sort_values(ascending=False)
+    return None
+
+def segment_signals(segment_monthly: pd.DataFrame):
+    """
+    Crescimento do último mês, participação e concentração de todos os
+    segmentos (estados, categorias, pagamentos) de uma vez: a tabela
+    'segment_monthly' vira uma matriz segmento x mês e as regras são
+    operações sobre colunas dela. concentration é 2 (alta) ou 1 (moderada)
+    no maior segmento de uma dimensão de INSIGHTS_CONFIG['concentration']
+    que passa do limite, 0 nos demais. Retorna uma linha por segmento ou
+    None sem dados.
+    """
+    if segment_monthly is None or len(segment_monthly) == 0:
+        return None
+    rows, segments = pd.factorize(pd.MultiIndex.from_arrays(
+        [segment_monthly['dimension'], segment_monthly['segment']]
+    ))
+    columns, periods = pd.factorize(segment_monthly['period'], sort=True)
+    matrix = np.zeros((len(segments), len(periods)))
+    np.add.at(matrix, (rows, columns), segment_monthly['revenue'].to_numpy(dtype='float64'))
+    
+    dimensions = segments.get_level_values(0)
+    dimension_codes, dimension_names = pd.factorize(dimensions)
+    revenue = matrix.sum(axis=1)
+    dimension_revenue = np.bincount(dimension_codes, weights=revenue)[dimension_codes]
+    segment_count = np.bincount(dimension_codes)[dimension_codes]
+    share = np.divide(revenue * 100, dimension_revenue, out=np.zeros_like(revenue), where=dimension_revenue > 0)
+    
+    top = np.zeros(len(dimension_names))
+    np.maximum.at(top, dimension_codes, revenue)
+    is_top = (revenue > 0) & (revenue == top[dimension_codes])
+    limits = [INSIGHTS_CONFIG['concentration'].get(name, (None, None)) for name in dimension_names]
+    high = np.array([np.inf if h is None else h for h, _ in limits])[dimension_codes]
+    moderate = np.array([np.inf if m is None else m for _, m in limits])[dimension_codes]
+    concentration = np.where(is_top & (share > high), 2, np.where(is_top & (share > moderate), 1, 0))
+    
+    last = matrix[:, -1]
+    prev = matrix[:, -2] if len(periods) >= 2 else np.zeros_like(last)
+    growth = np.full_like(last, np.nan)
+    np.divide((last - prev) * 100, prev, out=growth, where=prev > 0)
+    
+    return pd.DataFrame({
+        'dimension': dimensions,
+        'segment': segments.get_level_values(1),
+        'revenue': revenue,
+        'share': share,
+        'segments': segment_count,
+        'concentration': concentration,
+        'last': last,
+        'prev': prev,
+        'growth': growth
+    })
+
+def _segment_insights(kpis: dict) -> list:
+    """
+    Alertas por segmento com as faixas da receita total (ex.: 'Receita de RJ
+    caiu 18%') e concentração no maior segmento (ex.: PIX com 70% da receita)
+    """
+    signals = segment_signals(kpis.get('segment_monthly'))
+    if signals is None:
+        return []
+    # Dimensões de um único valor repetiriam o total
+    signals = signals[signals['segments'] > 1]
+    
+    insights = []
+    for row in signals[signals['concentration'] > 0].itertuples():
+        label = SEGMENT_LABELS.get(row.dimension, row.dimension)
+        if row.concentration == 2:
+            insights.append({
+                'priority': 2,
+                'type': 'warning',
+                'icon': '🎯',
+                'title': f'Concentração em {row.segment}',
+                'text': f'{row.segment} representa {row.share:.1f}% da receita ({label}).',
+                'action': f'Reduzir a dependência: incentivar outras opções de {label}.'
+            })
+        else:
+            insights.append({
+                'priority': 3,
+                'type': 'info',
+                'icon': '📊',
+                'title': f'Concentração Moderada em {row.segment}',
+                'text': f'{row.segment} representa {row.share:.1f}% da receita ({label}).',
+                'action': 'Acompanhar a participação das demais opções.'
+            })
+    
+    # Segmentos relevantes com variação a comentar
+    relevant = signals[
+        (signals['share'] >= INSIGHTS_CONFIG['segment_min_share'])
+        & ((signals['growth'] > 5) | (signals['growth'] < -5))
+    ]
+    relevant = relevant.reindex(relevant['growth'].abs().sort_values(ascending=False).index)
+    
+    for row in relevant.head(INSIGHTS_CONFIG['max_segment_insights']).itertuples():
+        detail = f"{SEGMENT_LABELS.get(row.dimension, row.dimension)}, {row.share:.1f}% da receita"
+        if row.growth > 15:
+            insights.append({
+                'priority': 2,
+                'type': 'success',
+                'icon': '🚀',
+                'title': f'Destaque: {row.segment}',
+                'text': f'Receita de {row.segment} ({detail}) cresceu {row.growth:.1f}% no último mês.',
+                'action': 'Entender o que impulsionou o segmento e replicar em outros.'
+            })
+        elif row.growth > 5:
+            insights.append({
+                'priority': 3,
+                'type': 'success',
+                'icon': '📈',
+                'title': f'Crescimento em {row.segment}',
+                'text': f'Crescimento de {row.growth:.1f}% na receita de {row.segment} ({detail}).',
+                'action': 'Continuar monitorando o segmento.'
+            })
+        elif row.growth < -10:
+            insights.append({
+                'priority': 1,
+                'type': 'danger',
+                'icon': '⚠️',
+                'title': f'ALERTA: Queda em {row.segment}',
+                'text': f'Receita de {row.segment} ({detail}) caiu {abs(row.growth):.1f}% no último mês.',
+                'action': 'Investigar causas específicas deste segmento.'
+            })
+        else:
+            insights.append({
+                'priority': 2,
+                'type': 'warning',
+                'icon': '📉',
+                'title': f'Queda em {row.segment}',
+                'text': f'Redução de {abs(row.growth):.1f}% na receita de {row.segment} ({detail}).',
+                'action': 'Acompanhar o segmento nas próximas semanas.'
+            })
+    return insights
+
 def generate_smart_insights(kpis: dict, df: pd.DataFrame):
     """
     Gera insights inteligentes baseados em análise de dados
@@ -77,8 +225,8 @@ def generate_smart_insights(kpis: dict, df: pd.DataFrame):
         })
     
     #  3. CONCENTRAÇÃO GEOGRÁFICA 
-    if 'customer_state' in df.columns:
-        state_revenue = df.groupby('customer_state')['total_value'].sum().sort_values(ascending=False)
+    state_revenue = _dimension_revenue(kpis, df, 'customer_state', 'by_state')
+    if state_revenue is not None:
         
         if len(state_revenue) > 0:
             top_state = state_revenue.index[0]
@@ -104,8 +252,8 @@ def generate_smart_insights(kpis: dict, df: pd.DataFrame):
                 })
     
     #  4. ANÁLISE DE CATEGORIAS 
-    if 'product_category' in df.columns:
-        cat_revenue = df.groupby('product_category')['total_value'].sum().sort_values(ascending=False)
+    cat_revenue = _dimension_revenue(kpis, df, 'product_category', 'by_category')
+    if cat_revenue is not None:
         
         if len(cat_revenue) > 0:
             top_cat = cat_revenue.index[0]
@@ -162,7 +310,10 @@ def generate_smart_insights(kpis: dict, df: pd.DataFrame):
                 'action': 'Fortalecer relacionamento com clientes fiéis.'
             })
     
-    #  6. SAÚDE GERAL DO NEGÓCIO 
+    #  6. CRESCIMENTO, QUEDA E CONCENTRAÇÃO POR SEGMENTO
+    insights.extend(_segment_insights(kpis))
+    
+    #  7. SAÚDE GERAL DO NEGÓCIO 
     total_revenue = kpis.get('total_revenue', 0)
     
     if total_revenue > 100000:
@@ -3,68 +3,185 @@
 import pandas as pd
 import numpy as np
 
+# Tabelas por dimensão usadas pelas abas (coluna -> chave no dicionário de KPIs)
+DIMENSION_TABLES = {
+    'product_category': 'by_category',
+    'customer_state': 'by_state',
+    'payment_method': 'by_payment'
+}
+
+MONTHLY_COLUMNS = ['period', 'orders', 'revenue', 'customers', 'items']
+
+# Receita de cada valor de cada dimensão (segmento) por mês, usada pelos insights por segmento
+SEGMENT_COLUMNS = ['dimension', 'segment', 'period', 'revenue']
+
+def add_growth_columns(monthly: pd.DataFrame) -> pd.DataFrame:
+    """Ordena a tabela mensal e adiciona o crescimento mês a mês (%)"""
+    monthly = monthly.sort_values('period')
+    
+    if len(monthly) >= 2:
+        monthly['revenue_growth'] = monthly['revenue'].pct_change() * 100
+        monthly['orders_growth'] = monthly['orders'].pct_change() * 100
+    else:
+        monthly['revenue_growth'] = 0.0
+        monthly['orders_growth'] = 0.0
+    return monthly
+
+def sort_dimension_table(table: pd.DataFrame, column: str) -> pd.DataFrame:
+    """Ordena a tabela de uma dimensão como as abas exibem (pagamentos por pedidos, o resto por receita)"""
+    sort_by = 'orders' if column == 'payment_method' else 'revenue'
+    return table.sort_values(sort_by, ascending=False).reset_index(drop=True)
+
+def segment_table(sums: dict) -> pd.DataFrame:
+    """
+    Tabela longa de SEGMENT_COLUMNS a partir de {coluna: receita indexada por
+    (valor, mês)}, ordenada por dimensão, segmento e mês
+    """
+    parts = [
+        pd.DataFrame({
+            'dimension': column,
+            'segment': revenue.index.get_level_values(0).astype(str),
+            'period': revenue.index.get_level_values(1).astype(str),
+            'revenue': revenue.to_numpy(dtype='float64')
+        })
+        for column, revenue in sums.items() if len(revenue) > 0
+    ]
+    if not parts:
+        return pd.DataFrame(columns=SEGMENT_COLUMNS)
+    table = pd.concat(parts, ignore_index=True)
+    return table.sort_values(['dimension', 'segment', 'period']).reset_index(drop=True)
+
+def _codes(df: pd.DataFrame, column: str):
+    """Códigos inteiros da coluna (-1 para nulos); sem a coluna, cada linha é um valor"""
+    if column not in df.columns:
+        return np.arange(len(df)), len(df)
+    codes, uniques = pd.factorize(df[column])
+    return codes, len(uniques)
+
+def _distinct_per_group(group_codes, n_groups, value_codes, n_values):
+    """Valores distintos por grupo (nulos ignorados) via pares grupo x valor únicos"""
+    valid = (group_codes >= 0) & (value_codes >= 0)
+    pairs = pd.unique(group_codes[valid].astype('int64') * max(n_values, 1) + value_codes[valid])
+    return np.bincount(pairs // max(n_values, 1), minlength=n_groups)
+
+def _sum_by(group_codes, n_groups, values):
+    valid = group_codes >= 0
+    return np.bincount(group_codes[valid], weights=values[valid], minlength=n_groups)
+
+def _dimension_table(df, column, revenue, items, order_codes, total_orders):
+    """Receita, pedidos distintos e quantidade por valor da dimensão (formato das abas)"""
+    codes, uniques = pd.factorize(df[column])
+    n_groups = len(uniques)
+    table = pd.DataFrame({
+        column: uniques,
+        'revenue': _sum_by(codes, n_groups, revenue),
+        'orders': _distinct_per_group(codes, n_groups, order_codes, total_orders).astype('int64'),
+        'qty': _sum_by(codes, n_groups, items).astype('int64')
+    })
+    return sort_dimension_table(table, column)
+
+def _segment_sums(df, column, period_codes, periods, revenue) -> pd.Series:
+    """Receita por (valor da dimensão, mês) num bincount só; só pares com linhas"""
+    codes, uniques = pd.factorize(df[column])
+    n_periods = len(periods)
+    valid = (codes >= 0) & (period_codes >= 0)
+    cells = codes[valid].astype('int64') * n_periods + period_codes[valid]
+    size = len(uniques) * n_periods
+    counts = np.bincount(cells, minlength=size)
+    sums = np.bincount(cells, weights=revenue[valid], minlength=size)
+    present = np.flatnonzero(counts)
+    index = pd.MultiIndex.from_arrays([
+        np.asarray(uniques)[present // n_periods],
+        np.asarray(periods)[present % n_periods]
+    ])
+    return pd.Series(sums[present], index=index)
+
 def calculate_kpis(df: pd.DataFrame):
-    """Calcula KPIs principais a partir do dataframe filtrado"""
+    """
+    Calcula KPIs principais a partir do dataframe filtrado.
+    Não copia o dataframe: IDs, dias e dimensões viram códigos inteiros uma vez
+    e totais, ticket médio, séries mensal/diária e tabelas por dimensão (as
+    mesmas chaves de cube_kpis, consumidas pelas abas e pelos insights) saem
+    desses códigos, sem um groupby por aba.
+    """
     try:
-        df = df.copy()
-        
-        if 'total_value' not in df.columns:
-            df['total_value'] = 0.0
+        n_rows = len(df)
         
-        if 'order_id' not in df.columns:
-            df['order_id'] = [f'ORD_{i:06d}' for i in range(1, len(df) + 1)]
+        # Sem order_id/customer_id cada linha conta como um pedido/cliente
+        order_codes, total_orders = _codes(df, 'order_id')
+        customer_codes, total_customers = _codes(df, 'customer_id')
         
-        if 'customer_id' not in df.columns:
-            df['customer_id'] = [f'CUST_{i:06d}' for i in range(1, len(df) + 1)]
-        
-        if 'quantity' not in df.columns:
-            df['quantity'] = 1
+        if 'total_value' in df.columns:
+            revenue = df['total_value'].to_numpy(dtype='float64', na_value=0.0)
+        else:
+            revenue = np.zeros(n_rows)
+        if 'quantity' in df.columns:
+            items = df['quantity'].to_numpy(dtype='int64', na_value=0)
+        else:
+            items = np.ones(n_rows, dtype='int64')
         
-        total_orders = df['order_id'].nunique()
-        total_revenue = float(df['total_value'].fillna(0).sum())
-        total_customers = df['customer_id'].nunique()
-        total_items = int(df['quantity'].sum())
+        total_revenue = float(revenue.sum())
+        total_items = int(items.sum())
         
+        # Média da soma por pedido = receita das linhas com pedido / nº de pedidos
         if total_orders > 0:
-            order_totals = df.groupby('order_id')['total_value'].sum()
-            avg_ticket = float(order_totals.mean())
+            avg_ticket = float(revenue[order_codes >= 0].sum() / total_orders)
         else:
             avg_ticket = 0.0
         
-        monthly = pd.DataFrame(columns=['period', 'orders', 'revenue', 'customers', 'items'])
+        monthly = pd.DataFrame(columns=MONTHLY_COLUMNS)
+        daily = pd.DataFrame(columns=['order_date', 'revenue', 'orders'])
+        segments = {}
         
-        if 'order_date' in df.columns:
-            df['order_date'] = pd.to_datetime(df['order_date'], errors='coerce')
-            df_valid_dates = df[~df['order_date'].isna()].copy()
+        if 'order_date' in df.columns and n_rows > 0:
+            dates = df['order_date']
+            if not pd.api.types.is_datetime64_any_dtype(dates):
+                dates = pd.to_datetime(dates, errors='coerce')
+            
+            # Dia de cada linha como código inteiro (NaT -> -1); o mês sai do dia
+            day_codes, days = pd.factorize(dates.to_numpy().astype('datetime64[D]'), sort=True)
+            n_days = len(days)
             
-            if len(df_valid_dates) > 0:
-                df_valid_dates['period'] = df_valid_dates['order_date'].dt.to_period('M').astype(str)
+            if n_days > 0:
+                month_of_day, months = pd.factorize(days.astype('datetime64[M]'), sort=True)
+                period_codes = np.where(day_codes >= 0, month_of_day[day_codes], -1)
+                n_periods = len(months)
                 
-                monthly = df_valid_dates.groupby('period').agg(
-                    orders=('order_id', 'nunique'),
-                    revenue=('total_value', 'sum'),
-                    customers=('customer_id', 'nunique'),
-                    items=('quantity', 'sum')
-                ).reset_index()
+                period_names = np.datetime_as_string(months, unit='M')
+                monthly = pd.DataFrame({
+                    'period': period_names,
+                    'orders': _distinct_per_group(period_codes, n_periods, order_codes, total_orders).astype('int64'),
+                    'revenue': _sum_by(period_codes, n_periods, revenue),
+                    'customers': _distinct_per_group(period_codes, n_periods, customer_codes, total_customers).astype('int64'),
+                    'items': _sum_by(period_codes, n_periods, items).astype('int64')
+                })
+                monthly = add_growth_columns(monthly).reset_index(drop=True)
                 
-                monthly = monthly.sort_values('period')
+                daily = pd.DataFrame({
+                    'order_date': pd.DatetimeIndex(days).date,
+                    'revenue': _sum_by(day_codes, n_days, revenue),
+                    'orders': _distinct_per_group(day_codes, n_days, order_codes, total_orders).astype('int64')
+                })
                 
-                if len(monthly) >= 2:
-                    monthly['revenue_growth'] = monthly['revenue'].pct_change() * 100
-                    monthly['orders_growth'] = monthly['orders'].pct_change() * 100
-                else:
-                    monthly['revenue_growth'] = 0.0
-                    monthly['orders_growth'] = 0.0
+                segments = {
+                    column: _segment_sums(df, column, period_codes, period_names, revenue)
+                    for column in DIMENSION_TABLES if column in df.columns
+                }
         
-        return {
+        kpis = {
             'total_orders': total_orders,
             'total_revenue': total_revenue,
             'total_customers': total_customers,
             'total_items': total_items,
             'avg_ticket': avg_ticket,
             'monthly': monthly,
-            'df': df
+            'daily': daily,
+            'segment_monthly': segment_table(segments)
         }
+        for column, key in DIMENSION_TABLES.items():
+            if column in df.columns:
+                kpis[key] = _dimension_table(df, column, revenue, items, order_codes, total_orders)
+        return kpis
     
     except Exception as e:
         print(f"Erro em calculate_kpis: {e}")
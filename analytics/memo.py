@@ -0,0 +1,100 @@
+# analytics/memo.py
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from config.settings import MEMO_CONFIG
+
+class LRUCache:
+    """
+    Cache LRU com limite de entradas e contadores de acerto/falha.
+    Thread-safe: as sessões do Streamlit rodam em threads do mesmo processo.
+    Com copy_value, quem lê recebe copy_value(valor), nunca o objeto guardado.
+    """
+
+    def __init__(self, max_entries: int, copy_value=None):
+        self.max_entries = max_entries
+        self.copy_value = copy_value
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                value = self._entries[key]
+            else:
+                self.misses += 1
+                return default
+        return self.copy_value(value) if self.copy_value else value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """Retorna o valor em cache ou calcula (fora do lock) e guarda"""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+            if self.copy_value:
+                value = self.copy_value(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+def copy_tables(value):
+    """
+    Cópia das tabelas de um resultado (percorre dicionários, listas e
+    tuplas); escalares e demais objetos são imutáveis ou compartilhados
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, dict):
+        return {key: copy_tables(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(copy_tables(item) for item in value)
+    return value
+
+# Compartilhado por todas as sessões do processo: quem abre o mesmo dataset
+# com o mesmo filtro reaproveita KPIs, tabelas das abas e insights. Cada
+# leitura recebe cópias das tabelas (agregadas, pequenas): uma sessão que
+# altere o resultado (ex.: coluna nova numa tabela) não afeta as outras
+FILTER_CACHE = LRUCache(MEMO_CONFIG['max_entries'], copy_value=copy_tables)
+
+def filter_key(dataset_key, start_date, end_date, states) -> tuple:
+    """Chave do cache: (dataset, período, conjunto de estados)"""
+    return (dataset_key, str(start_date), str(end_date), frozenset(states or []))
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Hash do conteúdo de uma tabela (colunas, tipos e valores), para chavear caches"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
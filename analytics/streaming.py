@@ -0,0 +1,237 @@
+# analytics/streaming.py
+
+import pandas as pd
+import numpy as np
+
+from analytics.kpis import (
+    DIMENSION_TABLES, MONTHLY_COLUMNS, add_growth_columns, segment_table, sort_dimension_table
+)
+from utils.data_loader import iter_csv_chunks
+from utils.data_processor import process_dataframe
+
+class DistinctSet:
+    """Conjunto de valores distintos guardado como hashes uint64 (8 bytes por valor)"""
+
+    # Acima desse número de hashes pendentes o conjunto é consolidado
+    _CONSOLIDATE_AT = 1_000_000
+
+    def __init__(self):
+        self._unique = np.empty(0, dtype='uint64')
+        self._pending = []
+        self._n_pending = 0
+
+    def add_hashes(self, hashes: np.ndarray):
+        if len(hashes) == 0:
+            return
+        self._pending.append(hashes)
+        self._n_pending += len(hashes)
+        if self._n_pending >= self._CONSOLIDATE_AT:
+            self._consolidate()
+
+    def update(self, other: 'DistinctSet'):
+        other._consolidate()
+        self.add_hashes(other._unique)
+
+    def _consolidate(self):
+        if self._pending:
+            self._unique = np.unique(np.concatenate([self._unique] + self._pending))
+            self._pending = []
+            self._n_pending = 0
+
+    def __len__(self):
+        self._consolidate()
+        return len(self._unique)
+
+class KeyedDistinct:
+    """Um DistinctSet por chave (mês, dia, estado...)"""
+
+    def __init__(self):
+        self.sets = {}
+
+    def add_hashes(self, keys, hashes: np.ndarray):
+        """Adiciona hashes já calculados (ver hash_column) agrupados por chave"""
+        frame = pd.DataFrame({'key': np.asarray(keys), 'hash': hashes}).dropna(subset=['key'])
+        if len(frame) == 0:
+            return
+        frame = frame.drop_duplicates()
+        for key, group in frame.groupby('key', sort=False)['hash']:
+            self.sets.setdefault(key, DistinctSet()).add_hashes(group.to_numpy())
+
+    def update(self, other: 'KeyedDistinct'):
+        for key, values in other.sets.items():
+            self.sets.setdefault(key, DistinctSet()).update(values)
+
+    def counts(self) -> pd.Series:
+        return pd.Series({key: len(s) for key, s in self.sets.items()}, dtype='int64')
+
+def hash_column(values: pd.Series):
+    """Hash de cada valor da coluna e máscara dos não nulos (nulos não contam em nunique)"""
+    valid = values.notna().to_numpy()
+    hashes = pd.util.hash_array(values.to_numpy())
+    return hashes, valid
+
+def _add_sums(current, new):
+    """Soma duas tabelas de agregados alinhando pelo índice"""
+    if current is None:
+        return new
+    return current.add(new, fill_value=0)
+
+class StreamingAggregator:
+    """
+    Acumula os agregados do dashboard chunk a chunk, sem manter as linhas.
+    Memória proporcional ao tamanho do chunk + valores distintos (8 bytes cada).
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.total_revenue = 0.0
+        self.ticket_revenue = 0.0  # receita das linhas com order_id (igual ao groupby de avg_ticket)
+        self.total_items = 0
+        self.orders = DistinctSet()
+        self.customers = DistinctSet()
+        self.min_date = None
+        self.max_date = None
+        self.monthly = None
+        self.monthly_orders = KeyedDistinct()
+        self.monthly_customers = KeyedDistinct()
+        self.daily = None
+        self.daily_orders = KeyedDistinct()
+        self.dimensions = {}
+        self.dimension_orders = {col: KeyedDistinct() for col in DIMENSION_TABLES}
+        self.segment_months = {}
+
+    def update(self, chunk: pd.DataFrame):
+        """Adiciona um chunk já processado por process_dataframe"""
+        if len(chunk) == 0:
+            return
+
+        offset = self.rows
+        self.rows += len(chunk)
+        self.total_revenue += float(chunk['total_value'].fillna(0).sum())
+        self.total_items += int(chunk['quantity'].sum())
+
+        # Sem order_id/customer_id o calculate_kpis gera um ID por linha
+        if 'order_id' in chunk.columns:
+            order_ids = chunk['order_id']
+            self.ticket_revenue += float(chunk.loc[order_ids.notna(), 'total_value'].sum())
+        else:
+            order_ids = pd.Series(np.arange(offset, offset + len(chunk)), index=chunk.index)
+            self.ticket_revenue += float(chunk['total_value'].sum())
+        if 'customer_id' in chunk.columns:
+            customer_ids = chunk['customer_id']
+        else:
+            customer_ids = pd.Series(np.arange(offset, offset + len(chunk)), index=chunk.index)
+
+        # Os IDs são hasheados uma única vez e reaproveitados em todos os conjuntos
+        order_hash, order_valid = hash_column(order_ids)
+        customer_hash, customer_valid = hash_column(customer_ids)
+        self.orders.add_hashes(np.unique(order_hash[order_valid]))
+        self.customers.add_hashes(np.unique(customer_hash[customer_valid]))
+
+        if 'order_date' in chunk.columns:
+            dates = chunk['order_date']
+            chunk_min, chunk_max = dates.min(), dates.max()
+            self.min_date = chunk_min if self.min_date is None else min(self.min_date, chunk_min)
+            self.max_date = chunk_max if self.max_date is None else max(self.max_date, chunk_max)
+
+            period = dates.dt.to_period('M').astype(str)
+            month_sums = chunk.groupby(period).agg(
+                revenue=('total_value', 'sum'),
+                items=('quantity', 'sum')
+            )
+            self.monthly = _add_sums(self.monthly, month_sums)
+            self.monthly_orders.add_hashes(period[order_valid], order_hash[order_valid])
+            self.monthly_customers.add_hashes(period[customer_valid], customer_hash[customer_valid])
+
+            day = dates.dt.normalize()
+            day_sums = chunk.groupby(day)['total_value'].sum().to_frame('revenue')
+            self.daily = _add_sums(self.daily, day_sums)
+            self.daily_orders.add_hashes(day[order_valid], order_hash[order_valid])
+
+            for col in DIMENSION_TABLES:
+                if col in chunk.columns:
+                    segment_sums = chunk.groupby([col, period], observed=True)['total_value'].sum()
+                    self.segment_months[col] = _add_sums(self.segment_months.get(col), segment_sums)
+
+        for col in DIMENSION_TABLES:
+            if col not in chunk.columns:
+                continue
+            dim_sums = chunk.groupby(col, observed=True).agg(
+                revenue=('total_value', 'sum'),
+                qty=('quantity', 'sum')
+            )
+            self.dimensions[col] = _add_sums(self.dimensions.get(col), dim_sums)
+            self.dimension_orders[col].add_hashes(chunk[col][order_valid], order_hash[order_valid])
+
+    def _monthly_table(self) -> pd.DataFrame:
+        if self.monthly is None or len(self.monthly) == 0:
+            return pd.DataFrame(columns=MONTHLY_COLUMNS)
+
+        monthly = pd.DataFrame({
+            'period': self.monthly.index.astype(str),
+            'orders': self.monthly_orders.counts().reindex(self.monthly.index, fill_value=0).to_numpy(),
+            'revenue': self.monthly['revenue'].to_numpy(dtype='float64'),
+            'customers': self.monthly_customers.counts().reindex(self.monthly.index, fill_value=0).to_numpy(),
+            'items': self.monthly['items'].to_numpy().astype('int64')
+        })
+        return add_growth_columns(monthly).reset_index(drop=True)
+
+    def _daily_table(self) -> pd.DataFrame:
+        if self.daily is None:
+            return pd.DataFrame(columns=['order_date', 'revenue', 'orders'])
+        daily = self.daily.sort_index()
+        return pd.DataFrame({
+            'order_date': daily.index.date,
+            'revenue': daily['revenue'].to_numpy(),
+            'orders': self.daily_orders.counts().reindex(daily.index, fill_value=0).to_numpy()
+        })
+
+    def _dimension_table(self, col: str) -> pd.DataFrame:
+        sums = self.dimensions.get(col)
+        if sums is None:
+            return None
+        table = pd.DataFrame({
+            col: sums.index,
+            'revenue': sums['revenue'].to_numpy(),
+            'orders': self.dimension_orders[col].counts().reindex(sums.index, fill_value=0).to_numpy(),
+            'qty': sums['qty'].to_numpy().astype('int64')
+        })
+        return sort_dimension_table(table, col)
+
+    def to_kpis(self) -> dict:
+        """Retorna os KPIs no mesmo formato de calculate_kpis (sem o dataframe)"""
+        total_orders = len(self.orders)
+        avg_ticket = float(self.ticket_revenue / total_orders) if total_orders > 0 else 0.0
+
+        kpis = {
+            'total_orders': total_orders,
+            'total_revenue': self.total_revenue,
+            'total_customers': len(self.customers),
+            'total_items': self.total_items,
+            'avg_ticket': avg_ticket,
+            'monthly': self._monthly_table(),
+            'daily': self._daily_table(),
+            'segment_monthly': segment_table(self.segment_months),
+            'rows': self.rows,
+            'min_date': self.min_date,
+            'max_date': self.max_date
+        }
+        for col, key in DIMENSION_TABLES.items():
+            table = self._dimension_table(col)
+            if table is not None:
+                kpis[key] = table
+        return kpis
+
+def aggregate_csv_streaming(uploaded_file, chunk_rows=None, progress=None):
+    """
+    Lê o CSV em chunks, normaliza cada um e acumula os KPIs sem carregar o arquivo.
+    Aceita também uma lista de arquivos, acumulados nos mesmos agregados.
+    """
+    files = uploaded_file if isinstance(uploaded_file, (list, tuple)) else [uploaded_file]
+    aggregator = StreamingAggregator()
+    for source in files:
+        for chunk in iter_csv_chunks(source, chunk_rows):
+            aggregator.update(process_dataframe(chunk))
+            if progress is not None:
+                progress(aggregator.rows)
+    return aggregator.to_kpis()
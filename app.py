@@ -1,12 +1,13 @@
 import streamlit as st
 import pandas as pd
 import warnings
+from functools import partial
 warnings.filterwarnings("ignore")
 
 from config.settings import APP_CONFIG
 from styles.custom_css import get_custom_css
 from components.header import render_header
-from components.sidebar import render_sidebar
+from components.sidebar import render_sidebar, company_period, extend_company_period
 from components.home_page import render_home_page
 from components.kpi_cards import render_kpi_cards
 from components.charts import (
@@ -16,8 +17,13 @@ from components.charts import (
     render_payments_tab
 )
 from components.insights_cards import render_insights_section
+from components.perf_panel import render_perf_panel
 from analytics.kpis import calculate_kpis
-from utils.data_processor import process_dataframe
+from analytics.insights import generate_smart_insights
+from analytics.memo import FILTER_CACHE, filter_key
+from analytics.backends import get_backend
+from utils.date_index import DateStateIndex
+from utils import perf
 
 # Configuração da página
 st.set_page_config(**APP_CONFIG)
@@ -25,16 +31,133 @@ st.set_page_config(**APP_CONFIG)
 # CSS customizado
 st.markdown(get_custom_css(), unsafe_allow_html=True)
 
+def render_streaming_dashboard(kpis: dict, company_name: str):
+    """Renderiza o dashboard a partir dos agregados do modo streaming (sem linhas em memória)"""
+    periodo = ""
+    if kpis.get('min_date') is not None:
+        periodo = f"Período de dados: {kpis['min_date'].strftime('%d/%m/%Y')} a {kpis['max_date'].strftime('%d/%m/%Y')} | "
+    st.markdown(f"""
+    <div style="margin-top:10px; margin-bottom:8px;">
+        <h3 style="margin:0;">📈 Dashboard Gerencial - <span style="color:#1e3c72;">{company_name}</span></h3>
+        <div class="small-muted">
+            {periodo}Registros: {kpis.get('rows', 0):,} | Modo streaming (filtros desativados)
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    with perf.stage('render_kpi_cards'):
+        render_kpi_cards(kpis)
+    
+    st.markdown("---")
+    
+    render_analysis(kpis, None, company_name)
+
+ANALYSIS_VIEWS = [
+    "📈 Evolução Temporal",
+    "🏆 Produtos",
+    "🗺️ Geografia",
+    "💳 Pagamentos"
+]
+
+def render_analysis(kpis: dict, df_filtered, company_name: str, insights=None, load_table=None):
+    """
+    Renderiza a análise selecionada e os insights (df_filtered=None: tudo vem das tabelas dos KPIs).
+    Só a visão escolhida é calculada; tabelas ausentes dos KPIs vêm de load_table(chave).
+    """
+    def table(key):
+        if key in kpis or load_table is None:
+            return kpis.get(key)
+        return load_table(key)
+    
+    # Seletor de análise: diferente de st.tabs, só o corpo visível executa
+    view = st.radio(
+        "Análise",
+        ANALYSIS_VIEWS,
+        horizontal=True,
+        key='analysis_view',
+        label_visibility='collapsed'
+    )
+    
+    if view == ANALYSIS_VIEWS[0]:
+        try:
+            daily = table('daily')
+            with perf.stage('render_temporal_tab'):
+                render_temporal_tab(kpis if daily is None else dict(kpis, daily=daily), df_filtered)
+        except Exception as e:
+            st.error(f"Erro ao renderizar aba temporal: {e}")
+    
+    elif view == ANALYSIS_VIEWS[1]:
+        try:
+            with perf.stage('render_products_tab'):
+                render_products_tab(df_filtered, prod=table('by_category'))
+        except Exception as e:
+            st.error(f"Erro ao renderizar aba de produtos: {e}")
+    
+    elif view == ANALYSIS_VIEWS[2]:
+        try:
+            with perf.stage('render_geography_tab'):
+                render_geography_tab(df_filtered, geo=table('by_state'))
+        except Exception as e:
+            st.error(f"Erro ao renderizar aba de geografia: {e}")
+    
+    elif view == ANALYSIS_VIEWS[3]:
+        try:
+            with perf.stage('render_payments_tab'):
+                render_payments_tab(df_filtered, pay=table('by_payment'))
+        except Exception as e:
+            st.error(f"Erro ao renderizar aba de pagamentos: {e}")
+    
+    # Insights
+    try:
+        with perf.stage('render_insights_section'):
+            render_insights_section(df_filtered, company_name, kpis, insights)
+    except Exception as e:
+        st.error(f"Erro ao renderizar insights: {e}")
+
+def _dataset_artifact(name: str, builder):
+    """
+    Estrutura derivada do dataset atual (cubo, índice), construída uma vez e
+    guardada no registro junto com o dataset: sessões com os mesmos dados a compartilham
+    """
+    handle = st.session_state.get('dataset')
+    if handle is None:
+        return builder()
+    return handle.artifact(name, builder)
+
+def _dataset_key():
+    handle = st.session_state.get('dataset')
+    return handle.key if handle is not None else None
+
+def get_dataset_source(df: pd.DataFrame, backend):
+    """Estrutura do backend para o dataset atual (cubo no pandas, conexão no DuckDB)"""
+    def builder():
+        with perf.stage(f'prepare:{backend.name}'):
+            return backend.prepare(df)
+    return _dataset_artifact(backend.artifact, builder)
+
+def get_dataset_index(df: pd.DataFrame) -> DateStateIndex:
+    """Índice por data/estado do dataset atual (que já vem ordenado por data da sidebar)"""
+    def builder():
+        with perf.stage('build_date_index'):
+            return DateStateIndex(df)
+    return _dataset_artifact('date_index', builder)
+
 def main():
     # Cabeçalho
     render_header()
     
     # Sidebar e carregamento de dados
-    df, company_name = render_sidebar()
+    with perf.stage('render_sidebar'):
+        df, company_name = render_sidebar()
     
-    # Se não há dados, mostra página inicial
+    # Se não há dados, mostra página inicial (ou o resultado do modo streaming)
     if df is None:
-        render_home_page()
+        stream_kpis = st.session_state.get('stream_kpis')
+        if stream_kpis is not None:
+            with perf.stage('render_streaming_dashboard'):
+                render_streaming_dashboard(stream_kpis, company_name)
+        else:
+            render_home_page()
         return
     
     # Verificar se df está vazio
@@ -42,17 +165,6 @@ def main():
         st.error("❌ O arquivo está vazio ou não foi possível processar os dados.")
         return
     
-    # Processar dados
-    try:
-        df = process_dataframe(df)
-    except Exception as e:
-        st.error(f"❌ Erro ao processar dados: {e}")
-        st.info("Verifique se o arquivo CSV está no formato correto.")
-        with st.expander("🐛 Debug - Ver estrutura do dataframe"):
-            st.write("Colunas encontradas:", df.columns.tolist())
-            st.write("Primeiras linhas:", df.head())
-        return
-    
     if 'order_date' not in df.columns:
         st.error("❌ Coluna obrigatória 'order_date' não encontrada no dataset.")
         st.info("O CSV deve conter as colunas: order_id, customer_id, order_date, product_category, product_price, quantity, total_value")
@@ -77,9 +189,15 @@ def main():
         with col1:
             min_date = df['order_date'].min().date()
             max_date = df['order_date'].max().date()
+            selected = (min_date, max_date)
+            # Empresa salva: o período vai até onde há dados salvos, não só o já carregado
+            company = company_period()
+            if company is not None:
+                min_date, max_date = min(min_date, company[0]), max(max_date, company[1])
+                selected = company[2]
             date_range = st.date_input(
                 "Período:",
-                value=(min_date, max_date),
+                value=selected,
                 min_value=min_date,
                 max_value=max_date,
                 format="DD/MM/YYYY"  # ← Formato brasileiro
@@ -99,77 +217,101 @@ def main():
         # Fallback: usar data única para ambas
         start_date = end_date = date_range
 
-    # Aplicar filtros
-    df_filtered = df[
-        (df['order_date'] >= pd.to_datetime(start_date)) &
-        (df['order_date'] <= pd.to_datetime(end_date))
-    ]
+    # Meses da empresa salva que o período pede e ainda não foram lidos do disco
+    if extend_company_period(start_date, end_date):
+        st.rerun()
+
+    # KPIs, abas e insights saem do backend (cubo pré-agregado ou DuckDB, memoizados
+    # por filtro); as linhas só são filtradas se o backend falhar
+    kpis = None
+    insights = None
+    df_filtered = None
+    load_table = None
+    try:
+        kpis, insights = compute_filtered_results(df, start_date, end_date, selected_states)
+        load_table = partial(compute_filtered_table, df, start_date, end_date, selected_states)
+    except Exception as e:
+        print(f"Backend indisponível, usando as linhas filtradas: {e}")
     
-    if 'customer_state' in df_filtered.columns and selected_states:
-        df_filtered = df_filtered[df_filtered['customer_state'].isin(selected_states)]
+    if kpis is None:
+        kpis, df_filtered = compute_kpis_from_rows(df, start_date, end_date, selected_states)
+        if kpis is None:
+            return
     
     # Verificar se ainda há dados após filtros
-    if len(df_filtered) == 0:
+    if kpis.get('rows', 0) == 0:
         st.warning("⚠️ Nenhum dado encontrado com os filtros aplicados. Ajuste os filtros.")
         return
     
+    # Renderizar KPI cards
+    with perf.stage('render_kpi_cards'):
+        render_kpi_cards(kpis)
+    
+    st.markdown("---")
+    
+    render_analysis(kpis, df_filtered, company_name, insights, load_table)
+
+# Tabelas que os insights usam; as demais são calculadas quando a visão é aberta
+INSIGHT_TABLES = ['by_category', 'by_state', 'segment_monthly']
+
+def compute_filtered_results(df: pd.DataFrame, start_date, end_date, selected_states):
+    """KPIs e insights do filtro pelo backend configurado, reaproveitados do cache LRU do processo"""
+    backend = get_backend()
+    def compute():
+        source = get_dataset_source(df, backend)
+        with perf.stage(f'kpis:{backend.name}'):
+            kpis = backend.kpis(source, start_date, end_date, selected_states, tables=INSIGHT_TABLES)
+        with perf.stage('generate_smart_insights'):
+            insights = generate_smart_insights(kpis, None) if kpis['rows'] > 0 else []
+        return kpis, insights
+    
+    dataset_key = _dataset_key()
+    if dataset_key is None:
+        return compute()
+    key = filter_key(dataset_key, start_date, end_date, selected_states)
+    with perf.stage('filtered_results'):
+        return FILTER_CACHE.get_or_compute(key, compute)
+
+def compute_filtered_table(df: pd.DataFrame, start_date, end_date, selected_states, table_key: str):
+    """Tabela de uma visão (ex.: 'daily') para o filtro, calculada na primeira visita e memoizada"""
+    backend = get_backend()
+    def compute():
+        source = get_dataset_source(df, backend)
+        with perf.stage(f'table:{table_key}'):
+            return backend.table(source, start_date, end_date, selected_states, table_key)
+    
+    dataset_key = _dataset_key()
+    if dataset_key is None:
+        return compute()
+    key = filter_key(dataset_key, start_date, end_date, selected_states) + (table_key,)
+    return FILTER_CACHE.get_or_compute(key, compute)
+
+def compute_kpis_from_rows(df: pd.DataFrame, start_date, end_date, selected_states):
+    """Caminho sem cubo: filtra as linhas e calcula os KPIs com calculate_kpis"""
+    # Aplicar filtros: busca binária no período + posições pré-calculadas por estado
+    index = get_dataset_index(df)
+    with perf.stage('filter_rows'):
+        df_filtered = index.filter(df, start_date, end_date, selected_states)
+    
     # Calcular KPIs
     try:
-        kpis = calculate_kpis(df_filtered)
+        with perf.stage('calculate_kpis'):
+            kpis = calculate_kpis(df_filtered)
         
         # Verificar se KPIs foi calculado corretamente
         if kpis is None:
             st.error("❌ Erro ao calcular KPIs.")
             st.info("💡 Verifique o console do terminal para mais detalhes do erro.")
-            return
+            return None, df_filtered
             
     except Exception as e:
         st.error(f"❌ Erro ao calcular KPIs: {e}")
-        return
-    
-    # Renderizar KPI cards
-    render_kpi_cards(kpis)
-    
-    st.markdown("---")
+        return None, df_filtered
     
-    # Abas de análise
-    tab1, tab2, tab3, tab4 = st.tabs([
-        "📈 Evolução Temporal",
-        "🏆 Produtos",
-        "🗺️ Geografia",
-        "💳 Pagamentos"
-    ])
-    
-    with tab1:
-        try:
-            render_temporal_tab(kpis, df_filtered)
-        except Exception as e:
-            st.error(f"Erro ao renderizar aba temporal: {e}")
-    
-    with tab2:
-        try:
-            render_products_tab(df_filtered)
-        except Exception as e:
-            st.error(f"Erro ao renderizar aba de produtos: {e}")
-    
-    with tab3:
-        try:
-            render_geography_tab(df_filtered)
-        except Exception as e:
-            st.error(f"Erro ao renderizar aba de geografia: {e}")
-    
-    with tab4:
-        try:
-            render_payments_tab(df_filtered)
-        except Exception as e:
-            st.error(f"Erro ao renderizar aba de pagamentos: {e}")
-    
-    # Insights
-  
-    try:
-        render_insights_section(df_filtered, company_name, kpis)  # ← ADICIONAR kpis
-    except Exception as e:
-        st.error(f"Erro ao renderizar insights: {e}")
+    kpis['rows'] = len(df_filtered)
+    return kpis, df_filtered
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with perf.rerun() as profile:
+        main()
+    render_perf_panel(profile)
\ No newline at end of file
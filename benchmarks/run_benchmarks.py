@@ -0,0 +1,346 @@
+"""
+Benchmark de ponta a ponta: leitura, processamento, KPIs, insights e abas.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.run_benchmarks --sizes 10k,100k,1M
+    python -m benchmarks.run_benchmarks --sizes 10k,100k,1M,10M --save-baseline
+
+Os CSVs sintéticos ficam em benchmarks/.data (gerados uma vez por tamanho/formato).
+Com --backends duckdb as mesmas consultas também rodam no DuckDB (uma vez por
+valor de --threads, para ver a escala com os núcleos) e os KPIs precisam bater
+com os do pandas; qualquer diferença termina com código 1.
+
+As abas são medidas com o cache de figuras vazio; as etapas ':warm' repetem a
+aba com as figuras já no cache (rerun com o mesmo filtro).
+
+Com --ingest-files N o CSV é dividido em N arquivos e a leitura de vários
+arquivos (load_processed_files, sem cache) é medida no próprio processo e no
+pool com cada valor de --workers.
+
+Com um baseline salvo, cada execução compara tempo e pico de memória por etapa
+e termina com código 1 se alguma etapa regrediu além da tolerância.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import plotly
+
+from analytics.backends import DUCKDB_AVAILABLE, DuckDBBackend, PandasBackend, kpis_differences
+from analytics.cube import build_cube, cube_kpis, slice_cube
+from analytics.insights import generate_smart_insights
+from analytics.kpis import calculate_kpis
+from components import charts
+from config.settings import CACHE_CONFIG, INGEST_CONFIG
+from utils.data_loader import load_csv_robust
+from utils.dataset_cache import load_processed_files
+from utils.data_processor import process_dataframe
+from utils.sample_data import write_sample_data
+
+BENCH_DIR = Path(__file__).resolve().parent
+DATA_DIR = BENCH_DIR / '.data'
+DEFAULT_BASELINE = BENCH_DIR / 'baseline.json'
+DEFAULT_OUTPUT = BENCH_DIR / 'results.json'
+
+# Formatos de arquivo: padrão EN, Excel BR (latin1) e UTF-8 com BOM em formato BR
+VARIANTS = {
+    'utf8-en': {'sep': ',', 'decimal': '.', 'encoding': 'utf-8'},
+    'latin1-br': {'sep': ';', 'decimal': ',', 'encoding': 'latin1'},
+    'utf8bom-br': {'sep': ';', 'decimal': ',', 'encoding': 'utf-8-sig'},
+}
+
+class StreamlitStub:
+    """Substitui o módulo streamlit nas abas: guarda as figuras e ignora o resto"""
+
+    def __init__(self):
+        self.figures = []
+        self.payload_bytes = 0
+
+    def plotly_chart(self, fig, *args, **kwargs):
+        # O Streamlit serializa a figura para JSON; o custo entra na medição
+        self.payload_bytes += len(fig.to_json())
+        self.figures.append(fig)
+
+    def slider(self, label, *args, value=None, **kwargs):
+        return value
+
+    def columns(self, spec, *args, **kwargs):
+        return [self] * (spec if isinstance(spec, int) else len(spec))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+def parse_size(text: str) -> int:
+    """'10k' → 10_000, '1M' → 1_000_000"""
+    text = text.strip()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1].lower(), 1)
+    number = text[:-1] if multiplier > 1 else text
+    return int(float(number) * multiplier)
+
+def size_label(n: int) -> str:
+    if n >= 1_000_000 and n % 1_000_000 == 0:
+        return f'{n // 1_000_000}M'
+    if n >= 1_000 and n % 1_000 == 0:
+        return f'{n // 1_000}k'
+    return str(n)
+
+def fixture_path(n_rows: int, variant: str, seed: int) -> Path:
+    """CSV sintético do tamanho/formato pedido (gerado na primeira vez)"""
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    path = DATA_DIR / f'sample-{size_label(n_rows)}-{variant}-s{seed}.csv'
+    if not path.exists():
+        tmp = path.with_suffix('.tmp')
+        print(f'  gerando {path.name}...', flush=True)
+        write_sample_data(tmp, n_rows, seed=seed, seasonality=0.5, **VARIANTS[variant])
+        tmp.replace(path)
+    return path
+
+def measure(func, repeat: int, track_memory: bool):
+    """Executa func e retorna (resultado, melhor tempo em segundos, pico de memória em MB)"""
+    result = None
+    best = float('inf')
+    for _ in range(repeat):
+        result = None
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+
+    peak_mb = None
+    if track_memory:
+        # Rodada separada: o tracemalloc deixa o código mais lento
+        del result
+        tracemalloc.start()
+        try:
+            result = func()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        finally:
+            tracemalloc.stop()
+    return result, best, peak_mb
+
+def render_stage(render, *args, warm: bool = False, **kwargs):
+    """
+    Função que roda uma aba com o streamlit substituído pelo stub. O cache de
+    figuras é do processo: sem warm ele é esvaziado antes de cada chamada, para
+    --repeat e os formatos seguintes medirem a construção das figuras e não
+    acertos no cache; com warm mede a aba com as figuras já prontas.
+    """
+    def run():
+        if not warm:
+            charts.FIGURE_CACHE.clear()
+        stub = StreamlitStub()
+        with mock.patch.object(charts, 'st', stub):
+            render(*args, **kwargs)
+        return stub
+    return run
+
+def backend_variants(names: list, threads: list) -> list:
+    """(rótulo, backend) para cada backend pedido; o DuckDB roda uma vez por nº de threads"""
+    variants = []
+    for name in names:
+        if name == 'pandas':
+            variants.append(('pandas', PandasBackend()))
+        elif name == 'duckdb' and not DUCKDB_AVAILABLE:
+            print('  duckdb não instalado: backend ignorado', flush=True)
+        elif name == 'duckdb':
+            variants.extend((f'duckdb-t{n}', DuckDBBackend(threads=n)) for n in threads)
+        else:
+            raise ValueError(f"backend desconhecido: {name}")
+    return variants
+
+class UploadStub:
+    """Arquivo enviado (nome e bytes), como o UploadedFile do Streamlit"""
+
+    def __init__(self, name: str, raw: bytes):
+        self.name = name
+        self.size = len(raw)
+        self._raw = raw
+
+    def getvalue(self) -> bytes:
+        return self._raw
+
+def split_csv(path: Path, n_files: int) -> list:
+    """Divide o CSV em n_files partes com o mesmo cabeçalho"""
+    header, *lines = path.read_bytes().splitlines(keepends=True)
+    step = -(-len(lines) // n_files)
+    return [
+        UploadStub(f'{path.stem}-{i}.csv', header + b''.join(lines[i * step:(i + 1) * step]))
+        for i in range(n_files)
+    ]
+
+def run_ingest(path: Path, n_files: int, workers: list, repeat: int) -> dict:
+    """Leitura de vários arquivos no próprio processo e no pool de processos (cache desligado)"""
+    files = split_csv(path, n_files)
+    results = {}
+    with mock.patch.dict(CACHE_CONFIG, {'enabled': False}):
+        for n in [1] + [w for w in workers if w > 1]:
+            label = 'ingest:serial' if n == 1 else f'ingest:pool-{n}'
+            with mock.patch.dict(INGEST_CONFIG, {'max_workers': n, 'parallel_min_bytes': 0}):
+                _, seconds, _ = measure(lambda: load_processed_files(files), repeat, False)
+            results[label] = {'seconds': round(seconds, 6)}
+            print(f'    {label:<26} {seconds:>9.3f}s', flush=True)
+    return results
+
+def run_pipeline(path: Path, repeat: int, track_memory: bool, backends=(), parity=None) -> dict:
+    """
+    Mede cada etapa do dashboard sobre um CSV. Para cada backend extra mede
+    preparo e KPIs e anota em parity as diferenças em relação ao pandas.
+    """
+    results = {}
+
+    def record(stage, func, *args):
+        value, seconds, peak_mb = measure(lambda: func(*args), repeat, track_memory)
+        results[stage] = {'seconds': round(seconds, 6)}
+        if peak_mb is not None:
+            results[stage]['peak_mb'] = round(peak_mb, 2)
+        if isinstance(value, StreamlitStub):
+            results[stage]['payload_kb'] = round(value.payload_bytes / 1024, 1)
+        suffix = f' | pico {peak_mb:,.1f} MB' if peak_mb is not None else ''
+        print(f'    {stage:<26} {seconds:>9.3f}s{suffix}', flush=True)
+        return value
+
+    raw = record('load_csv_robust', load_csv_robust, str(path))
+    df = record('process_dataframe', process_dataframe, raw)
+    del raw
+    kpis = record('calculate_kpis', calculate_kpis, df)
+    record('generate_insights', generate_smart_insights, kpis, df)
+    tabs = [
+        ('render_temporal_tab', charts.render_temporal_tab, (kpis, df)),
+        ('render_products_tab', charts.render_products_tab, (df,)),
+        ('render_geography_tab', charts.render_geography_tab, (df,)),
+        ('render_payments_tab', charts.render_payments_tab, (df,))
+    ]
+    for stage, render, tab_args in tabs:
+        record(stage, render_stage(render, *tab_args))
+        # Rerun com o mesmo filtro: as figuras da medição anterior ficam no cache
+        record(f'{stage}:warm', render_stage(render, *tab_args, warm=True))
+
+    # Caminho do app: cubo construído uma vez por dataset e fatiado a cada filtro
+    cube = record('build_cube', build_cube, df)
+    start, end = df['order_date'].min(), df['order_date'].max()
+    expected = record('cube_kpis', lambda: cube_kpis(slice_cube(cube, start, end, None)))
+
+    for label, backend in backends:
+        source = record(f'prepare:{label}', lambda: backend.prepare(df))
+        kpis = record(f'kpis:{label}', lambda: backend.kpis(source, start, end, None))
+        if parity is not None:
+            parity.extend(f'{path.name} [{label}] {d}' for d in kpis_differences(expected, kpis))
+    return results
+
+def compare(results: dict, baseline: dict, tolerance: float, min_seconds: float):
+    """Lista as etapas que ficaram mais lentas ou usaram mais memória que o baseline"""
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if (current['seconds'] > base['seconds'] * (1 + tolerance)
+                and current['seconds'] - base['seconds'] > min_seconds):
+            regressions.append((key, 'tempo', base['seconds'], current['seconds']))
+        if (current.get('peak_mb') is not None and base.get('peak_mb')
+                and current['peak_mb'] > base['peak_mb'] * (1 + tolerance)):
+            regressions.append((key, 'memória', base['peak_mb'], current['peak_mb']))
+    return regressions
+
+def environment() -> dict:
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'plotly': plotly.__version__,
+        'duckdb': DuckDBBackend.version() if DUCKDB_AVAILABLE else None,
+        'cpus': os.cpu_count()
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline do dashboard")
+    parser.add_argument('--sizes', default='10k,100k,1M', help="ex.: 10k,100k,1M,10M")
+    parser.add_argument('--variants', default=','.join(VARIANTS), help="formatos de CSV: " + ', '.join(VARIANTS))
+    parser.add_argument('--repeat', type=int, default=1, help="repetições por etapa (vale o menor tempo)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-memory', action='store_true', help="não mede o pico de memória")
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+    parser.add_argument('--save-baseline', action='store_true', help="grava os resultados como novo baseline")
+    parser.add_argument('--output', default=str(DEFAULT_OUTPUT))
+    parser.add_argument('--tolerance', type=float, default=0.25, help="piora aceita em relação ao baseline")
+    parser.add_argument('--min-seconds', type=float, default=0.01, help="diferenças de tempo menores são ruído")
+    parser.add_argument('--backends', default='', help="backends extras medidos e conferidos contra o pandas, ex.: duckdb")
+    parser.add_argument('--threads', default='1,2,4', help="threads do DuckDB (uma rodada por valor)")
+    parser.add_argument('--ingest-files', type=int, default=0, help="mede a leitura do CSV dividido em N arquivos")
+    parser.add_argument('--workers', default='2,4', help="processos do pool na leitura de vários arquivos")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(s) for s in args.sizes.split(',') if s.strip()]
+    variants = [v.strip() for v in args.variants.split(',') if v.strip()]
+    unknown = [v for v in variants if v not in VARIANTS]
+    if unknown:
+        parser.error(f"formatos desconhecidos: {', '.join(unknown)}")
+
+    backends = backend_variants(
+        [b.strip() for b in args.backends.split(',') if b.strip()],
+        [int(t) for t in args.threads.split(',') if t.strip()]
+    )
+
+    results = {}
+    parity = []
+    for n_rows in sizes:
+        for variant in variants:
+            print(f'{size_label(n_rows)} linhas | {variant}', flush=True)
+            path = fixture_path(n_rows, variant, args.seed)
+            stages = run_pipeline(path, args.repeat, not args.no_memory, backends, parity)
+            if args.ingest_files > 1:
+                workers = [int(w) for w in args.workers.split(',') if w.strip()]
+                stages.update(run_ingest(path, args.ingest_files, workers, args.repeat))
+            for stage, values in stages.items():
+                results[f'{size_label(n_rows)}/{variant}/{stage}'] = values
+
+    report = {'environment': environment(), 'results': results}
+    Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f'\nResultados gravados em {args.output}')
+
+    if parity:
+        print(f'\n❌ {len(parity)} diferença(s) entre backends:')
+        for line in parity:
+            print(f'  {line}')
+        return 1
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f'Baseline gravado em {baseline_path}')
+        return 0
+
+    if not baseline_path.exists():
+        print('Sem baseline para comparar (use --save-baseline)')
+        return 0
+
+    baseline = json.loads(baseline_path.read_text())['results']
+    regressions = compare(results, baseline, args.tolerance, args.min_seconds)
+    if not regressions:
+        print(f'Nenhuma regressão acima de {args.tolerance:.0%} em relação ao baseline')
+        return 0
+
+    print(f'\n⚠️ {len(regressions)} regressão(ões) acima de {args.tolerance:.0%}:')
+    for key, metric, before, after in regressions:
+        print(f'  {key:<50} {metric:<8} {before:>10.3f} → {after:.3f}')
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
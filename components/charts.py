@@ -6,16 +6,19 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
-def render_temporal_tab(kpis: dict, df_filtered: pd.DataFrame):
-    """Renderiza a aba de evolução temporal"""
-    st.subheader("Evolução de Receita e Pedidos (Mensal)")
-    
-    monthly = kpis.get('monthly', pd.DataFrame())
-    
-    if len(monthly) == 0:
-        st.info("Sem dados suficientes para mostrar séries temporais.")
-        return
-    
+from analytics.memo import LRUCache, frame_fingerprint
+from config.settings import CHART_CONFIG
+from utils.downsample import lttb_indices
+
+# Figuras prontas por (gráfico, conteúdo da tabela agregada), compartilhadas entre sessões
+FIGURE_CACHE = LRUCache(CHART_CONFIG['figure_cache_entries'])
+
+def cached_figure(spec: str, table: pd.DataFrame, build):
+    """Retorna build(table), reaproveitando a figura se o gráfico e a tabela não mudaram"""
+    key = (spec, frame_fingerprint(table))
+    return FIGURE_CACHE.get_or_compute(key, lambda: build(table))
+
+def _monthly_figure(monthly: pd.DataFrame):
     fig = make_subplots(specs=[[{"secondary_y": True}]])
     fig.add_trace(
         go.Bar(x=monthly['period'], y=monthly['orders'], name='Pedidos', marker_color='#1e3c72'),
@@ -33,61 +36,104 @@ def render_temporal_tab(kpis: dict, df_filtered: pd.DataFrame):
     )
     fig.update_layout(hovermode='x unified', height=420, legend=dict(orientation='h'))
     fig.update_xaxes(tickangle=-45)
-    st.plotly_chart(fig, use_container_width=True)
-    
-    st.markdown("#### Pedidos por Dia")
+    return fig
+
+def _daily_figure(df_days: pd.DataFrame):
+    fig = px.line(
+        df_days,
+        x='order_date',
+        y='revenue',
+        labels={'order_date':'Data','revenue':'Receita (R$)'}
+    )
+    fig.update_traces(line_color='#0b6bf7', line_width=2)
+    return fig
+
+def _daily_downsampled_figure(window: pd.DataFrame):
+    """Scattergl com os pontos escolhidos pelo LTTB; retorna (figura, pontos mantidos, payload em KB)"""
+    x = pd.to_datetime(window['order_date']).to_numpy()
+    y = window['revenue'].to_numpy(dtype='float64')
+    keep = lttb_indices(x.astype('int64'), y, CHART_CONFIG['target_points'])
+    fig = go.Figure(go.Scattergl(
+        x=x[keep],
+        y=y[keep],
+        mode='lines',
+        name='Receita (R$)',
+        line=dict(color='#0b6bf7', width=2)
+    ))
+    fig.update_layout(xaxis_title='Data', yaxis_title='Receita (R$)', hovermode='x')
+    return fig, len(keep), len(fig.to_json()) / 1024
+
+def render_temporal_tab(kpis: dict, df_filtered: pd.DataFrame):
+    """Renderiza a aba de evolução temporal"""
+    st.subheader("Evolução de Receita e Pedidos (Mensal)")
     
-    df_to_use = kpis.get('df', df_filtered)
+    monthly = kpis.get('monthly', pd.DataFrame())
     
-    if 'order_date' not in df_to_use.columns:
-        st.warning("Coluna 'order_date' não encontrada para gráfico diário.")
+    if len(monthly) == 0:
+        st.info("Sem dados suficientes para mostrar séries temporais.")
         return
     
-    if 'order_id' not in df_to_use.columns:
-        st.warning("Coluna 'order_id' não encontrada para gráfico diário.")
-        return
+    fig = cached_figure('monthly', monthly, _monthly_figure)
+    st.plotly_chart(fig, use_container_width=True)
     
-    df_days = df_to_use.groupby(df_to_use['order_date'].dt.date).agg(
-        revenue=('total_value','sum'),
-        orders=('order_id','nunique')
-    ).reset_index()
+    st.markdown("#### Pedidos por Dia")
+    
+    # Modo streaming: a série diária já vem agregada nos KPIs
+    df_days = kpis.get('daily')
+    
+    if df_days is None:
+        df_to_use = df_filtered
+        
+        if 'order_date' not in df_to_use.columns:
+            st.warning("Coluna 'order_date' não encontrada para gráfico diário.")
+            return
+        
+        if 'order_id' not in df_to_use.columns:
+            st.warning("Coluna 'order_id' não encontrada para gráfico diário.")
+            return
+        
+        df_days = df_to_use.groupby(df_to_use['order_date'].dt.date).agg(
+            revenue=('total_value','sum'),
+            orders=('order_id','nunique')
+        ).reset_index()
     
     if len(df_days) == 0:
         st.info("Sem dados para mostrar por dia.")
+    elif len(df_days) > CHART_CONFIG['webgl_threshold']:
+        render_daily_downsampled(df_days)
     else:
-        fig2 = px.line(
-            df_days,
-            x='order_date',
-            y='revenue',
-            labels={'order_date':'Data','revenue':'Receita (R$)'}
-        )
-        fig2.update_traces(line_color='#0b6bf7', line_width=2)
+        fig2 = cached_figure('daily', df_days, _daily_figure)
         st.plotly_chart(fig2, use_container_width=True)
 
-def render_products_tab(df_filtered: pd.DataFrame):
-    """Renderiza a aba de produtos"""
-    st.subheader("🏆 Performance por Categoria/Produto")
-    
-    if 'product_category' not in df_filtered.columns:
-        st.info("Coluna 'product_category' não encontrada.")
-        return
-    
-    if 'order_id' not in df_filtered.columns or 'total_value' not in df_filtered.columns:
-        st.warning("Colunas necessárias não encontradas.")
-        return
-    
-    prod = df_filtered.groupby('product_category').agg(
-        revenue=('total_value','sum'),
-        orders=('order_id','nunique'),
-        qty=('quantity','sum')
-    ).reset_index().sort_values('revenue', ascending=False)
+def render_daily_downsampled(df_days: pd.DataFrame):
+    """Série diária longa: Scattergl com LTTB; aproximar a janela mostra a resolução total"""
+    days = pd.to_datetime(df_days['order_date'])
+    first, last = days.iloc[0].date(), days.iloc[-1].date()
+    window = st.slider(
+        "Janela do gráfico:",
+        min_value=first,
+        max_value=last,
+        value=(first, last),
+        format="DD/MM/YYYY"
+    )
+    lo = int(days.searchsorted(pd.Timestamp(window[0]), side='left'))
+    hi = int(days.searchsorted(pd.Timestamp(window[1]), side='right'))
+    visible = df_days.iloc[lo:hi]
     
-    if len(prod) == 0:
-        st.info("Sem dados de produtos para mostrar.")
-        return
+    spec = f"daily_lttb:{CHART_CONFIG['target_points']}"
+    fig, n_kept, payload_kb = cached_figure(spec, visible, _daily_downsampled_figure)
+    st.plotly_chart(fig, use_container_width=True)
     
+    # Tamanho do JSON enviado ao navegador; sem o LTTB cresce proporcionalmente aos pontos
+    full_kb = payload_kb * len(visible) / max(n_kept, 1)
+    st.caption(
+        f"{n_kept:,} de {len(visible):,} pontos (LTTB, WebGL) | "
+        f"payload {payload_kb:,.0f} KB (≈{full_kb:,.0f} KB com todos os pontos)"
+    )
+
+def _products_figure(prod: pd.DataFrame):
     figp = px.bar(
-        prod.head(8),
+        prod,
         x='revenue',
         y='product_category',
         orientation='h',
@@ -96,6 +142,32 @@ def render_products_tab(df_filtered: pd.DataFrame):
         color_continuous_scale='Blues'
     )
     figp.update_layout(height=420, yaxis={'categoryorder':'total ascending'})
+    return figp
+
+def render_products_tab(df_filtered: pd.DataFrame, prod: pd.DataFrame = None):
+    """Renderiza a aba de produtos (prod: tabela já agregada, opcional)"""
+    st.subheader("🏆 Performance por Categoria/Produto")
+    
+    if prod is None:
+        if df_filtered is None or 'product_category' not in df_filtered.columns:
+            st.info("Coluna 'product_category' não encontrada.")
+            return
+        
+        if 'order_id' not in df_filtered.columns or 'total_value' not in df_filtered.columns:
+            st.warning("Colunas necessárias não encontradas.")
+            return
+        
+        prod = df_filtered.groupby('product_category', observed=True).agg(
+            revenue=('total_value','sum'),
+            orders=('order_id','nunique'),
+            qty=('quantity','sum')
+        ).reset_index().sort_values('revenue', ascending=False)
+    
+    if len(prod) == 0:
+        st.info("Sem dados de produtos para mostrar.")
+        return
+    
+    figp = cached_figure('products_bar', prod.head(8), _products_figure)
     st.plotly_chart(figp, use_container_width=True)
     
     st.markdown("#### Tabela de categorias")
@@ -103,29 +175,9 @@ def render_products_tab(df_filtered: pd.DataFrame):
     prod_display['revenue'] = prod_display['revenue'].map(lambda x: f"R$ {x:,.2f}")
     st.dataframe(prod_display.reset_index(drop=True), use_container_width=True)
 
-def render_geography_tab(df_filtered: pd.DataFrame):
-    """Renderiza a aba de geografia"""
-    st.subheader("🗺️ Análise Geográfica")
-    
-    if 'customer_state' not in df_filtered.columns:
-        st.info("Coluna 'customer_state' não encontrada.")
-        return
-    
-    if 'order_id' not in df_filtered.columns or 'total_value' not in df_filtered.columns:
-        st.warning("Colunas necessárias não encontradas.")
-        return
-    
-    geo = df_filtered.groupby('customer_state').agg(
-        revenue=('total_value','sum'),
-        orders=('order_id','nunique')
-    ).reset_index().sort_values('revenue', ascending=False)
-    
-    if len(geo) == 0:
-        st.info("Sem dados geográficos para mostrar.")
-        return
-    
+def _geography_figure(geo: pd.DataFrame):
     figg = px.bar(
-        geo.head(10),
+        geo,
         x='customer_state',
         y='revenue',
         labels={'customer_state':'Estado','revenue':'Receita (R$)'},
@@ -133,38 +185,43 @@ def render_geography_tab(df_filtered: pd.DataFrame):
         color_continuous_scale='Purples'
     )
     figg.update_layout(height=420)
-    st.plotly_chart(figg, use_container_width=True)
+    return figg
 
-def render_payments_tab(df_filtered: pd.DataFrame):
-    """Renderiza a aba de pagamentos"""
-    st.subheader("💳 Métodos de Pagamento")
-    
-    if 'payment_method' not in df_filtered.columns:
-        st.info("Coluna 'payment_method' não encontrada.")
-        return
-    
-    if 'order_id' not in df_filtered.columns or 'total_value' not in df_filtered.columns:
-        st.warning("Colunas necessárias não encontradas.")
-        return
+def render_geography_tab(df_filtered: pd.DataFrame, geo: pd.DataFrame = None):
+    """Renderiza a aba de geografia (geo: tabela já agregada, opcional)"""
+    st.subheader("🗺️ Análise Geográfica")
     
-    pay = df_filtered.groupby('payment_method').agg(
-        orders=('order_id','nunique'),
-        revenue=('total_value','sum')
-    ).reset_index().sort_values('orders', ascending=False)
+    if geo is None:
+        if df_filtered is None or 'customer_state' not in df_filtered.columns:
+            st.info("Coluna 'customer_state' não encontrada.")
+            return
+        
+        if 'order_id' not in df_filtered.columns or 'total_value' not in df_filtered.columns:
+            st.warning("Colunas necessárias não encontradas.")
+            return
+        
+        geo = df_filtered.groupby('customer_state', observed=True).agg(
+            revenue=('total_value','sum'),
+            orders=('order_id','nunique')
+        ).reset_index().sort_values('revenue', ascending=False)
     
-    if len(pay) == 0:
-        st.info("Sem dados de pagamento para mostrar.")
+    if len(geo) == 0:
+        st.info("Sem dados geográficos para mostrar.")
         return
     
+    figg = cached_figure('geography_bar', geo.head(10), _geography_figure)
+    st.plotly_chart(figg, use_container_width=True)
+
+def _payments_pie_figure(pay: pd.DataFrame):
     figpay = px.pie(pay, names='payment_method', values='orders', hole=0.45)
     figpay.update_traces(
         textposition='outside',
         textinfo='percent+label',
         pull=[0.05 if i==0 else 0 for i in range(len(pay))]
     )
-    st.plotly_chart(figpay, use_container_width=True)
-    
-    st.markdown("#### Receita por método")
+    return figpay
+
+def _payments_bar_figure(pay: pd.DataFrame):
     figpay2 = px.bar(
         pay,
         x='payment_method',
@@ -174,4 +231,33 @@ def render_payments_tab(df_filtered: pd.DataFrame):
         color_continuous_scale='Greens'
     )
     figpay2.update_layout(height=380, xaxis_tickangle=-45)
+    return figpay2
+
+def render_payments_tab(df_filtered: pd.DataFrame, pay: pd.DataFrame = None):
+    """Renderiza a aba de pagamentos (pay: tabela já agregada, opcional)"""
+    st.subheader("💳 Métodos de Pagamento")
+    
+    if pay is None:
+        if df_filtered is None or 'payment_method' not in df_filtered.columns:
+            st.info("Coluna 'payment_method' não encontrada.")
+            return
+        
+        if 'order_id' not in df_filtered.columns or 'total_value' not in df_filtered.columns:
+            st.warning("Colunas necessárias não encontradas.")
+            return
+        
+        pay = df_filtered.groupby('payment_method', observed=True).agg(
+            orders=('order_id','nunique'),
+            revenue=('total_value','sum')
+        ).reset_index().sort_values('orders', ascending=False)
+    
+    if len(pay) == 0:
+        st.info("Sem dados de pagamento para mostrar.")
+        return
+    
+    figpay = cached_figure('payments_pie', pay, _payments_pie_figure)
+    st.plotly_chart(figpay, use_container_width=True)
+    
+    st.markdown("#### Receita por método")
+    figpay2 = cached_figure('payments_bar', pay, _payments_bar_figure)
     st.plotly_chart(figpay2, use_container_width=True)
\ No newline at end of file
@@ -29,13 +29,14 @@ def insight_card(title, description, icon="💡", color="#1e3c72", action=None):
     </div>
     """
 
-def render_insights_section(df_filtered, company_name, kpis):  # ← ADICIONAR kpis
-    """Renderiza a seção de insights automáticos"""
+def render_insights_section(df_filtered, company_name, kpis, insights=None):  # ← ADICIONAR kpis
+    """Renderiza a seção de insights automáticos (insights já gerados podem ser reaproveitados)"""
     st.markdown("---")
     st.markdown("###  Insights Automáticos")
     
     # Gerar insights inteligentes
-    insights = generate_smart_insights(kpis, df_filtered)
+    if insights is None:
+        insights = generate_smart_insights(kpis, df_filtered)
     
     # Mapear cores por tipo
     color_map = {
@@ -31,12 +31,18 @@ def render_kpi_cards(kpis: dict):
     total_items = kpis.get('total_items', 0)
     avg_ticket = kpis.get('avg_ticket', 0.0)
     
+    # Modo aproximado (HyperLogLog): pedidos/clientes são estimativas
+    approximate = kpis.get('approximate') or {}
+    approx_counts = approximate.get('counts', [])
+    orders_prefix = "≈ " if 'orders' in approx_counts else ""
+    customers_prefix = "≈ " if 'customers' in approx_counts else ""
+    
     with col1:
         st.markdown(
             card_html.format(
                 icon="🛒",
                 title="Total de Pedidos",
-                value=f"{total_orders:,}"
+                value=f"{orders_prefix}{total_orders:,}"
             ),
             unsafe_allow_html=True
         )
@@ -57,7 +63,7 @@ def render_kpi_cards(kpis: dict):
             card_html.format(
                 icon="👥",
                 title="Clientes Únicos",
-                value=f"{total_customers:,}"
+                value=f"{customers_prefix}{total_customers:,}"
             ),
             unsafe_allow_html=True
         )
@@ -81,4 +87,11 @@ def render_kpi_cards(kpis: dict):
                 value=ticket_formatted
             ),
             unsafe_allow_html=True
-        )
\ No newline at end of file
+        )
+    
+    if approx_counts:
+        error = approximate['relative_error']
+        st.caption(
+            f"≈ Contagens distintas estimadas com HyperLogLog: erro padrão relativo de "
+            f"{error:.1%} (~95% das estimativas ficam dentro de ±{2 * error:.1%})".replace(".", ",")
+        )
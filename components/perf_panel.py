@@ -0,0 +1,51 @@
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+
+from analytics.memo import FILTER_CACHE
+from components.charts import FIGURE_CACHE
+from config.settings import PERF_CONFIG
+from utils.dataset_registry import DATASETS
+
+def render_perf_panel(profile):
+    """Renderiza o painel recolhível com o tempo de cada etapa da execução atual"""
+    if profile is None or not PERF_CONFIG['panel'] or not profile.stages:
+        return
+
+    stages = pd.DataFrame(profile.to_records())
+    stages['label'] = [' ' * depth + name for depth, name in zip(stages['depth'], stages['stage'])]
+
+    with st.expander(f"⏱️ Performance desta execução ({profile.total_seconds * 1000:,.0f} ms)", expanded=False):
+        # Cascata: cada barra começa no instante em que a etapa começou
+        fig = go.Figure(go.Bar(
+            y=stages['label'],
+            x=stages['ms'],
+            base=stages['start_ms'],
+            orientation='h',
+            marker_color=['#1e3c72' if depth == 0 else '#2a5298' for depth in stages['depth']],
+            hovertemplate='%{y}<br>início: %{base:,.1f} ms<br>duração: %{x:,.1f} ms<extra></extra>'
+        ))
+        fig.update_layout(
+            height=max(200, 26 * len(stages) + 60),
+            xaxis_title='ms desde o início da execução',
+            yaxis=dict(autorange='reversed'),
+            margin=dict(l=10, r=10, t=10, b=40)
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        columns = ['stage', 'start_ms', 'ms'] + (['peak_mb'] if 'peak_mb' in stages.columns else [])
+        st.dataframe(stages[columns], hide_index=True, use_container_width=True)
+
+        for label, cache in [("Cache de filtros", FILTER_CACHE), ("Cache de figuras", FIGURE_CACHE)]:
+            stats = cache.stats()
+            st.caption(
+                f"{label}: {stats['entries']}/{stats['max_entries']} entradas | "
+                f"{stats['hits']} acertos, {stats['misses']} falhas ({stats['hit_rate']:.0%})"
+            )
+
+        stats = DATASETS.stats()
+        st.caption(
+            f"Datasets compartilhados: {stats['entries']} ({stats['in_use']} em uso, {stats['handles']} sessões) | "
+            f"{stats['bytes'] / 1024**2:,.1f} de {stats['max_bytes'] / 1024**2:,.0f} MB | "
+            f"{stats['hits']} reaproveitados, {stats['evictions']} descartados"
+        )
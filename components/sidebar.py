@@ -1,9 +1,27 @@
 import streamlit as st
 import base64
+import pandas as pd
+from io import BytesIO
 from pathlib import Path
 from utils.sample_data import create_sample_data
-from utils.data_loader import load_csv_robust
-from utils.data_processor import process_dataframe
+from utils.data_processor import (
+    process_dataframe, compact_dataframe, append_dataframe, memory_footprint, restore_ids, PROCESSOR_VERSION
+)
+from utils.data_loader import expand_uploads
+from utils.dataset_cache import (
+    load_processed_csv, load_processed_files, open_prepared_dataset, store_prepared_dataset
+)
+from utils.dataset_store import (
+    store_enabled, list_companies, company_snapshot, company_dataset_key, prune_partitions, read_partitions,
+    save_company_dataset, delete_company
+)
+from utils.date_index import sort_by_date
+from analytics.streaming import aggregate_csv_streaming
+from analytics.cube import merge_cubes
+from utils.background import BackgroundJob
+from utils.dataset_registry import DATASETS
+from utils.perf import stage
+from config.settings import STORE_CONFIG
 
 def get_svg_as_base64(svg_path):
     """Converte SVG em base64 para usar em HTML"""
@@ -14,6 +32,275 @@ def get_svg_as_base64(svg_path):
     except:
         return None
 
+def _prepare_dataset(df):
+    """Compacta o dataframe processado e ordena por data (não usa a sessão: roda no job)"""
+    with stage('compact_dataframe'):
+        df, id_lookup, memory_report = compact_dataframe(df)
+    with stage('sort_by_date'):
+        df = sort_by_date(df)
+    return df, id_lookup, memory_report
+
+def _open_session_dataset(dataset_key, load):
+    """
+    Abre o dataset de dataset_key na sessão. Se outra sessão já o abriu, usa
+    a mesma cópia do registro; senão load() devolve o dataframe processado,
+    que é compactado e ordenado por data.
+    """
+    handle = _cached_dataset(dataset_key)
+    if handle is None:
+        handle = _register_dataset(dataset_key, load())
+    return _store_session_dataset(handle)
+
+def _cached_dataset(dataset_key):
+    """Handle do registro ou do Arrow já preparado em disco (mapeado); None se é preciso carregar"""
+    handle = DATASETS.acquire(dataset_key)
+    if handle is None:
+        with stage('open_prepared_dataset'):
+            prepared = open_prepared_dataset(dataset_key)
+        if prepared is not None:
+            handle = DATASETS.put(dataset_key, *prepared)
+    return handle
+
+def _mapped_dataset(dataset_key, prepared):
+    """Grava o dataset preparado em Arrow e o reabre mapeado, liberando a cópia em memória"""
+    with stage('store_prepared_dataset'):
+        stored = store_prepared_dataset(dataset_key, *prepared)
+    return (open_prepared_dataset(dataset_key) if stored else None) or prepared
+
+def _register_dataset(dataset_key, df):
+    """Handle do registro para um dataframe processado (roda no job; não usa a sessão)"""
+    return DATASETS.put(dataset_key, *_mapped_dataset(dataset_key, _prepare_dataset(df)))
+
+def _store_session_dataset(handle):
+    """Troca o dataset da sessão pelo do handle, de uma vez, e libera o anterior"""
+    _release_session_dataset()
+    st.session_state['dataset'] = handle
+    st.session_state['applied_deltas'] = {}
+    # Novo uploader de incrementais: o anterior ainda guarda o arquivo do dataset antigo
+    st.session_state['delta_generation'] = st.session_state.get('delta_generation', 0) + 1
+    st.session_state.pop('stream_kpis', None)
+    return handle.df
+
+def _release_session_dataset():
+    """Tira o dataset da sessão; o registro o descarta quando nenhuma sessão o usar"""
+    st.session_state.pop('store_view', None)
+    handle = st.session_state.pop('dataset', None)
+    if handle is not None:
+        handle.release()
+
+def _session_df():
+    """Dataframe da sessão (do registro compartilhado) ou None"""
+    handle = st.session_state.get('dataset')
+    return handle.df if handle is not None else None
+
+def _load_files_job(uploaded_files):
+    """Target do job de upload: lê, processa e prepara os arquivos fora do script"""
+    def target(job):
+        def on_read(n_bytes, n_lines):
+            job.check_cancelled()
+            job.add(bytes_read=n_bytes, rows=n_lines)
+        
+        def on_file(name, done, total, rows):
+            job.check_cancelled()
+            job.report(file=name, files_done=done)
+        
+        # Conteúdo já aberto por outra sessão ou já preparado em disco não é relido
+        loaded, digest = load_processed_files(
+            uploaded_files,
+            progress=on_file,
+            on_start=lambda files, total_bytes: job.report(files=files, bytes_total=total_bytes),
+            on_read=on_read,
+            cached=_cached_dataset
+        )
+        if not isinstance(loaded, pd.DataFrame):
+            return loaded
+        job.check_cancelled()
+        job.report(phase='prepare')
+        return _register_dataset(digest, loaded)
+    return target
+
+def _streaming_job(uploaded_files):
+    """Target do job do modo streaming: agrega os arquivos em chunks"""
+    def target(job):
+        def on_rows(rows):
+            job.check_cancelled()
+            job.report(rows=rows)
+        
+        sources = [BytesIO(raw) for _, raw in expand_uploads(uploaded_files)]
+        job.report(files=len(sources), bytes_total=sum(len(s.getvalue()) for s in sources))
+        return aggregate_csv_streaming(sources, progress=on_rows)
+    return target
+
+@st.fragment(run_every=0.5)
+def _render_load_progress(job):
+    """Andamento do job, atualizado sem rerun do app; ao terminar dispara o rerun que troca o dataset"""
+    if not job.running:
+        st.rerun()
+    
+    progress = job.snapshot()
+    bytes_total = progress.get('bytes_total') or 0
+    bytes_read = progress.get('bytes_read', 0)
+    text = f"{progress.get('rows', 0):,} linhas lidas"
+    if bytes_read:
+        text = f"{bytes_read / 1024**2:,.1f} de {bytes_total / 1024**2:,.1f} MB · " + text
+    if progress.get('files', 0) > 1:
+        text += f" · arquivo {progress.get('files_done', 0)}/{progress['files']}"
+    if progress.get('phase') == 'prepare':
+        text = "Compactando e ordenando o dataset..."
+    
+    st.progress(min(bytes_read / bytes_total, 1.0) if bytes_total else 0.0, text=text)
+    st.caption(f"⏳ Carregando em segundo plano há {job.elapsed:,.0f}s")
+    if st.button("Cancelar carregamento", key='cancel_load'):
+        job.cancel()
+
+def _background_load(key, target):
+    """
+    Job de carregamento da sessão para key. Reruns durante a carga (filtros,
+    cliques) reaproveitam o mesmo job; um upload diferente cancela o anterior.
+    """
+    job = st.session_state.get('load_job')
+    if job is None or job.key != key:
+        if job is not None:
+            job.cancel()
+        job = BackgroundJob(key, target).start()
+        st.session_state['load_job'] = job
+    if job.running:
+        with st.sidebar:
+            _render_load_progress(job)
+    return job
+
+def _job_result(job):
+    """Resultado do job concluído (o job sai da sessão); None enquanto roda ou se foi cancelado"""
+    if job.status == 'done':
+        st.session_state.pop('load_job', None)
+        return job.result
+    if job.status == 'error':
+        st.session_state.pop('load_job', None)
+        raise job.error
+    if job.status == 'cancelled':
+        st.sidebar.info("Carregamento cancelado.")
+        if st.sidebar.button("Carregar novamente"):
+            st.session_state.pop('load_job', None)
+            st.rerun()
+    return None
+
+def _cancel_background_load():
+    job = st.session_state.pop('load_job', None)
+    if job is not None:
+        job.cancel()
+
+def _append_session_dataset(delta, delta_digest):
+    """
+    Anexa um delta processado ao dataset da sessão. O resultado é um novo
+    dataset no registro (o anterior pode estar aberto em outras sessões);
+    cubo e índice por data são atualizados só com as linhas novas e, se não
+    der, o app os reconstrói. O resultado fica em memória: regravá-lo em
+    Arrow custaria o histórico inteiro em disco a cada anexo.
+    """
+    old = st.session_state['dataset']
+    delta_bytes = memory_footprint(delta)
+    with stage('append_dataframe'):
+        df, delta, id_lookup, report = append_dataframe(old.df, old.id_lookup, delta)
+    if report['rows_added'] == 0:
+        return report
+    
+    dataset_key = f"{old.key}+{delta_digest}"
+    handle = DATASETS.acquire(dataset_key)  # outra sessão já anexou este delta a este dataset?
+    if handle is not None:
+        _replace_session_dataset(handle)
+        return report
+    
+    artifacts = {}
+    cube = old.entry.artifacts.get('cube')
+    if cube is not None:
+        try:
+            with stage('merge_cubes'):
+                artifacts['cube'] = merge_cubes(cube, delta)
+        except ValueError as e:
+            print(f"Cubo será reconstruído: {e}")
+    index = old.entry.artifacts.get('date_index')
+    if index is not None and report['in_order']:
+        with stage('extend_date_index'):
+            artifacts['date_index'] = index.extend(df, len(old.df))
+    
+    memory_report = {
+        'before': (old.memory_report or {'before': 0})['before'] + delta_bytes,
+        'after': memory_footprint(df)
+    }
+    _replace_session_dataset(DATASETS.put(dataset_key, df, id_lookup, memory_report, artifacts))
+    return report
+
+def _replace_session_dataset(handle):
+    """Troca o dataset da sessão mantendo os incrementais já aplicados e a empresa salva aberta"""
+    applied = st.session_state.get('applied_deltas', {})
+    generation = st.session_state.get('delta_generation', 0)
+    view = st.session_state.get('store_view')
+    _store_session_dataset(handle)
+    st.session_state['applied_deltas'] = applied
+    st.session_state['delta_generation'] = generation
+    if view is not None:
+        st.session_state['store_view'] = view
+
+def _open_company(cid):
+    """
+    Abre a empresa salva com os últimos STORE_CONFIG['initial_months'] meses.
+    Versão e partições vêm de uma única leitura do catálogo e ficam na sessão:
+    os meses que o filtro de período pedir depois são lidos dessa mesma versão
+    (ver extend_company_period).
+    """
+    version, partitions = company_snapshot(cid)
+    initial = partitions.iloc[-STORE_CONFIG['initial_months']:]
+    months = initial['month'].tolist()
+    def load():
+        with stage('load_company_dataset'):
+            return read_partitions(initial if len(initial) else partitions)
+    dataset_key = company_dataset_key(cid, version, months[0] if months else None, months[-1] if months else None)
+    _open_session_dataset(dataset_key, load)
+    view = {'company_id': cid, 'version': version, 'partitions': partitions, 'months': set(months)}
+    if len(initial):
+        view['period'] = (pd.Timestamp(partitions['min_date'].iloc[0]).date(),
+                          pd.Timestamp(partitions['max_date'].iloc[-1]).date())
+        view['selected'] = (pd.Timestamp(initial['min_date'].iloc[0]).date(), view['period'][1])
+    st.session_state['store_view'] = view
+
+def _load_company_months(view, partitions):
+    """Lê as partições da empresa aberta e as anexa ao dataset da sessão, como um incremental"""
+    with stage('load_company_dataset'):
+        months = read_partitions(partitions)
+    _append_session_dataset(months, f"{view['version']}-{','.join(partitions['month'])}")
+    view['months'] |= set(partitions['month'])
+
+def company_period():
+    """
+    (primeiro dia, último dia, período selecionado) da empresa salva aberta na
+    sessão, para o filtro de período do dashboard; None fora de uma empresa salva
+    """
+    view = st.session_state.get('store_view')
+    if view is None or 'period' not in view:
+        return None
+    return view['period'] + (view['selected'],)
+
+def extend_company_period(start_date, end_date) -> bool:
+    """
+    Com uma empresa salva aberta, lê os meses do período do filtro que ainda
+    não estão na sessão e os anexa ao dataset. Retorna True se o dataset mudou.
+    """
+    view = st.session_state.get('store_view')
+    if view is None:
+        return False
+    view['selected'] = (start_date, end_date)
+    wanted = prune_partitions(view['partitions'], start_date, end_date)
+    missing = wanted[~wanted['month'].isin(view['months'])]
+    if len(missing) == 0:
+        return False
+    try:
+        _load_company_months(view, missing)
+    except FileNotFoundError:
+        # A versão aberta foi substituída há mais de STORE_CONFIG['old_version_seconds']
+        st.warning("A versão salva desta empresa mudou. Abra a empresa novamente para ampliar o período.")
+        return False
+    return True
+
 def render_sidebar():
     """Renderiza a barra lateral e retorna df e company_name"""
     
@@ -86,26 +373,31 @@ def render_sidebar():
             """, unsafe_allow_html=True)
         else:
             if st.sidebar.button("🏠 Página Inicial", use_container_width=True, type="secondary"):
-                if 'df' in st.session_state:
-                    del st.session_state['df']
+                _release_session_dataset()
                 if 'company' in st.session_state:
                     del st.session_state['company']
+                st.session_state.pop('stream_kpis', None)
+                _cancel_background_load()
                 st.rerun()
     else:
         if st.sidebar.button("🏠 Página Inicial", use_container_width=True, type="secondary"):
-            if 'df' in st.session_state:
-                del st.session_state['df']
+            _release_session_dataset()
             if 'company' in st.session_state:
                 del st.session_state['company']
+            st.session_state.pop('stream_kpis', None)
+            _cancel_background_load()
             st.rerun()
     
     st.sidebar.markdown("---")
     
     st.sidebar.subheader("Fonte de Dados")
     
+    data_options = ["Usar dados de exemplo", "Upload de arquivo CSV"]
+    if store_enabled():
+        data_options.append("Empresa salva")
     data_option = st.sidebar.radio(
         "Selecionar dataset",
-        ["Usar dados de exemplo", "Upload de arquivo CSV"]
+        data_options
     )
     
     company_name = "Empresa de Exemplo"
@@ -113,37 +405,166 @@ def render_sidebar():
     if data_option == "Upload de arquivo CSV":
         st.sidebar.subheader("Informações da Empresa")
         company_name = st.sidebar.text_input("Nome da empresa", value="Empresa de Exemplo")
+        streaming = st.sidebar.checkbox(
+            "Modo streaming (arquivos grandes)",
+            help="Lê o CSV em blocos e guarda apenas os agregados. Usa pouca memória, mas desativa os filtros."
+        )
     
     df = None
     
     if data_option == "Usar dados de exemplo":
         if st.sidebar.button("Carregar dados de exemplo"):
-            df = create_sample_data(1000)
-            st.session_state['df'] = df
+            def load_sample():
+                with stage('create_sample_data'):
+                    return process_dataframe(create_sample_data(1000))
+            df = _open_session_dataset(f"sample-1000-v{PROCESSOR_VERSION}", load_sample)
+            st.session_state.pop('upload_id', None)
             st.session_state['company'] = company_name
             st.success("Dados de exemplo carregados.")
             st.rerun()
         else:
-            if 'df' in st.session_state:
-                df = st.session_state['df']
+            if 'dataset' in st.session_state:
+                df = _session_df()
+                company_name = st.session_state.get('company', company_name)
+    elif data_option == "Empresa salva":
+        companies = list_companies()
+        if len(companies) == 0:
+            st.sidebar.info("Nenhuma empresa salva. Carregue um CSV e use \"Salvar dados da empresa\".")
+        else:
+            names = dict(zip(companies['company_id'], companies['name']))
+            cid = st.sidebar.selectbox("Empresa", list(names), format_func=names.get)
+            help_text = (
+                f"Abre os últimos {STORE_CONFIG['initial_months']} meses; ampliar o período "
+                "nos filtros do dashboard lê os demais do disco."
+            )
+            if st.sidebar.button("Abrir empresa", help=help_text):
+                try:
+                    _open_company(cid)
+                    _cancel_background_load()
+                    st.session_state.pop('upload_id', None)
+                    st.session_state['company'] = names[cid]
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Erro ao abrir empresa: {e}")
+                    return None, company_name
+            with st.sidebar.expander("🗑️ Excluir empresa salva"):
+                confirm = st.checkbox(f"Excluir '{names[cid]}' e todos os dados salvos", key='confirm_delete_company')
+                if st.button("Excluir", disabled=not confirm, key='delete_company'):
+                    try:
+                        delete_company(cid)
+                        st.session_state.pop('confirm_delete_company', None)
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"Erro ao excluir empresa: {e}")
+            if 'dataset' in st.session_state:
+                df = _session_df()
                 company_name = st.session_state.get('company', company_name)
     else:
-        uploaded_file = st.sidebar.file_uploader("Selecione o arquivo CSV", type=['csv'])
-        if uploaded_file is not None:
+        uploaded_files = st.sidebar.file_uploader(
+            "Selecione os arquivos CSV (ou .zip)",
+            type=['csv', 'zip'],
+            accept_multiple_files=True,
+            help="Vários arquivos (ex.: um por mês) são combinados num único dataset."
+        )
+        if uploaded_files and streaming:
             try:
-                df = load_csv_robust(uploaded_file)
-                df = process_dataframe(df)
-                st.session_state['df'] = df
+                # Só reprocessa se os arquivos mudaram desde o último rerun
+                file_key = tuple((f.name, f.size) for f in uploaded_files)
+                if st.session_state.get('stream_file') != file_key or 'stream_kpis' not in st.session_state:
+                    job = _background_load(('stream', file_key), _streaming_job(uploaded_files))
+                    kpis = _job_result(job)
+                    if kpis is None:
+                        return None, company_name
+                    st.session_state['stream_kpis'] = kpis
+                    st.session_state['stream_file'] = file_key
+                _release_session_dataset()
                 st.session_state['company'] = company_name
-                st.success("Arquivo carregado e processado.")
+                st.success("Arquivo processado em modo streaming.")
+            except Exception as e:
+                st.error(f"Erro ao ler arquivo: {e}")
+                return None, company_name
+        elif uploaded_files:
+            try:
+                # Reruns com o mesmo upload (ex.: mexer num filtro) reaproveitam o df da sessão;
+                # arquivos com conteúdo já visto vêm do cache em disco. A carga roda em
+                # segundo plano e, enquanto isso, o dataset anterior (se houver) segue na tela.
+                upload_id = tuple(getattr(f, 'file_id', None) or (f.name, f.size) for f in uploaded_files)
+                if st.session_state.get('upload_id') == upload_id and 'dataset' in st.session_state:
+                    df = _session_df()
+                else:
+                    job = _background_load(('upload', upload_id), _load_files_job(uploaded_files))
+                    handle = _job_result(job)
+                    if handle is not None:
+                        df = _store_session_dataset(handle)
+                        st.session_state['upload_id'] = upload_id
+                    else:
+                        df = _session_df()
+                st.session_state['company'] = company_name
+                if st.session_state.get('upload_id') == upload_id:
+                    st.success("Arquivo carregado e processado." if len(uploaded_files) == 1 else
+                               f"{len(uploaded_files)} arquivos carregados e processados.")
             except Exception as e:
                 st.error(f"Erro ao ler arquivo: {e}")
                 return None, company_name
         else:
-            if 'df' in st.session_state:
-                df = st.session_state['df']
+            if 'dataset' in st.session_state:
+                df = _session_df()
                 company_name = st.session_state.get('company', company_name)
     
+    # Exportações incrementais (ex.: pedidos do dia) entram no dataset carregado
+    if df is not None and 'order_id' in df.columns:
+        delta_file = st.sidebar.file_uploader(
+            "Adicionar dados incrementais (CSV)",
+            type=['csv'],
+            key=f"delta_upload_{st.session_state.get('delta_generation', 0)}",
+            help="As linhas são anexadas ao dataset atual; pedidos já existentes (mesmo order_id) são ignorados."
+        )
+        if delta_file is not None:
+            delta_id = getattr(delta_file, 'file_id', None) or (delta_file.name, delta_file.size)
+            applied = st.session_state.setdefault('applied_deltas', {})
+            try:
+                if delta_id not in applied:
+                    delta, digest = load_processed_csv(delta_file)
+                    applied[delta_id] = _append_session_dataset(delta, digest)
+                    df = _session_df()
+                report = applied[delta_id]
+                st.sidebar.caption(
+                    f"➕ {delta_file.name}: {report['rows_added']:,} linhas novas, "
+                    f"{report['duplicates']:,} duplicadas ignoradas"
+                )
+            except Exception as e:
+                st.error(f"Erro ao anexar arquivo: {e}")
+    
+    # Grava o dataset atual (com os incrementais) para abrir depois sem novo upload
+    if df is not None and store_enabled():
+        if st.sidebar.button(
+            "💾 Salvar dados da empresa",
+            help=f"Substitui a versão salva de '{company_name}' pelo dataset atual."
+        ):
+            try:
+                # Empresa salva aberta em parte: salvar só o período carregado apagaria os outros meses
+                view = st.session_state.get('store_view')
+                if view is not None:
+                    rest = view['partitions'][~view['partitions']['month'].isin(view['months'])]
+                    if len(rest):
+                        _load_company_months(view, rest)
+                        df = _session_df()
+                with stage('save_company_dataset'):
+                    entry = save_company_dataset(
+                        company_name, restore_ids(df, st.session_state['dataset'].id_lookup)
+                    )
+                st.sidebar.caption(f"✅ '{company_name}' salva: {entry['rows']:,} linhas")
+            except Exception as e:
+                st.error(f"Erro ao salvar empresa: {e}")
+    
+    memory_report = st.session_state['dataset'].memory_report if 'dataset' in st.session_state else None
+    if df is not None and memory_report:
+        st.sidebar.caption(
+            f"💾 Memória do dataset: {memory_report['before'] / 1024**2:,.2f} MB → "
+            f"{memory_report['after'] / 1024**2:,.2f} MB"
+            + (" (mapeado do disco)" if memory_report.get('mapped') else "")
+        )
+    
     st.sidebar.markdown("<div style='padding-bottom: 100px;'></div>", unsafe_allow_html=True)
     
     st.sidebar.markdown("""
@@ -1,3 +1,5 @@
+import os
+
 APP_CONFIG = {
     'page_title': 'SIG E-commerce - Dashboard Gerencial',
     'page_icon': '📊',
@@ -13,4 +15,75 @@ COLORS = {
     'warning': '#ffc107',
     'info': '#17a2b8',
     'danger': '#dc3545'
-}
\ No newline at end of file
+}
+
+STREAMING_CONFIG = {
+    'chunk_rows': 200_000  # linhas por chunk no modo streaming
+}
+
+INGEST_CONFIG = {
+    'max_workers': None,               # processos para vários arquivos (None: um por núcleo)
+    'parallel_min_bytes': 8 * 1024 ** 2,  # abaixo disso (total) os arquivos são lidos no próprio processo
+    'start_method': 'spawn',              # 'forkserver' também serve; 'fork' não é seguro com threads
+    'poll_seconds': 0.25                  # intervalo para perceber o cancelamento enquanto o pool processa
+}
+
+CACHE_CONFIG = {
+    'enabled': True,
+    'dir': '.cache/datasets',          # uploads processados em Parquet
+    'max_bytes': 2 * 1024 ** 3,        # acima disso remove os menos usados
+    'memory_map': True                 # datasets prontos em Arrow IPC, abertos mapeados em memória
+}
+
+STORE_CONFIG = {
+    'enabled': True,
+    'dir': 'store',                 # partições Parquet por empresa/mês + catalog.sqlite
+    'old_version_seconds': 60 * 60,  # versão substituída fica em disco por esse tempo (leituras em andamento)
+    'initial_months': 3              # meses abertos com a empresa; o filtro de período carrega os demais
+}
+
+MEMO_CONFIG = {
+    'max_entries': 64  # resultados (KPIs, tabelas e insights) por filtro, compartilhados entre sessões
+}
+
+INSIGHTS_CONFIG = {
+    'segment_min_share': 5.0,    # % da receita da dimensão para um segmento entrar nos alertas de crescimento/queda
+    'max_segment_insights': 3,   # alertas por segmento (os de maior variação)
+    # Concentração: % da receita da dimensão no maior segmento (alta, moderada); estado e categoria têm regras próprias
+    'concentration': {
+        'payment_method': (60.0, 40.0)
+    }
+}
+
+REGISTRY_CONFIG = {
+    'max_bytes': 4 * 1024 ** 3,   # datasets sem sessão aberta saem (os menos usados primeiro) acima disso
+    'idle_seconds': 15 * 60       # dataset sem sessão há mais tempo que isso sai do registro
+}
+
+PERF_CONFIG = {
+    # Instrumentação por etapa (tempo e memória); ligue com SIG_PERF=1
+    'enabled': os.environ.get('SIG_PERF', '') == '1',
+    'track_memory': os.environ.get('SIG_PERF_MEMORY', '1') == '1',  # tracemalloc deixa as etapas mais lentas
+    'log': True,      # uma linha JSON por etapa no terminal
+    'panel': True     # painel "Performance" no fim da página
+}
+
+CHART_CONFIG = {
+    'webgl_threshold': 2000,   # acima desse nº de dias a série diária usa Scattergl + LTTB
+    'target_points': 1500,     # pontos enviados ao navegador após o LTTB
+    'figure_cache_entries': 64  # figuras reaproveitadas por (gráfico, tabela agregada)
+}
+
+HLL_CONFIG = {
+    # Contagens distintas aproximadas (HyperLogLog) no cubo; ligue com SIG_HLL=1
+    'enabled': os.environ.get('SIG_HLL', '') == '1',
+    'precision': 12   # 2^12 registradores por sketch: erro padrão relativo ~1,6%
+}
+
+BACKEND_CONFIG = {
+    # Engine dos KPIs, abas e insights: 'pandas' (cubo em memória) ou 'duckdb' (SQL); SIG_BACKEND=duckdb
+    'engine': os.environ.get('SIG_BACKEND', 'pandas'),
+    'threads': None,                  # threads do DuckDB (None: todos os núcleos)
+    'memory_limit': None,             # ex.: '4GB'; acima disso o DuckDB grava em disco
+    'temp_directory': '.cache/duckdb'  # onde o DuckDB faz spill
+}
@@ -0,0 +1,39 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Os módulos do dashboard são importados a partir da raiz do repositório
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from config.settings import HLL_CONFIG
+from kpi_reference import baseline_kpis
+from utils.data_processor import compact_dataframe, process_dataframe
+from utils.date_index import sort_by_date
+from utils.sample_data import generate_sample_data
+
+@pytest.fixture(autouse=True)
+def exact_counts(monkeypatch):
+    """Contagens distintas exatas no cubo, mesmo com SIG_HLL=1 no ambiente"""
+    monkeypatch.setitem(HLL_CONFIG, 'enabled', False)
+
+@pytest.fixture(scope='session')
+def raw_df() -> pd.DataFrame:
+    """Dados de exemplo processados (semente fixa) com nulos e pedidos de vários itens"""
+    df = process_dataframe(generate_sample_data(20000, seed=7))
+    df = df.astype({c: 'object' for c in df.select_dtypes('category')})
+    df.loc[df.index % 97 == 0, 'customer_state'] = None
+    df.loc[df.index % 89 == 0, 'customer_id'] = None
+    df.loc[df.index % 7 == 1, 'order_id'] = df['order_id'].shift(1)
+    return sort_by_date(df)
+
+@pytest.fixture(scope='session')
+def sample_df(raw_df) -> pd.DataFrame:
+    """raw_df compactado (ids em códigos, categorias), como o app guarda na sessão"""
+    return sort_by_date(compact_dataframe(raw_df)[0])
+
+@pytest.fixture(scope='session')
+def expected(raw_df) -> dict:
+    """KPIs de referência de raw_df (ver kpi_reference.baseline_kpis)"""
+    return baseline_kpis(raw_df)
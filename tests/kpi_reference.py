@@ -0,0 +1,74 @@
+"""Regras originais do calculate_kpis (groupby/nunique sobre os IDs originais), referência dos testes"""
+import numpy as np
+import pandas as pd
+import pytest
+
+DIMENSIONS = {'product_category': 'by_category', 'customer_state': 'by_state', 'payment_method': 'by_payment'}
+
+def baseline_kpis(df: pd.DataFrame) -> dict:
+    """Referência: as regras do calculate_kpis original, com groupby/nunique sobre os IDs originais"""
+    periods = df['order_date'].dt.to_period('M').astype(str)
+    monthly = df.groupby(periods).agg(
+        orders=('order_id', 'nunique'),
+        revenue=('total_value', 'sum'),
+        customers=('customer_id', 'nunique'),
+        items=('quantity', 'sum')
+    )
+    kpis = {
+        'total_orders': df['order_id'].nunique(),
+        'total_revenue': float(df['total_value'].sum()),
+        'total_customers': df['customer_id'].nunique(),
+        'total_items': int(df['quantity'].sum()),
+        'avg_ticket': float(df.groupby('order_id')['total_value'].sum().mean()) if df['order_id'].notna().any() else 0.0,
+        'monthly': monthly
+    }
+    for column, key in DIMENSIONS.items():
+        kpis[key] = df.groupby(column, observed=True).agg(
+            revenue=('total_value', 'sum'), orders=('order_id', 'nunique'), qty=('quantity', 'sum')
+        )
+    return kpis
+
+def assert_matches_baseline(kpis: dict, expected: dict, count_rtol: float = 0.0):
+    """Totais, série mensal e tabelas por dimensão contra baseline_kpis (contagens com tolerância opcional)"""
+    def counts(actual, wanted):
+        np.testing.assert_allclose(np.asarray(actual, dtype='float64'), np.asarray(wanted, dtype='float64'),
+                                   rtol=count_rtol, atol=0)
+
+    counts(kpis['total_orders'], expected['total_orders'])
+    counts(kpis['total_customers'], expected['total_customers'])
+    assert kpis['total_items'] == expected['total_items']
+    assert kpis['total_revenue'] == pytest.approx(expected['total_revenue'], rel=1e-9)
+    if count_rtol == 0:
+        assert kpis['avg_ticket'] == pytest.approx(expected['avg_ticket'], rel=1e-9)
+
+    monthly = kpis['monthly'].set_index('period').loc[expected['monthly'].index]
+    np.testing.assert_allclose(monthly['revenue'], expected['monthly']['revenue'], rtol=1e-9)
+    np.testing.assert_array_equal(monthly['items'], expected['monthly']['items'])
+    counts(monthly['orders'], expected['monthly']['orders'])
+    counts(monthly['customers'], expected['monthly']['customers'])
+
+    for column, key in DIMENSIONS.items():
+        table = kpis[key].astype({column: str}).set_index(column)
+        wanted = expected[key]
+        assert sorted(table.index) == sorted(wanted.index.astype(str))
+        table = table.loc[wanted.index.astype(str)]
+        np.testing.assert_allclose(table['revenue'], wanted['revenue'], rtol=1e-9)
+        np.testing.assert_array_equal(table['qty'], wanted['qty'])
+        counts(table['orders'], wanted['orders'])
+
+def filters(df: pd.DataFrame) -> list:
+    """Filtros (início, fim, estados) dentro do período dos dados"""
+    lo, hi = df['order_date'].min(), df['order_date'].max()
+    return [
+        (lo + pd.Timedelta(days=30), hi - pd.Timedelta(days=45), None),
+        (lo, hi, ['SP']),
+        (lo + pd.Timedelta(days=10), hi - pd.Timedelta(days=100), ['RJ', 'MG', 'BA'])
+    ]
+
+def apply_filter(df: pd.DataFrame, start, end, states) -> pd.DataFrame:
+    """O filtro do dashboard com máscaras booleanas (dias inteiros de start a end)"""
+    days = df['order_date'].dt.normalize()
+    mask = (days >= start.normalize()) & (days <= end.normalize())
+    if states:
+        mask &= df['customer_state'].isin(states)
+    return df[mask]
@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+
+from kpi_reference import assert_matches_baseline
+
+from analytics.backends import PandasBackend, kpis_differences
+
+duckdb = pytest.importorskip('duckdb')
+
+from analytics.backends import DuckDBBackend  # noqa: E402
+
+@pytest.fixture(scope='module')
+def sources(sample_df):
+    pandas_backend, duckdb_backend = PandasBackend(), DuckDBBackend(threads=1)
+    return (
+        (pandas_backend, pandas_backend.prepare(sample_df)),
+        (duckdb_backend, duckdb_backend.prepare(sample_df))
+    )
+
+# Filtros (início, fim, estados) a partir do primeiro/último dia e da lista de estados
+FILTERS = {
+    'sem filtro de estado': lambda lo, hi, states: (lo, hi, None),
+    'lista de estados vazia': lambda lo, hi, states: (lo, hi, []),
+    'período sem dados': lambda lo, hi, states: (hi + pd.Timedelta(days=5), hi + pd.Timedelta(days=9), None),
+    'um estado': lambda lo, hi, states: (lo, hi, ['SP']),
+    'um estado num trecho': lambda lo, hi, states: (lo + pd.Timedelta(days=40), hi - pd.Timedelta(days=60), ['RJ']),
+    'todos os estados': lambda lo, hi, states: (lo, hi, states),
+    'vários estados num trecho': lambda lo, hi, states: (
+        lo + pd.Timedelta(days=10), hi - pd.Timedelta(days=100), ['SP', 'MG', 'BA']
+    )
+}
+
+def _filter(df, case):
+    states = sorted(df['customer_state'].dropna().unique())
+    return FILTERS[case](df['order_date'].min(), df['order_date'].max(), states)
+
+@pytest.mark.parametrize('case', list(FILTERS))
+def test_duckdb_matches_pandas(sources, sample_df, case):
+    (pandas_backend, cube), (duckdb_backend, source) = sources
+    start, end, states = _filter(sample_df, case)
+
+    expected = pandas_backend.kpis(cube, start, end, states)
+    actual = duckdb_backend.kpis(source, start, end, states)
+
+    assert kpis_differences(expected, actual) == []
+    assert kpis_differences(actual, expected) == []
+
+def test_duckdb_matches_baseline(sources, sample_df, expected):
+    _, (duckdb_backend, source) = sources
+
+    kpis = duckdb_backend.kpis(source, sample_df['order_date'].min(), sample_df['order_date'].max())
+
+    assert_matches_baseline(kpis, expected)
+
+def test_all_states_excludes_null_state(sources, sample_df):
+    (pandas_backend, cube), (duckdb_backend, source) = sources
+    start, end, states = _filter(sample_df, 'todos os estados')
+
+    everything = pandas_backend.kpis(cube, start, end, None)
+    selected = duckdb_backend.kpis(source, start, end, states)
+
+    # Há linhas sem estado: selecionar todos os estados não equivale a não filtrar
+    assert selected['rows'] == everything['rows'] - sample_df['customer_state'].isna().sum()
+
+def test_parquet_source_matches_dataframe(sources, raw_df, sample_df, tmp_path):
+    (pandas_backend, cube), (duckdb_backend, _) = sources
+    pytest.importorskip('pyarrow')
+    path = tmp_path / 'orders.parquet'
+    raw_df.to_parquet(path)
+    start, end, _ = _filter(sample_df, 'sem filtro de estado')
+
+    expected = pandas_backend.kpis(cube, start, end, ['SP'])
+    actual = duckdb_backend.kpis(duckdb_backend.prepare(str(path)), start, end, ['SP'])
+
+    assert kpis_differences(expected, actual) == []
@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+from kpi_reference import apply_filter, assert_matches_baseline, baseline_kpis, filters
+
+from analytics.cube import build_cube, cube_kpis, merge_cubes, slice_cube
+from analytics.hll import relative_error
+from analytics.kpis import calculate_kpis
+from config.settings import HLL_CONFIG
+from utils.data_processor import append_dataframe, compact_dataframe
+from utils.date_index import sort_by_date
+
+def test_cube_matches_baseline(sample_df, expected):
+    assert_matches_baseline(cube_kpis(build_cube(sample_df)), expected)
+
+def test_cube_slices_match_baseline(raw_df, sample_df):
+    cube = build_cube(sample_df)
+    for start, end, states in filters(raw_df):
+        kpis = cube_kpis(slice_cube(cube, start, end, states))
+
+        assert_matches_baseline(kpis, baseline_kpis(apply_filter(raw_df, start, end, states)))
+
+def test_hll_counts_within_error_bound(sample_df, expected, monkeypatch):
+    monkeypatch.setitem(HLL_CONFIG, 'enabled', True)
+    # 4 erros padrão: falha por acaso com probabilidade desprezível (a semente é fixa)
+    tolerance = 4 * relative_error(HLL_CONFIG['precision'])
+
+    assert_matches_baseline(cube_kpis(build_cube(sample_df)), expected, count_rtol=tolerance)
+
+@pytest.mark.parametrize('split', ['in-order', 'out-of-order'])
+def test_merged_cube_matches_baseline(raw_df, split):
+    n = len(raw_df)
+    if split == 'in-order':
+        history, delta = raw_df.iloc[:n * 3 // 4], raw_df.iloc[n * 3 // 4 - 500:]
+    else:
+        history, delta = raw_df.iloc[n // 4:], raw_df.iloc[:n // 4 + 500]
+    df, id_lookup, _ = compact_dataframe(history)
+    df = sort_by_date(df)
+
+    combined, encoded, _, report = append_dataframe(df, id_lookup, delta)
+    merged = merge_cubes(build_cube(df, order_detail=True), encoded)
+
+    union = pd.concat([history, delta[~delta['order_id'].isin(history['order_id'])]])
+    assert report['rows_added'] == len(union) - len(history)
+    assert_matches_baseline(cube_kpis(merged), baseline_kpis(union))
+    assert_matches_baseline(calculate_kpis(combined), baseline_kpis(union))
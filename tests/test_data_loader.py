@@ -0,0 +1,56 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import data_loader
+from utils.data_loader import load_csv_robust, sniff_csv
+from utils.data_processor import process_dataframe
+from utils.sample_data import generate_sample_data
+
+@pytest.fixture
+def no_fallback(monkeypatch):
+    def fail(uploaded_file):
+        raise AssertionError("fallback lento não deveria ser usado")
+    monkeypatch.setattr(data_loader, '_load_csv_fallback', fail)
+
+def _csv(df: pd.DataFrame, **options) -> BytesIO:
+    return BytesIO(df.to_csv(index=False, **options).encode())
+
+@pytest.mark.parametrize('sep, decimal', [(',', '.'), (';', ',')])
+def test_reads_en_and_br_files_in_one_pass(no_fallback, sep, decimal):
+    df = generate_sample_data(2000, seed=3)
+
+    loaded = process_dataframe(load_csv_robust(_csv(df, sep=sep, decimal=decimal)))
+
+    np.testing.assert_allclose(loaded['total_value'], df['total_value'])
+    assert sniff_csv(_csv(df, sep=sep, decimal=decimal).getvalue())['clean_numbers'] == (decimal == '.')
+
+def test_br_values_after_the_sample_reread_as_text(no_fallback):
+    df = generate_sample_data(20000, seed=3)
+    lines = df.to_csv(index=False).splitlines(keepends=True)
+    # Depois da amostra do sniff, valores no formato BR (com milhar)
+    tail = df.iloc[15000:].copy()
+    tail['total_value'] = tail['total_value'].map(lambda v: f"{v:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.'))
+    raw = ''.join(lines[:15001]) + tail.to_csv(index=False, header=False)
+
+    sample = raw.encode()[:data_loader.SNIFF_SAMPLE_BYTES]
+    assert sniff_csv(sample)['clean_numbers']
+    loaded = process_dataframe(load_csv_robust(BytesIO(raw.encode())))
+
+    np.testing.assert_allclose(loaded['total_value'], df['total_value'].round(2))
+
+def test_latin1_file_read_with_accents(no_fallback):
+    df = generate_sample_data(2000, seed=3)
+    raw = BytesIO(df.to_csv(index=False, sep=';', decimal=',').encode('latin1'))
+
+    loaded = load_csv_robust(raw)
+
+    assert set(loaded['customer_city']) == set(df['customer_city'])
+
+def test_encoding_checked_on_the_whole_sample():
+    # Início só ASCII (o chardet vê 'ascii'), acentos latin1 depois do trecho dele
+    sample = b'a,b\n' + b'x,1\n' * (data_loader.CHARDET_SAMPLE_BYTES // 4) + 'São Paulo,2\n'.encode('latin1')
+
+    assert 'São Paulo' in sample.decode(data_loader._detect_encoding(sample))
@@ -0,0 +1,105 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.data_processor import (
+    append_dataframe, compact_dataframe, normalize_number_series, normalize_number_str, restore_ids
+)
+
+def _per_element(column: pd.Series) -> np.ndarray:
+    """Regra original: normalize_number_str valor a valor, números passam direto"""
+    parsed = column.apply(lambda x: x if pd.api.types.is_numeric_dtype(type(x)) else normalize_number_str(x))
+    return pd.to_numeric(parsed, errors='coerce').fillna(0.0).to_numpy(dtype='float64')
+
+def _vectorized(column: pd.Series) -> np.ndarray:
+    parsed = normalize_number_series(column)
+    return pd.to_numeric(parsed, errors='coerce').fillna(0.0).to_numpy(dtype='float64')
+
+def _corpus(n: int, seed: int) -> list:
+    """Números BR e EN, casos de borda e lixo aleatório"""
+    rng = random.Random(seed)
+    alphabet = '0123456789.,-+e _\t' + 'aE١'
+    edge = ['', ' ', 'nan', 'NaN', 'inf', '-inf', 'Infinity', '1e400', '1_000', '0x1', 'None',
+            '١٢', ' 12 ', '1.', '.5', ',5', '5,', '1.234.567', '1,234,567', '-0,0', '+3,5e2']
+    values = []
+    for _ in range(n):
+        kind = rng.random()
+        if kind < 0.3:
+            text = f"{rng.uniform(-1e7, 1e7):,.{rng.randint(0, 6)}f}"
+            if rng.random() < 0.5:  # formato BR: 1.234,56
+                text = text.replace(',', '_').replace('.', ',').replace('_', '.')
+            values.append(text)
+        elif kind < 0.4:
+            values.append(repr(rng.uniform(-1e6, 1e6)))
+        elif kind < 0.5:
+            values.append(rng.choice(edge))
+        else:
+            values.append(''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 10))))
+    return values
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_vectorized_parser_matches_per_element_on_strings(seed):
+    column = pd.Series(_corpus(20000, seed), dtype=object)
+
+    np.testing.assert_array_equal(_vectorized(column), _per_element(column))
+
+@pytest.mark.parametrize('seed', [1, 2])
+def test_vectorized_parser_matches_per_element_on_mixed_values(seed):
+    values = _corpus(20000, seed)
+    rng = random.Random(seed)
+    for i in range(0, len(values), 7):
+        values[i] = rng.choice([1, 2.5, np.nan, None, np.float64(3.25), True])
+    column = pd.Series(values, dtype=object)
+
+    np.testing.assert_array_equal(_vectorized(column), _per_element(column))
+
+def test_vectorized_parser_on_string_dtype():
+    column = pd.Series(_corpus(5000, 4) + [None], dtype='string')
+
+    np.testing.assert_array_equal(_vectorized(column), _per_element(column.astype(object)))
+
+def test_br_and_en_formats():
+    column = pd.Series(['1.234,56', '1234.56', '1,5', ' 10 ', 'abc', None])
+
+    np.testing.assert_array_equal(_vectorized(column), [1234.56, 1234.56, 1.5, 10.0, 0.0, 0.0])
+
+def test_compact_dataframe_keeps_values_and_saves_memory(raw_df):
+    df, id_lookup, report = compact_dataframe(raw_df)
+
+    assert report['after'] < report['before'] / 2
+    assert df['quantity'].dtype == 'int8'
+    assert df['product_price'].dtype == 'float32'
+    assert df['total_value'].dtype == 'float64'
+    assert isinstance(df['customer_state'].dtype, pd.CategoricalDtype)
+    np.testing.assert_array_equal(df['product_price'].astype('float64').round(2), raw_df['product_price'].round(2))
+    restored = restore_ids(df, id_lookup)
+    for col in ['order_id', 'customer_id']:
+        pd.testing.assert_series_equal(restored[col].astype(object), raw_df[col].astype(object))
+
+def _history_and_delta(raw_df):
+    n = len(raw_df)
+    df, id_lookup, _ = compact_dataframe(raw_df.iloc[:n * 3 // 4])
+    return df, id_lookup, raw_df.iloc[n * 3 // 4:].copy()
+
+def test_append_keeps_compact_dtypes(raw_df):
+    df, id_lookup, delta = _history_and_delta(raw_df)
+
+    combined, _, _, report = append_dataframe(df, id_lookup, delta)
+
+    assert report['rows_added'] > 0
+    assert (combined.dtypes == df.dtypes).all()
+
+def test_append_widens_only_when_delta_overflows(raw_df):
+    df, id_lookup, delta = _history_and_delta(raw_df)
+    delta.iloc[-1, delta.columns.get_loc('quantity')] = 1000
+    delta.iloc[-1, delta.columns.get_loc('product_price')] = 123456789.01
+
+    combined, _, _, _ = append_dataframe(df, id_lookup, delta)
+
+    assert combined['quantity'].dtype == 'int16'
+    assert combined['product_price'].dtype == 'float64'
+    assert combined['quantity'].iloc[-1] == 1000
+    assert combined['product_price'].iloc[-1] == 123456789.01
+    assert df['quantity'].dtype == 'int8'
@@ -0,0 +1,70 @@
+import multiprocessing
+import time
+
+import pandas as pd
+import pytest
+
+from kpi_reference import assert_matches_baseline
+
+from analytics.kpis import calculate_kpis
+from config.settings import CACHE_CONFIG, INGEST_CONFIG
+from utils.background import JobCancelled
+from utils.data_processor import compact_dataframe, restore_ids
+from utils.dataset_cache import load_processed_files
+from utils.date_index import sort_by_date
+from utils.sample_data import generate_sample_data
+
+class Upload:
+    """Arquivo enviado (nome e bytes), como o UploadedFile do Streamlit"""
+
+    def __init__(self, name: str, raw: bytes):
+        self.name = name
+        self.size = len(raw)
+        self._raw = raw
+
+    def getvalue(self) -> bytes:
+        return self._raw
+
+@pytest.fixture
+def no_disk_cache(monkeypatch):
+    monkeypatch.setitem(CACHE_CONFIG, 'enabled', False)
+
+def test_cancel_terminates_pool_workers(monkeypatch, no_disk_cache):
+    monkeypatch.setitem(INGEST_CONFIG, 'max_workers', 2)
+    monkeypatch.setitem(INGEST_CONFIG, 'parallel_min_bytes', 0)
+    monkeypatch.setitem(INGEST_CONFIG, 'poll_seconds', 0.05)
+    raw = generate_sample_data(100000, seed=1).to_csv(index=False).encode()
+    files = [Upload('a.csv', raw), Upload('b.csv', raw)]
+
+    def cancel(n_bytes, n_lines):
+        raise JobCancelled()
+
+    with pytest.raises(JobCancelled):
+        load_processed_files(files, on_read=cancel)
+
+    deadline = time.monotonic() + 5
+    while multiprocessing.active_children() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert multiprocessing.active_children() == []
+
+def test_arrow_round_trip_keeps_frame_ids_and_kpis(raw_df, expected, monkeypatch, tmp_path):
+    pytest.importorskip('pyarrow')
+    from utils.dataset_cache import open_prepared_dataset, store_prepared_dataset
+    monkeypatch.setitem(CACHE_CONFIG, 'dir', str(tmp_path))
+    monkeypatch.setitem(CACHE_CONFIG, 'enabled', True)
+    monkeypatch.setitem(CACHE_CONFIG, 'memory_map', True)
+    df, id_lookup, memory_report = compact_dataframe(raw_df)
+    df = sort_by_date(df)
+
+    assert store_prepared_dataset('round-trip', df, id_lookup, memory_report)
+    mapped, mapped_lookup, mapped_report = open_prepared_dataset('round-trip')
+
+    pd.testing.assert_frame_equal(mapped, df.reset_index(drop=True))
+    pd.testing.assert_frame_equal(
+        restore_ids(mapped, mapped_lookup).astype({'order_id': object, 'customer_id': object}),
+        restore_ids(df, id_lookup).reset_index(drop=True).astype({'order_id': object, 'customer_id': object})
+    )
+    assert mapped_report == {**memory_report, 'mapped': True}
+    assert not mapped['total_value'].to_numpy().flags.writeable
+    assert not mapped['customer_state'].array.codes.flags.writeable
+    assert_matches_baseline(calculate_kpis(mapped), expected)
@@ -0,0 +1,68 @@
+import gc
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.dataset_registry import DatasetRegistry
+
+def _frame(n: int = 1000) -> pd.DataFrame:
+    return pd.DataFrame({'total_value': np.arange(n, dtype='float64')})
+
+def test_sessions_share_one_entry():
+    registry = DatasetRegistry(max_bytes=10 ** 9, idle_seconds=3600)
+
+    first = registry.put('k', _frame(), {}, None)
+    second = registry.put('k', _frame(), {}, None)
+    third = registry.acquire('k')
+
+    assert first.df is second.df is third.df
+    assert registry.stats()['handles'] == 3
+    assert registry.acquire('other') is None
+
+def test_artifacts_are_built_once_and_counted():
+    registry = DatasetRegistry(max_bytes=10 ** 9, idle_seconds=3600)
+    handle = registry.put('k', _frame(), {}, None)
+    before = registry.stats()['bytes']
+    calls = []
+
+    def build():
+        calls.append(1)
+        return np.zeros(1000)
+
+    assert handle.artifact('index', build) is handle.artifact('index', build)
+    assert calls == [1]
+    assert registry.stats()['bytes'] == before + 8000
+
+def test_idle_entries_evicted_over_budget_but_in_use_kept():
+    registry = DatasetRegistry(max_bytes=1, idle_seconds=3600)
+    kept = registry.put('kept', _frame(), {}, None)
+    dropped = registry.put('dropped', _frame(), {}, None)
+
+    dropped.release()
+    dropped.release()  # repetido não conta duas vezes
+
+    assert registry.acquire('dropped') is None
+    assert registry.acquire('kept') is not None
+    assert kept.df is not None
+
+def test_handle_collected_releases_reference():
+    registry = DatasetRegistry(max_bytes=10 ** 9, idle_seconds=3600)
+    handle = registry.put('k', _frame(), {}, None)
+
+    del handle
+    gc.collect()
+
+    assert registry.stats()['handles'] == 0
+    assert registry.stats()['entries'] == 1
+
+def test_idle_entries_expire_without_other_activity():
+    registry = DatasetRegistry(max_bytes=10 ** 9, idle_seconds=0.1)
+    registry.put('k', _frame(), {}, None).release()
+
+    deadline = time.monotonic() + 5
+    while registry.stats()['entries'] and time.monotonic() < deadline:
+        time.sleep(0.1)
+
+    assert registry.stats()['entries'] == 0
+    assert registry.stats()['evictions'] == 1
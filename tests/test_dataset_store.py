@@ -0,0 +1,84 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from analytics.kpis import calculate_kpis
+from config.settings import STORE_CONFIG
+from utils import dataset_store
+from utils.data_processor import process_dataframe
+from utils.sample_data import generate_sample_data
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    monkeypatch.setitem(STORE_CONFIG, 'dir', str(tmp_path))
+    monkeypatch.setitem(STORE_CONFIG, 'enabled', True)
+    return tmp_path
+
+@pytest.fixture(scope='module')
+def company_df():
+    return process_dataframe(generate_sample_data(3000, seed=5))
+
+def test_round_trip_and_period_pruning(store, company_df):
+    entry = dataset_store.save_company_dataset('Loja São João', company_df)
+    cid = entry['company_id']
+
+    full, _ = dataset_store.load_company_dataset(cid)
+    start, end = pd.Timestamp('2024-03-01'), pd.Timestamp('2024-04-30')
+    period, _ = dataset_store.load_company_dataset(cid, start, end)
+
+    assert cid == 'loja-sao-joao'
+    assert calculate_kpis(full)['total_revenue'] == pytest.approx(company_df['total_value'].sum())
+    days = company_df['order_date'].dt.normalize()
+    assert len(period) == ((days >= start) & (days <= end)).sum()
+    assert len(dataset_store.company_partitions(cid, start, end)) == 2
+
+def test_names_with_same_slug_do_not_overwrite(store, company_df):
+    first = dataset_store.save_company_dataset('Loja A', company_df)
+    second = dataset_store.save_company_dataset('loja-a', company_df.iloc[:100])
+    again = dataset_store.save_company_dataset('Loja A', company_df.iloc[:200])
+
+    assert (first['company_id'], second['company_id'], again['company_id']) == ('loja-a', 'loja-a-2', 'loja-a')
+    rows = dataset_store.list_companies().set_index('name')['rows'].to_dict()
+    assert rows == {'Loja A': 200, 'loja-a': 100}
+
+def test_replaced_version_stays_readable(store, company_df):
+    cid = dataset_store.save_company_dataset('Loja B', company_df)['company_id']
+    old_paths = dataset_store.company_partitions(cid)['path']
+
+    dataset_store.save_company_dataset('Loja B', company_df.iloc[:500])
+
+    assert all((store / path).exists() for path in old_paths)
+    assert len(dataset_store.load_company_dataset(cid)[0]) == 500
+
+def test_delete_company(store, company_df):
+    cid = dataset_store.save_company_dataset('Loja C', company_df)['company_id']
+
+    dataset_store.delete_company(cid)
+
+    assert len(dataset_store.list_companies()) == 0
+    assert not (store / cid).exists()
+
+def test_snapshot_pairs_version_with_its_partitions(store, company_df):
+    cid = dataset_store.save_company_dataset('Loja D', company_df)['company_id']
+    version, partitions = dataset_store.company_snapshot(cid)
+
+    dataset_store.save_company_dataset('Loja D', company_df.iloc[:500])
+    new_version, _ = dataset_store.company_snapshot(cid)
+
+    assert new_version != version
+    assert all(Path(path).parts[1] == version for path in partitions['path'])
+    assert len(dataset_store.read_partitions(partitions)) == len(company_df)
+    assert new_version in dataset_store.load_company_dataset(cid)[1]
+
+def test_read_partitions_by_month(store, company_df):
+    cid = dataset_store.save_company_dataset('Loja E', company_df)['company_id']
+    _, partitions = dataset_store.company_snapshot(cid)
+    months = partitions.iloc[1:3]
+
+    df = dataset_store.read_partitions(months)
+
+    assert len(df) == months['rows'].sum()
+    assert set(df['order_date'].dt.strftime('%Y-%m')) == set(months['month'])
@@ -0,0 +1,23 @@
+import pandas as pd
+
+from kpi_reference import apply_filter, assert_matches_baseline, baseline_kpis, filters
+
+from analytics.kpis import calculate_kpis
+from utils.date_index import DateStateIndex
+
+def test_index_filter_matches_baseline(raw_df, sample_df):
+    index = DateStateIndex(sample_df)
+    for start, end, states in filters(raw_df):
+        kpis = calculate_kpis(index.filter(sample_df, start, end, states))
+
+        assert_matches_baseline(kpis, baseline_kpis(apply_filter(raw_df, start, end, states)))
+
+def test_index_includes_the_whole_end_day():
+    df = pd.DataFrame({
+        'order_date': pd.to_datetime(['2024-01-01 09:00', '2024-01-02 00:00', '2024-01-02 18:30', '2024-01-03 08:00']),
+        'customer_state': ['SP', 'RJ', 'SP', 'SP']
+    })
+    index = DateStateIndex(df)
+
+    assert index.date_bounds(pd.Timestamp('2024-01-01 12:00'), pd.Timestamp('2024-01-02')) == (0, 3)
+    assert len(index.filter(df, pd.Timestamp('2024-01-02'), pd.Timestamp('2024-01-02'), ['SP'])) == 1
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from utils.downsample import lttb_indices
+
+def _lttb_reference(x, y, n_out):
+    """LTTB como no artigo original (Steinarsson, 2013), um ponto por vez"""
+    n = len(x)
+    every = (n - 2) / (n_out - 2)
+    selected, a = [0], 0
+    for i in range(n_out - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(x[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_y = sum(y[avg_start:avg_end]) / (avg_end - avg_start)
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    return selected + [n - 1]
+
+@pytest.mark.parametrize('n, n_out', [(1000, 50), (997, 3), (5000, 777)])
+def test_lttb_matches_reference(n, n_out):
+    rng = np.random.default_rng(n)
+    x = np.arange(n, dtype='float64')
+    y = np.cumsum(rng.normal(size=n))
+
+    indices = lttb_indices(x, y, n_out)
+
+    assert indices.tolist() == _lttb_reference(x.tolist(), y.tolist(), n_out)
+
+def test_lttb_keeps_short_series():
+    assert lttb_indices(np.arange(10), np.arange(10), 20).tolist() == list(range(10))
+    assert lttb_indices(np.arange(10), np.arange(10), 2).tolist() == list(range(10))
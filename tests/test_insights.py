@@ -0,0 +1,84 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.backends import kpis_differences
+from analytics.cube import build_cube, cube_kpis
+from analytics.insights import _segment_insights, segment_signals
+from analytics.kpis import calculate_kpis
+from analytics.streaming import aggregate_csv_streaming
+from utils.data_processor import process_dataframe
+from utils.sample_data import generate_sample_data
+
+def _table(revenue: dict) -> pd.DataFrame:
+    """segment_monthly a partir de {(dimensão, segmento): [receita por mês]}"""
+    rows = [
+        (dimension, segment, f'2024-{month:02d}', value)
+        for (dimension, segment), values in revenue.items()
+        for month, value in enumerate(values, start=1)
+    ]
+    return pd.DataFrame(rows, columns=['dimension', 'segment', 'period', 'revenue'])
+
+HAND_BUILT = _table({
+    ('customer_state', 'SP'): [100, 100, 130],     # +30%
+    ('customer_state', 'RJ'): [50, 100, 80],       # -20%
+    ('customer_state', 'MG'): [40, 40, 42],        # +5%: fora das faixas
+    ('payment_method', 'PIX'): [300, 300, 324],    # +8%, 75% da receita de pagamentos
+    ('payment_method', 'Boleto'): [100, 100, 92],  # -8%
+    ('product_category', 'Livros'): [10, 0, 5]     # única categoria; mês anterior sem receita
+})
+
+def test_segment_signals_match_hand_built_matrix():
+    signals = segment_signals(HAND_BUILT).set_index('segment')
+
+    assert signals.loc['SP', 'growth'] == pytest.approx(30.0)
+    assert signals.loc['RJ', 'growth'] == pytest.approx(-20.0)
+    assert signals.loc['PIX', 'growth'] == pytest.approx(8.0)
+    assert np.isnan(signals.loc['Livros', 'growth'])
+    assert signals.loc['SP', 'share'] == pytest.approx(330 / 682 * 100)
+    assert signals.loc['PIX', 'share'] == pytest.approx(924 / 1216 * 100)
+    assert signals.loc['SP', 'segments'] == 3
+    assert signals.loc['Livros', 'segments'] == 1
+    assert signals['concentration'].to_dict() == {
+        'SP': 0, 'RJ': 0, 'MG': 0, 'PIX': 2, 'Boleto': 0, 'Livros': 0
+    }
+
+def test_segment_insights_apply_every_tier(monkeypatch):
+    from config.settings import INSIGHTS_CONFIG
+    monkeypatch.setitem(INSIGHTS_CONFIG, 'max_segment_insights', 10)
+
+    titles = [i['title'] for i in _segment_insights({'segment_monthly': HAND_BUILT})]
+
+    assert titles == [
+        'Concentração em PIX',
+        'Destaque: SP',
+        'ALERTA: Queda em RJ',
+        'Crescimento em PIX',
+        'Queda em Boleto'
+    ]
+
+def test_segment_insights_moderate_concentration():
+    table = _table({
+        ('payment_method', 'PIX'): [50, 50],
+        ('payment_method', 'Boleto'): [30, 30],
+        ('payment_method', 'Cartão'): [20, 20]
+    })
+
+    insights = _segment_insights({'segment_monthly': table})
+
+    assert [i['title'] for i in insights] == ['Concentração Moderada em PIX']
+
+def test_segment_monthly_parity_across_engines(sample_df):
+    from_rows = calculate_kpis(sample_df)['segment_monthly']
+    from_cube = cube_kpis(build_cube(sample_df))['segment_monthly']
+
+    raw = generate_sample_data(5000, seed=11)
+    buffer = io.BytesIO(raw.to_csv(index=False).encode())
+    from_stream = aggregate_csv_streaming(buffer)['segment_monthly']
+    from_stream_rows = calculate_kpis(process_dataframe(raw))['segment_monthly']
+
+    assert kpis_differences({'segment_monthly': from_rows}, {'segment_monthly': from_cube}) == []
+    assert kpis_differences({'segment_monthly': from_stream_rows}, {'segment_monthly': from_stream}) == []
+    assert set(from_cube['dimension']) == {'customer_state', 'product_category', 'payment_method'}
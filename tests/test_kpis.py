@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+from kpi_reference import apply_filter, assert_matches_baseline, baseline_kpis, filters
+
+from analytics.cube import build_cube, cube_kpis
+from analytics.kpis import calculate_kpis
+
+def test_calculate_kpis_matches_baseline(sample_df, expected):
+    assert_matches_baseline(calculate_kpis(sample_df), expected)
+
+def test_calculate_kpis_on_filtered_rows_matches_baseline(raw_df, sample_df):
+    for start, end, states in filters(raw_df):
+        kpis = calculate_kpis(apply_filter(sample_df, start, end, states))
+
+        assert_matches_baseline(kpis, baseline_kpis(apply_filter(raw_df, start, end, states)))
+
+def test_daily_table_matches_groupby(raw_df, sample_df):
+    days = raw_df['order_date'].dt.normalize()
+    wanted = raw_df.groupby(days).agg(revenue=('total_value', 'sum'), orders=('order_id', 'nunique'))
+
+    for kpis in (calculate_kpis(sample_df), cube_kpis(build_cube(sample_df))):
+        daily = kpis['daily'].set_index(pd.to_datetime(kpis['daily']['order_date']))
+
+        assert daily.index.equals(wanted.index.rename(daily.index.name))
+        np.testing.assert_allclose(daily['revenue'], wanted['revenue'], rtol=1e-9)
+        np.testing.assert_array_equal(daily['orders'], wanted['orders'])
@@ -0,0 +1,28 @@
+import pandas as pd
+
+from analytics.memo import LRUCache, copy_tables
+
+def _result():
+    table = pd.DataFrame({'state': ['SP', 'RJ'], 'revenue': [10.0, 5.0]})
+    return {'total_revenue': 15.0, 'by_state': table}, [{'title': 'ok'}]
+
+def test_callers_cannot_corrupt_cached_tables():
+    cache = LRUCache(4, copy_value=copy_tables)
+
+    kpis, insights = cache.get_or_compute('key', _result)
+    kpis['by_state']['share'] = kpis['by_state']['revenue'] / 15
+    kpis['by_state'].loc[0, 'revenue'] = -1.0
+    insights.append({'title': 'extra'})
+
+    kpis, insights = cache.get_or_compute('key', _result)
+    assert list(kpis['by_state'].columns) == ['state', 'revenue']
+    assert kpis['by_state']['revenue'].tolist() == [10.0, 5.0]
+    assert insights == [{'title': 'ok'}]
+    assert cache.stats()['hits'] == 1
+
+def test_without_copy_value_returns_stored_object():
+    cache = LRUCache(4)
+    value = object()
+
+    assert cache.get_or_compute('key', lambda: value) is value
+    assert cache.get('key') is value
@@ -0,0 +1,51 @@
+import threading
+import tracemalloc
+
+import pytest
+
+from config.settings import PERF_CONFIG
+from utils import perf
+
+@pytest.fixture(autouse=True)
+def perf_enabled(monkeypatch):
+    monkeypatch.setitem(PERF_CONFIG, 'enabled', True)
+    monkeypatch.setitem(PERF_CONFIG, 'track_memory', True)
+    monkeypatch.setitem(PERF_CONFIG, 'log', False)
+    yield
+    tracemalloc.stop()  # o app nunca desliga; aqui não deixa o restante dos testes mais lento
+
+def test_single_rerun_measures_memory_and_keeps_tracing():
+    with perf.rerun() as profile:
+        with perf.stage('alloc'):
+            block = bytearray(8 * 1024 ** 2)
+        del block
+
+    assert profile.stages[0]['peak_mb'] >= 8
+    assert tracemalloc.is_tracing()
+
+def test_concurrent_reruns_report_time_only():
+    first_inside, second_done = threading.Event(), threading.Event()
+    profiles = {}
+
+    def first():
+        with perf.rerun() as profile:
+            with perf.stage('waits_for_second'):
+                first_inside.set()
+                second_done.wait(5)
+        profiles['first'] = profile
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    first_inside.wait(5)
+    with perf.rerun() as profile:
+        with perf.stage('overlaps_first'):
+            bytearray(1024)
+    profiles['second'] = profile
+    second_done.set()
+    thread.join()
+
+    for profile in profiles.values():
+        record = profile.stages[0]
+        assert 'ms' in record
+        assert 'peak_mb' not in record
+    assert tracemalloc.is_tracing()
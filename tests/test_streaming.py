@@ -0,0 +1,15 @@
+import io
+
+from kpi_reference import assert_matches_baseline, baseline_kpis
+
+from analytics.streaming import aggregate_csv_streaming
+from utils.data_processor import process_dataframe
+from utils.sample_data import generate_sample_data
+
+def test_streaming_matches_baseline():
+    raw = generate_sample_data(5000, seed=11)
+    buffer = io.BytesIO(raw.to_csv(index=False).encode())
+
+    kpis = aggregate_csv_streaming(buffer, chunk_rows=700)
+
+    assert_matches_baseline(kpis, baseline_kpis(process_dataframe(raw)))
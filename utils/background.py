@@ -0,0 +1,78 @@
+import threading
+import time
+
+class JobCancelled(BaseException):
+    """
+    Levantada dentro do job quando o usuário cancela o carregamento.
+    Herda de BaseException para não ser engolida pelos `except Exception`
+    de leitura (ex.: o fallback de load_csv_robust).
+    """
+
+class BackgroundJob:
+    """
+    Executa target(job) numa thread daemon, fora do script do Streamlit.
+    O target informa o andamento com job.report(...) e chama job.check_cancelled()
+    nos pontos em que pode parar; a interface só lê snapshot() a cada rerun.
+    """
+
+    def __init__(self, key, target):
+        self.key = key
+        self.status = 'running'
+        self.result = None
+        self.error = None
+        self.started = time.perf_counter()
+        self.finished = None
+        self._target = target
+        self._progress = {}
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"background-job-{key}", daemon=True)
+
+    def start(self) -> 'BackgroundJob':
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            result = self._target(self)
+        except JobCancelled:
+            self.status = 'cancelled'
+        except Exception as e:
+            self.error = e
+            self.status = 'error'
+        else:
+            # O resultado é publicado antes do status: quem vê 'done' já vê o resultado
+            self.result = result
+            self.status = 'done'
+        finally:
+            self.finished = time.perf_counter()
+
+    def report(self, **values):
+        """Atualiza os contadores de andamento (bytes, linhas, arquivo atual...)"""
+        with self._lock:
+            self._progress.update(values)
+
+    def add(self, **values):
+        """Soma aos contadores de andamento"""
+        with self._lock:
+            for name, value in values.items():
+                self._progress[name] = self._progress.get(name, 0) + value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._progress)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    @property
+    def running(self) -> bool:
+        return self.status == 'running'
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
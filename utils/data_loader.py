@@ -1,15 +1,150 @@
+import codecs
+import csv
+import re
+import zipfile
 import pandas as pd
-from io import StringIO
+from io import BytesIO, StringIO
+from pathlib import PurePosixPath
+from config.settings import STREAMING_CONFIG
 from utils.data_processor import normalize_columns
 
-def load_csv_robust(uploaded_file):
-    """Lê CSV tentando encodings e separadores comuns"""
+try:
+    import chardet
+except ImportError:  # chardet é opcional: sem ele o fallback é latin1
+    chardet = None
+
+# Quantidade de bytes lida do início do arquivo para detectar o formato
+SNIFF_SAMPLE_BYTES = 64 * 1024
+# Início da amostra passado ao chardet (o custo dele cresce com a entrada)
+CHARDET_SAMPLE_BYTES = 8 * 1024
+
+_SEPARATORS = [',', ';', '\t', '|']
+_TEXT_COLUMNS = ['order_id', 'customer_id', 'product_category', 'customer_state', 'customer_city', 'payment_method']
+_MONEY_COLUMNS = ['total_value', 'product_price']
+
+_BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+_EN_NUMBER_RE = re.compile(r'^[+-]?\d+(\.\d+)?$')
+
+def _read_sample(source, n_bytes=SNIFF_SAMPLE_BYTES):
+    """Lê os primeiros bytes do arquivo (upload ou caminho) sem consumir o buffer"""
+    if hasattr(source, 'read'):
+        source.seek(0)
+        sample = source.read(n_bytes)
+        source.seek(0)
+    else:
+        with open(source, 'rb') as f:
+            sample = f.read(n_bytes)
+    if isinstance(sample, str):
+        sample = sample.encode('utf-8')
+    return sample
+
+def _detect_encoding(sample: bytes) -> str:
+    """Detecta o encoding pela BOM, validação UTF-8 ou chardet"""
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    # final=False tolera um caractere multibyte cortado no fim da amostra
     try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+
+    if chardet is not None:
+        guess = chardet.detect(sample[:CHARDET_SAMPLE_BYTES])
+        encoding = guess.get('encoding')
+        if encoding and (guess.get('confidence') or 0) >= 0.5:
+            try:
+                codecs.lookup(encoding)
+                sample.decode(encoding)
+                return encoding.lower()
+            except (LookupError, UnicodeDecodeError):
+                pass
+
+    return 'latin1'
+
+def _detect_separator(lines):
+    """Escolhe o separador que gera o número de colunas mais consistente"""
+    best_sep, best_score = ',', -1.0
+    for sep in _SEPARATORS:
+        rows = list(csv.reader(lines, delimiter=sep))
+        if not rows or len(rows[0]) < 2:
+            continue
+        n_cols = len(rows[0])
+        score = sum(1 for r in rows if len(r) == n_cols) / len(rows)
+        if score > best_score:
+            best_sep, best_score = sep, score
+    return best_sep
+
+def _clean_numbers(rows, header):
+    """
+    True se todos os valores monetários da amostra já estão no formato nativo
+    do parser (ponto decimal): a leitura pode usar float direto
+    """
+    positions = [i for i, col in enumerate(header) if col in _MONEY_COLUMNS]
+    values = [r[i].strip() for r in rows for i in positions if i < len(r) and r[i].strip()]
+    return len(values) > 0 and all(_EN_NUMBER_RE.match(v) for v in values)
+
+def sniff_csv(sample: bytes) -> dict:
+    """Detecta BOM, encoding, separador e se os valores monetários já vêm com ponto decimal"""
+    encoding = _detect_encoding(sample)
+
+    text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(sample, final=False)
+    lines = text.splitlines()
+    # Se a amostra foi truncada, a última linha pode estar incompleta
+    if len(sample) >= SNIFF_SAMPLE_BYTES and len(lines) > 1:
+        lines = lines[:-1]
+    if not lines:
+        return {'encoding': encoding, 'sep': ',', 'columns': [], 'clean_numbers': False}
+
+    sep = _detect_separator(lines)
+    rows = list(csv.reader(lines, delimiter=sep))
+    raw_columns = rows[0]
+    header = normalize_columns(pd.DataFrame(columns=raw_columns)).columns.tolist()
+
+    return {
+        'encoding': encoding,
+        'sep': sep,
+        'columns': list(zip(raw_columns, header)),
+        'clean_numbers': _clean_numbers(rows[1:], header)
+    }
+
+def csv_read_options(sniffed: dict) -> dict:
+    """Monta os argumentos de pd.read_csv (engine C, dtypes explícitos) a partir do sniff"""
+    dtype = {}
+    for raw, col in sniffed['columns']:
+        if col in _TEXT_COLUMNS:
+            dtype[raw] = str
+        elif col in _MONEY_COLUMNS:
+            # Formato BR segue como texto e é normalizado em process_dataframe,
+            # com a mesma regra de normalize_number_str
+            dtype[raw] = 'float64' if sniffed['clean_numbers'] else str
+
+    return {
+        'encoding': sniffed['encoding'],
+        'sep': sniffed['sep'],
+        'engine': 'c',
+        'dtype': dtype,
+        'float_precision': 'round_trip'
+    }
+
+def _load_csv_fallback(uploaded_file):
+    """Tentativas antigas de leitura, usadas quando o sniff não acerta o formato"""
+    try:
+        uploaded_file.seek(0)
         df = pd.read_csv(uploaded_file, sep=None, engine="python", encoding='utf-8-sig')
     except Exception:
         uploaded_file.seek(0)
         df = None
-        
+
         for enc in ['utf-8-sig', 'utf-8', 'latin1', 'iso-8859-1', 'cp1252']:
             for sep in [',', ';', '\t']:
                 try:
@@ -20,7 +155,7 @@ def load_csv_robust(uploaded_file):
                     continue
             if df is not None:
                 break
-        
+
         if df is None:
             uploaded_file.seek(0)
             content = uploaded_file.read()
@@ -33,7 +168,71 @@ def load_csv_robust(uploaded_file):
                     except:
                         content = content.decode('latin1', errors='ignore')
             df = pd.read_csv(StringIO(content), sep=None, engine="python")
-    
+    return df
+
+def _read_sniffed(uploaded_file, sniffed: dict) -> pd.DataFrame:
+    """
+    pd.read_csv com as opções do sniff. Se a amostra tinha só números com
+    ponto mas o resto do arquivo não (ex.: '1.234,56' mais abaixo), a leitura
+    tipada falha; relê com os valores como texto, ainda na engine C, em vez
+    de cair nas tentativas lentas do fallback.
+    """
+    try:
+        return pd.read_csv(uploaded_file, **csv_read_options(sniffed))
+    except ValueError:
+        if not sniffed['clean_numbers']:
+            raise
+    if hasattr(uploaded_file, 'seek'):
+        uploaded_file.seek(0)
+    return pd.read_csv(uploaded_file, **csv_read_options({**sniffed, 'clean_numbers': False}))
+
+def load_csv_robust(uploaded_file):
+    """Lê CSV detectando encoding e separador numa amostra e fazendo uma única leitura"""
+    try:
+        sniffed = sniff_csv(_read_sample(uploaded_file))
+        df = _read_sniffed(uploaded_file, sniffed)
+        if len(df.columns) < 2:
+            raise ValueError("separador não detectado")
+    except Exception:
+        if not hasattr(uploaded_file, 'seek'):
+            raise
+        df = _load_csv_fallback(uploaded_file)
+
     df = normalize_columns(df)
-    
-    return df
\ No newline at end of file
+
+    return df
+
+def iter_csv_chunks(uploaded_file, chunk_rows=None):
+    """Lê o CSV em blocos de linhas, com o mesmo sniff de load_csv_robust"""
+    chunk_rows = chunk_rows or STREAMING_CONFIG['chunk_rows']
+    sniffed = sniff_csv(_read_sample(uploaded_file))
+    options = csv_read_options(sniffed)
+    # Valores monetários ficam com o tipo inferido em cada chunk: um valor fora
+    # do padrão no meio do arquivo não pode derrubar a leitura dos demais
+    for raw, col in sniffed['columns']:
+        if col in _MONEY_COLUMNS:
+            options['dtype'].pop(raw, None)
+    reader = pd.read_csv(uploaded_file, chunksize=chunk_rows, **options)
+    with reader:
+        for chunk in reader:
+            yield normalize_columns(chunk)
+
+def expand_uploads(uploaded_files):
+    """
+    Lista (nome, bytes) dos CSVs enviados; arquivos .zip são abertos e cada
+    CSV dentro deles vira uma entrada (na ordem do upload e do zip).
+    """
+    sources = []
+    for uploaded_file in uploaded_files:
+        raw = uploaded_file.getvalue()
+        if not zipfile.is_zipfile(BytesIO(raw)):
+            sources.append((uploaded_file.name, raw))
+            continue
+        with zipfile.ZipFile(BytesIO(raw)) as archive:
+            for info in archive.infolist():
+                path = PurePosixPath(info.filename)
+                # Ignora pastas e metadados do macOS
+                if info.is_dir() or path.suffix.lower() != '.csv' or '__MACOSX' in path.parts:
+                    continue
+                sources.append((f"{uploaded_file.name}/{info.filename}", archive.read(info)))
+    return sources
@@ -1,6 +1,10 @@
 import pandas as pd
 import numpy as np
 
+# Versão das regras de process_dataframe. Incrementar sempre que a saída
+# mudar, para invalidar os datasets processados guardados em cache.
+PROCESSOR_VERSION = 2
+
 def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     """Remove BOM, espaços e padroniza nomes para minúsculo"""
     df = df.copy()
@@ -30,22 +34,76 @@ def normalize_number_str(s):
     except:
         return np.nan
 
+_SIMPLE_NUMBER_RE = r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?'
+
+def _parse_number_strings(s: pd.Series) -> pd.Series:
+    """Converte uma série de strings (já sem espaços) em float, regra BR/EN"""
+    # Com vírgula: pontos são milhar e a vírgula é o decimal ("1.234,56").
+    # Sem vírgula o ponto já é decimal e a string segue como está.
+    has_comma = s.str.contains(',', regex=False)
+    if has_comma.any():
+        s = s.copy()
+        s[has_comma] = (
+            s[has_comma]
+            .str.replace('.', '', regex=False)
+            .str.replace(',', '.', regex=False)
+        )
+    
+    # astype(float64) em array de objetos usa o próprio float() do Python,
+    # então o resultado é idêntico ao de normalize_number_str
+    values = s.to_numpy(dtype=object)
+    try:
+        return pd.Series(values.astype('float64'), index=s.index)
+    except (ValueError, TypeError):
+        pass
+    
+    # Há valores inválidos: converte em bloco os que têm formato numérico
+    # simples e resolve o restante com float(), uma vez por valor distinto
+    simple = s.str.fullmatch(_SIMPLE_NUMBER_RE).fillna(False).to_numpy(dtype=bool)
+    result = np.full(len(s), np.nan)
+    result[simple] = values[simple].astype('float64')
+    if not simple.all():
+        pending = pd.Series(values[~simple])
+        lookup = {u: normalize_number_str(u) for u in pending.unique()}
+        result[~simple] = pending.map(lookup).to_numpy(dtype='float64')
+    return pd.Series(result, index=s.index)
+
+def normalize_number_series(series: pd.Series) -> pd.Series:
+    """Versão vetorizada de normalize_number_str para uma coluna inteira"""
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    
+    if pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+        text = series.str.strip()
+        result = pd.Series(np.nan, index=series.index, dtype='float64')
+        valid = text.notna()
+        result[valid] = _parse_number_strings(text[valid])
+        return result
+    
+    # Coluna mista: valores já numéricos são mantidos, o resto vira texto
+    is_number = series.map(lambda x: pd.api.types.is_numeric_dtype(type(x))).astype(bool)
+    result = series.copy()
+    others = series[~is_number]
+    if len(others) > 0:
+        text = others.map(lambda x: np.nan if pd.isna(x) else str(x).strip())
+        parsed = pd.Series(np.nan, index=others.index, dtype='float64')
+        valid = text.notna()
+        parsed[valid] = _parse_number_strings(text[valid])
+        result[~is_number] = parsed
+    return result
+
 def process_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     """Processa e normaliza todas as colunas do dataframe"""
     df = normalize_columns(df)
     
     if 'total_value' in df.columns:
-        df['total_value'] = df['total_value'].apply(
-            lambda x: normalize_number_str(x) if not pd.api.types.is_numeric_dtype(type(x)) else x
-        )
+        df['total_value'] = normalize_number_series(df['total_value'])
         df['total_value'] = pd.to_numeric(df['total_value'], errors='coerce').fillna(0.0)
     else:
         df['total_value'] = 0.0
     
     if 'product_price' in df.columns:
-        df['product_price'] = df['product_price'].apply(
-            lambda x: normalize_number_str(x) if not pd.api.types.is_numeric_dtype(type(x)) else x
-        )
+        df['product_price'] = normalize_number_series(df['product_price'])
         df['product_price'] = pd.to_numeric(df['product_price'], errors='coerce').fillna(0.0)
     
     if 'quantity' in df.columns:
@@ -57,4 +115,159 @@ def process_dataframe(df: pd.DataFrame) -> pd.DataFrame:
         df['order_date'] = pd.to_datetime(df['order_date'], errors='coerce')
         df = df[~df['order_date'].isna()].copy()
     
-    return df
\ No newline at end of file
+    return df
+
+# Colunas de texto com poucos valores distintos, guardadas como category
+CATEGORY_COLUMNS = ['product_category', 'customer_state', 'customer_city', 'payment_method']
+# IDs trocados por códigos inteiros (a tabela de consulta fica em id_lookup)
+ID_COLUMNS = ['order_id', 'customer_id']
+
+def memory_footprint(df: pd.DataFrame) -> int:
+    """Memória ocupada pelo dataframe em bytes (inclui o conteúdo das strings)"""
+    return int(df.memory_usage(deep=True).sum())
+
+def _factorize_ids(values: pd.Series):
+    """Troca IDs por códigos inteiros; retorna (códigos, valores originais por código)"""
+    codes, uniques = pd.factorize(values)
+    dtype = 'int32' if len(uniques) < np.iinfo('int32').max else 'int64'
+    if (codes < 0).any():
+        # IDs nulos continuam nulos para não entrarem no nunique
+        codes = pd.array(np.where(codes < 0, 0, codes), dtype=dtype.capitalize())
+        codes[values.isna().to_numpy()] = pd.NA
+    else:
+        codes = codes.astype(dtype)
+    return pd.Series(codes, index=values.index), pd.Index(uniques, name=values.name)
+
+def compact_dataframe(df: pd.DataFrame):
+    """
+    Reduz a memória do dataframe já processado.
+    Retorna (df compacto, id_lookup, relatório de memória antes/depois).
+    """
+    before = memory_footprint(df)
+    df = df.copy()
+    id_lookup = {}
+
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            if df[col].nunique() <= len(df) // 2:
+                df[col] = df[col].astype('category')
+
+    for col in ID_COLUMNS:
+        if col in df.columns:
+            df[col], id_lookup[col] = _factorize_ids(df[col])
+
+    if 'quantity' in df.columns:
+        df['quantity'] = pd.to_numeric(df['quantity'], downcast='integer')
+
+    # product_price não entra em somas: float32 basta desde que preserve os centavos.
+    # total_value segue em float64 para as somas de receita ficarem idênticas.
+    if 'product_price' in df.columns:
+        price32 = df['product_price'].astype('float32')
+        if np.array_equal(price32.astype('float64').round(2), df['product_price'].round(2)):
+            df['product_price'] = price32
+
+    report = {'before': before, 'after': memory_footprint(df)}
+    return df, id_lookup, report
+
+def restore_ids(df: pd.DataFrame, id_lookup: dict) -> pd.DataFrame:
+    """Devolve os IDs originais no lugar dos códigos de compact_dataframe (ex.: para gravar em disco)"""
+    df = df.copy(deep=False)
+    for col, lookup in id_lookup.items():
+        codes = df[col]
+        valid = codes.notna().to_numpy()
+        values = np.full(len(df), None, dtype=object)
+        values[valid] = lookup.take(codes[valid].to_numpy(dtype='int64'))
+        df[col] = values
+    return df
+
+def _encode_ids(values: pd.Series, lookup: pd.Index):
+    """Códigos de IDs num id_lookup existente; IDs novos entram no fim da tabela"""
+    codes = lookup.get_indexer(values)
+    missing = (codes < 0) & values.notna().to_numpy()
+    if missing.any():
+        new_ids = pd.Index(pd.unique(values[missing]), name=lookup.name)
+        codes[missing] = len(lookup) + new_ids.get_indexer(values[missing])
+        lookup = lookup.append(new_ids)
+    dtype = 'int32' if len(lookup) < np.iinfo('int32').max else 'int64'
+    if values.isna().any():
+        codes = pd.array(np.where(codes < 0, 0, codes), dtype=dtype.capitalize())
+        codes[values.isna().to_numpy()] = pd.NA
+    else:
+        codes = codes.astype(dtype)
+    return pd.Series(codes, index=values.index), lookup
+
+def _match_numeric_dtypes(df: pd.DataFrame, delta: pd.DataFrame):
+    """
+    Converte as colunas numéricas do delta para os tipos compactos do histórico
+    (ex.: quantity int8, product_price float32), para o concat não promover o
+    histórico inteiro. Só alarga a coluna do histórico quando os valores do
+    delta não cabem no tipo dele.
+    """
+    for col in df.columns:
+        base, values = df[col].dtype, delta[col]
+        if base == values.dtype or base.kind not in 'iuf' or values.dtype.kind not in 'iuf' or values.hasnans:
+            continue
+        if base.kind in 'iu':
+            if values.dtype.kind == 'f':
+                continue
+            info = np.iinfo(getattr(base, 'numpy_dtype', base))
+            if len(values) and (values.min() < info.min or values.max() > info.max):
+                wider = np.promote_types(info.dtype, pd.to_numeric(values, downcast='integer').dtype)
+                # Tipos anuláveis (Int32) continuam anuláveis
+                wider = wider.name.capitalize() if isinstance(base, pd.api.extensions.ExtensionDtype) else wider
+                df[col] = df[col].astype(wider)
+            delta[col] = values.astype(df[col].dtype)
+        else:
+            narrow = values.astype(base)
+            # Mesmo critério de compact_dataframe: o tipo menor precisa preservar os centavos
+            if np.array_equal(narrow.astype('float64').round(2), values.astype('float64').round(2)):
+                delta[col] = narrow
+            else:
+                df[col] = df[col].astype('float64')
+                delta[col] = values.astype('float64')
+    return df, delta
+
+def append_dataframe(df: pd.DataFrame, id_lookup: dict, delta: pd.DataFrame):
+    """
+    Anexa um delta já processado (process_dataframe) ao dataframe compacto.
+    Linhas cujo order_id já existe são descartadas; o delta é codificado com
+    as mesmas categorias, id_lookup e tipos numéricos do histórico, sem
+    reprocessá-lo. O concat ainda copia o histórico a cada anexo (O(linhas);
+    um dataset mapeado em memória passa a ser uma cópia privada, mas com os
+    mesmos tipos compactos).
+    Retorna (df combinado, delta codificado, id_lookup, relatório).
+    """
+    delta = delta.reindex(columns=df.columns)
+    duplicates = 0
+    if 'order_id' in id_lookup:
+        known = id_lookup['order_id'].get_indexer(delta['order_id']) >= 0
+        duplicates = int(known.sum())
+        delta = delta[~known]
+    delta = delta.sort_values('order_date', kind='mergesort') if 'order_date' in delta.columns else delta
+    delta = delta.reset_index(drop=True)
+
+    id_lookup = dict(id_lookup)
+    for col, lookup in id_lookup.items():
+        delta[col], id_lookup[col] = _encode_ids(delta[col], lookup)
+
+    # Categorias novas entram no fim: os códigos do histórico não mudam
+    df = df.copy(deep=False)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            new_values = pd.Index(np.asarray(delta[col].dropna().unique())).difference(df[col].cat.categories)
+            if len(new_values):
+                df[col] = df[col].cat.add_categories(new_values)
+            delta[col] = pd.Categorical(delta[col], categories=df[col].cat.categories)
+    df, delta = _match_numeric_dtypes(df, delta)
+
+    # Exportações diárias chegam depois do histórico: basta concatenar
+    in_order = (
+        'order_date' not in df.columns or len(df) == 0 or len(delta) == 0
+        or delta['order_date'].iloc[0] >= df['order_date'].iloc[-1]
+    )
+    combined = pd.concat([df, delta], ignore_index=True)
+    if not in_order:
+        combined = combined.sort_values('order_date', kind='mergesort').reset_index(drop=True)
+
+    report = {'rows_added': len(delta), 'duplicates': duplicates, 'in_order': in_order}
+    return combined, delta, id_lookup, report
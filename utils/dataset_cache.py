@@ -0,0 +1,380 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from pathlib import Path
+
+import pandas as pd
+
+from config.settings import CACHE_CONFIG, INGEST_CONFIG
+from utils.data_loader import expand_uploads, load_csv_robust
+from utils.data_processor import PROCESSOR_VERSION, process_dataframe
+from utils.perf import stage
+
+try:
+    import pyarrow as pa  # também é o engine do to_parquet/read_parquet
+    import pyarrow.ipc
+    PARQUET_AVAILABLE = True
+except ImportError:  # sem pyarrow o cache fica desativado
+    PARQUET_AVAILABLE = False
+
+def content_hash(raw: bytes) -> str:
+    """Hash do conteúdo bruto do upload"""
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+def _cache_dir() -> Path:
+    path = Path(CACHE_CONFIG['dir'])
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def _entry_path(digest: str) -> Path:
+    # A versão do processador faz parte do nome: mudou a regra, muda o arquivo
+    return _cache_dir() / f"{digest}-v{PROCESSOR_VERSION}.parquet"
+
+def _entries():
+    return [p for p in _cache_dir().iterdir() if p.suffix in ('.parquet', '.arrow')]
+
+def _unlink(path: Path):
+    try:
+        path.unlink(missing_ok=True)
+    except OSError:
+        pass  # ex.: Windows não apaga um arquivo ainda mapeado; sai numa próxima limpeza
+
+def _remove_stale_versions(digest: str = None):
+    """Apaga entradas geradas por outra versão do processador"""
+    current = f"-v{PROCESSOR_VERSION}"
+    for path in _entries():
+        if not path.stem.endswith(current) and (digest is None or path.name.startswith(digest)):
+            _unlink(path)
+
+def _evict(max_bytes: int):
+    """Remove as entradas menos usadas recentemente até caber no limite (a mais recente fica)"""
+    entries = sorted(_entries(), key=lambda p: p.stat().st_mtime)
+    total = sum(p.stat().st_size for p in entries)
+    while len(entries) > 1 and total > max_bytes:
+        oldest = entries.pop(0)
+        total -= oldest.stat().st_size
+        _unlink(oldest)
+
+def get_cached_dataset(digest: str):
+    """Retorna o dataframe processado em cache ou None"""
+    if not (PARQUET_AVAILABLE and CACHE_CONFIG['enabled']):
+        return None
+    path = _entry_path(digest)
+    if not path.exists():
+        _remove_stale_versions(digest)
+        return None
+    try:
+        df = pd.read_parquet(path)
+    except Exception:
+        path.unlink(missing_ok=True)
+        return None
+    os.utime(path)  # marca como usado recentemente (LRU por mtime)
+    return df
+
+def store_dataset(digest: str, df: pd.DataFrame):
+    """Grava o dataframe processado no cache, respeitando o limite de tamanho"""
+    if not (PARQUET_AVAILABLE and CACHE_CONFIG['enabled']):
+        return
+    path = _entry_path(digest)
+    tmp = path.with_suffix('.tmp')
+    try:
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+    except Exception as e:
+        tmp.unlink(missing_ok=True)
+        print(f"Aviso: não foi possível gravar o cache ({e})")
+        return
+    _remove_stale_versions()
+    _evict(CACHE_CONFIG['max_bytes'])
+
+def _prepared_paths(dataset_key: str):
+    """Arquivos Arrow do dataset preparado: linhas e tabelas de IDs (id_lookup)"""
+    name = content_hash(str(dataset_key).encode())
+    return (_cache_dir() / f"{name}-prepared-v{PROCESSOR_VERSION}.arrow",
+            _cache_dir() / f"{name}-ids-v{PROCESSOR_VERSION}.arrow")
+
+def _write_arrow(path: Path, table):
+    tmp = path.with_suffix('.tmp')
+    try:
+        with pa.OSFile(str(tmp), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+    finally:
+        _unlink(tmp)
+
+def _read_arrow(path: Path):
+    """Tabela Arrow mapeada em memória: os buffers apontam para o arquivo, sem cópia"""
+    return pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+
+def _mapped_categorical(column):
+    """
+    Categórica do pandas com os códigos apontando para os índices do
+    dicionário Arrow (sem cópia); None se a coluna tem nulos, cujos índices
+    o Arrow não guarda como -1
+    """
+    if column.num_chunks != 1 or column.null_count:
+        return None
+    chunk = column.chunk(0)
+    codes = chunk.indices.to_numpy(zero_copy_only=True)
+    dtype = pd.CategoricalDtype(chunk.dictionary.to_pandas(), ordered=chunk.type.ordered)
+    return pd.Categorical.from_codes(codes, dtype=dtype, validate=False)
+
+def store_prepared_dataset(dataset_key: str, df: pd.DataFrame, id_lookup: dict, memory_report: dict) -> bool:
+    """
+    Grava o dataset já compactado e ordenado (ver _prepare_dataset na sidebar)
+    em Arrow IPC sem compressão e num único bloco por coluna, o formato que
+    open_prepared_dataset consegue mapear sem cópia. Retorna se gravou.
+    """
+    if not (PARQUET_AVAILABLE and CACHE_CONFIG['enabled'] and CACHE_CONFIG['memory_map']):
+        return False
+    data_path, ids_path = _prepared_paths(dataset_key)
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False).combine_chunks()
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b'sig_memory_report': json.dumps(memory_report or {}).encode()
+        })
+        # IDs originais: uma coluna por tabela de IDs, completadas com nulos até o mesmo tamanho
+        longest = max((len(lookup) for lookup in id_lookup.values()), default=0)
+        columns, lookups = {}, {}
+        for col, lookup in id_lookup.items():
+            values = pa.array(lookup.to_numpy(), from_pandas=True)
+            if pa.types.is_string(values.type):
+                values = values.cast(pa.large_string())  # tipo do ArrowStringArray: abre sem conversão
+            columns[col] = pa.concat_arrays([values, pa.nulls(longest - len(values), values.type)])
+            lookups[col] = {'length': len(lookup), 'name': lookup.name}
+        ids = pa.table(columns).replace_schema_metadata({b'sig_lookups': json.dumps(lookups).encode()})
+        _write_arrow(ids_path, ids)
+        _write_arrow(data_path, table)
+    except Exception as e:
+        _unlink(data_path)
+        _unlink(ids_path)
+        print(f"Aviso: não foi possível gravar o dataset em Arrow ({e})")
+        return False
+    _remove_stale_versions()
+    _evict(CACHE_CONFIG['max_bytes'])
+    return True
+
+def open_prepared_dataset(dataset_key: str):
+    """
+    Abre o dataset gravado por store_prepared_dataset mapeado em memória.
+    Colunas sem nulos viram arrays do pandas sobre as páginas do arquivo
+    (somente leitura; nas categóricas, os códigos): abrir custa quase nada de memória residente, só as
+    partes lidas são carregadas e processos diferentes dividem o page cache
+    do sistema. Fatias por período (df.iloc[a:b]) e seleções por posição
+    continuam apontando para o mesmo mapeamento.
+    Retorna (df, id_lookup, memory_report) ou None.
+    """
+    if not (PARQUET_AVAILABLE and CACHE_CONFIG['enabled'] and CACHE_CONFIG['memory_map']):
+        return None
+    data_path, ids_path = _prepared_paths(dataset_key)
+    if not (data_path.exists() and ids_path.exists()):
+        return None
+    try:
+        table = _read_arrow(data_path)
+        # Categóricas fora do to_pandas, que copiaria os índices do dicionário
+        categoricals = {}
+        for field in table.schema:
+            if pa.types.is_dictionary(field.type):
+                mapped = _mapped_categorical(table.column(field.name))
+                if mapped is not None:
+                    categoricals[field.name] = mapped
+        rest = table.drop_columns(list(categoricals)).to_pandas(split_blocks=True)
+        # copy=False: sem cópia nem consolidação de colunas do mesmo tipo em blocos novos
+        df = pd.DataFrame(
+            {name: categoricals[name] if name in categoricals else rest[name] for name in table.column_names},
+            copy=False
+        )
+        ids = _read_arrow(ids_path)
+        id_lookup = {}
+        for col, info in json.loads(ids.schema.metadata[b'sig_lookups']).items():
+            values = ids.column(col).slice(0, info['length'])
+            if pa.types.is_string(values.type) or pa.types.is_large_string(values.type):
+                values = pd.arrays.ArrowStringArray(values)  # strings seguem no arquivo
+            else:
+                values = values.to_numpy()
+            id_lookup[col] = pd.Index(values, name=info['name'])
+        memory_report = json.loads(table.schema.metadata.get(b'sig_memory_report', b'{}')) or None
+    except Exception:
+        _unlink(data_path)
+        _unlink(ids_path)
+        return None
+    for path in (data_path, ids_path):
+        os.utime(path)  # marca como usado recentemente (LRU por mtime)
+    if memory_report is not None:
+        memory_report['mapped'] = True
+    return df, id_lookup, memory_report
+
+def load_processed_csv(uploaded_file):
+    """Carrega e processa o CSV, reaproveitando o cache em disco quando o conteúdo já foi visto"""
+    raw = uploaded_file.getvalue()
+    with stage('content_hash'):
+        digest = content_hash(raw)
+
+    with stage('get_cached_dataset'):
+        df = get_cached_dataset(digest)
+    if df is None:
+        with stage('load_csv_robust'):
+            df = load_csv_robust(uploaded_file)
+        with stage('process_dataframe'):
+            df = process_dataframe(df)
+        with stage('store_dataset'):
+            store_dataset(digest, df)
+    return df, digest
+
+class _WatchedBytes(BytesIO):
+    """BytesIO que chama on_read(bytes, quebras de linha) a cada trecho novo lido pelo parser"""
+
+    def __init__(self, raw: bytes, on_read):
+        super().__init__(raw)
+        self._on_read = on_read
+        self._seen = 0
+
+    def _watch(self, start: int, data: bytes) -> bytes:
+        # Releituras (amostra do sniff, fallback) não contam duas vezes
+        end = start + len(data)
+        if end > self._seen:
+            new = data[max(0, self._seen - start):]
+            self._seen = end
+            self._on_read(len(new), new.count(b'\n'))
+        return data
+
+    def read(self, size=-1):
+        return self._watch(self.tell(), super().read(size))
+
+    def read1(self, size=-1):
+        return self._watch(self.tell(), super().read1(size))
+
+def parse_csv_bytes(raw: bytes, on_read=None) -> pd.DataFrame:
+    """Lê e processa um CSV em memória (roda nos processos do pool)"""
+    source = BytesIO(raw) if on_read is None else _WatchedBytes(raw, on_read)
+    return process_dataframe(load_csv_robust(source))
+
+def _worker_count() -> int:
+    """Processos do pool: INGEST_CONFIG ou os núcleos disponíveis para este processo"""
+    if INGEST_CONFIG['max_workers']:
+        return INGEST_CONFIG['max_workers']
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def _terminate_workers(pool: ProcessPoolExecutor):
+    """Encerra os processos do pool sem esperar os arquivos em andamento"""
+    terminate = getattr(pool, 'terminate_workers', None)  # Python 3.14+
+    if terminate is not None:
+        terminate()
+        return
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+
+def _parse_in_pool(pending: dict, results: dict, on_done, max_workers: int, poll=None):
+    """
+    Processa os CSVs pendentes num pool de processos, avisando a cada arquivo
+    concluído. poll() é chamado a cada INGEST_CONFIG['poll_seconds'] enquanto
+    há arquivos em andamento; se levantar exceção (cancelamento), os
+    processos são encerrados na hora, sem esperar o que estava rodando.
+    """
+    # Processos novos (spawn), não cópias por fork: o servidor do Streamlit tem várias
+    # threads e a carga roda num job em segundo plano; um fork herdaria locks tomados
+    # por outras threads e o processo filho poderia travar
+    context = multiprocessing.get_context(INGEST_CONFIG['start_method'])
+    # Sem `with`: a saída do bloco chamaria shutdown(wait=True) e o cancelamento
+    # esperaria todos os arquivos em andamento
+    pool = ProcessPoolExecutor(max_workers=min(max_workers, len(pending)), mp_context=context)
+    try:
+        futures = {pool.submit(parse_csv_bytes, raw): i for i, raw in pending.items()}
+        running = set(futures)
+        while running:
+            done, running = wait(running, timeout=INGEST_CONFIG['poll_seconds'], return_when=FIRST_COMPLETED)
+            for future in done:
+                results[futures[future]] = future.result()
+                on_done(futures[future])
+            if running and poll is not None:
+                poll()
+    except BaseException:
+        # Cancelamento (ou erro): descarta o que não começou e encerra o que está rodando
+        _terminate_workers(pool)
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+
+def load_processed_files(uploaded_files, progress=None, on_start=None, on_read=None, cached=None):
+    """
+    Carrega vários CSVs (e CSVs dentro de .zip) como um único dataset.
+    Cada arquivo é processado num pool de processos (ou reaproveitado do
+    cache em disco) e os resultados são concatenados na ordem do upload;
+    colunas ausentes em algum arquivo ficam nulas.
+
+    Callbacks opcionais (podem levantar exceção para interromper a carga):
+    - on_start(arquivos, bytes): total a processar, depois de abrir os .zip;
+    - on_read(bytes, linhas): andamento da leitura; arquivos lidos no próprio
+      processo avisam a cada bloco, os do pool e do cache ao terminar (com o
+      pool rodando, também on_read(0, 0) periodicamente, para o cancelamento
+      ser percebido sem esperar um arquivo acabar);
+    - progress(nome, concluídos, total, linhas): a cada arquivo concluído;
+    - cached(digest do conjunto): consultado antes de ler; se devolver algo
+      diferente de None, a carga para e retorna (esse valor, digest).
+    Retorna (df, digest do conjunto).
+    """
+    with stage('expand_uploads'):
+        sources = expand_uploads(uploaded_files)
+    if not sources:
+        raise ValueError("Nenhum CSV encontrado nos arquivos enviados")
+    if on_start is not None:
+        on_start(len(sources), sum(len(raw) for _, raw in sources))
+
+    digests = [content_hash(raw) for _, raw in sources]
+    digest = digests[0] if len(digests) == 1 else content_hash(''.join(digests).encode())
+    if cached is not None:
+        hit = cached(digest)
+        if hit is not None:
+            return hit, digest
+
+    results = {}
+    with stage('get_cached_dataset'):
+        for i, file_digest in enumerate(digests):
+            df = get_cached_dataset(file_digest)
+            if df is not None:
+                results[i] = df
+
+    watched = set()
+    def on_done(i):
+        if on_read is not None and i not in watched:
+            on_read(len(sources[i][1]), len(results[i]))
+        if progress is not None:
+            progress(sources[i][0], len(results), len(sources), len(results[i]))
+
+    for i in list(results):
+        on_done(i)
+
+    pending = {i: raw for i, (_, raw) in enumerate(sources) if i not in results}
+    max_workers = _worker_count()
+    parallel = (
+        max_workers > 1 and len(pending) > 1
+        and sum(len(raw) for raw in pending.values()) >= INGEST_CONFIG['parallel_min_bytes']
+    )
+    with stage('parse_files'):
+        if parallel:
+            try:
+                poll = (lambda: on_read(0, 0)) if on_read is not None else None
+                _parse_in_pool(pending, results, on_done, max_workers, poll)
+            except (BrokenProcessPool, OSError) as e:
+                # Ambiente sem suporte a processos: segue no processo atual
+                print(f"Aviso: pool de processos indisponível ({e})")
+        for i, raw in pending.items():
+            if i not in results:
+                if on_read is not None:
+                    watched.add(i)
+                results[i] = parse_csv_bytes(raw, on_read)
+                on_done(i)
+
+    with stage('store_dataset'):
+        for i in pending:
+            store_dataset(digests[i], results[i])
+
+    df = pd.concat([results[i] for i in range(len(sources))], ignore_index=True)
+    return df, digest
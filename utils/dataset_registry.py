@@ -0,0 +1,213 @@
+import threading
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from config.settings import REGISTRY_CONFIG
+from utils.data_processor import memory_footprint
+
+def _nbytes(obj, depth: int = 0) -> int:
+    """Memória aproximada de um artefato (dataframes e arrays, dentro de dicionários ou objetos simples)"""
+    if isinstance(obj, pd.DataFrame):
+        return memory_footprint(obj)
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if depth > 3:
+        return 0
+    if isinstance(obj, dict):
+        return sum(_nbytes(value, depth + 1) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(_nbytes(value, depth + 1) for value in obj)
+    if hasattr(obj, '__dict__'):
+        return _nbytes(vars(obj), depth + 1)  # ex.: DateStateIndex
+    return 0
+
+class DatasetEntry:
+    """Dataset processado (imutável) e os artefatos derivados dele (cubo, índice, conexão)"""
+
+    def __init__(self, key, df: pd.DataFrame, id_lookup: dict, memory_report: dict, artifacts: dict = None,
+                 registry_lock=None):
+        self.key = key
+        self.df = df
+        self.id_lookup = id_lookup
+        self.memory_report = memory_report
+        self.artifacts = dict(artifacts or {})
+        self.refs = 0
+        self.last_used = time.monotonic()
+        self.nbytes = memory_footprint(df) + sum(_nbytes(value) for value in self.artifacts.values())
+        self._locks = {}
+        self._lock = threading.Lock()
+        # nbytes é lido pelo registro (stats, _evict) com o lock dele
+        self._registry_lock = registry_lock or threading.RLock()
+
+    def artifact(self, name: str, builder):
+        """Artefato do dataset, construído uma vez e compartilhado por todas as sessões"""
+        if name in self.artifacts:
+            return self.artifacts[name]
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        # Sessões pedindo o mesmo artefato esperam a primeira construção em vez de repeti-la
+        with lock:
+            if name not in self.artifacts:
+                value = builder()
+                size = _nbytes(value)
+                with self._registry_lock:
+                    self.nbytes += size
+                    self.artifacts[name] = value
+        return self.artifacts[name]
+
+class DatasetHandle:
+    """
+    O que a sessão guarda no lugar do dataframe: uma referência contada a
+    uma entrada do registro. É liberada com release() ou, se a sessão
+    simplesmente terminar, quando o handle for coletado.
+    """
+
+    def __init__(self, registry: 'DatasetRegistry', entry: DatasetEntry):
+        self.entry = entry
+        self._release = weakref.finalize(self, registry._release, entry)
+
+    @property
+    def key(self):
+        return self.entry.key
+
+    @property
+    def df(self) -> pd.DataFrame:
+        return self.entry.df
+
+    @property
+    def id_lookup(self) -> dict:
+        return self.entry.id_lookup
+
+    @property
+    def memory_report(self) -> dict:
+        return self.entry.memory_report
+
+    def artifact(self, name: str, builder):
+        return self.entry.artifact(name, builder)
+
+    def release(self):
+        """Devolve a referência (chamadas repetidas não fazem nada)"""
+        self._release()
+
+class DatasetRegistry:
+    """
+    Datasets processados do processo, chaveados pela impressão digital do
+    conteúdo (dataset_key). Sessões que abrem os mesmos dados recebem
+    handles para a mesma entrada, então a memória não cresce com o número
+    de usuários. Entradas sem nenhum handle ficam ociosas e são descartadas
+    depois de idle_seconds ou, as menos usadas primeiro, quando o total
+    passa de max_bytes; entradas em uso nunca são descartadas. Além de cada
+    acquire/put/release, uma thread verifica as ociosas periodicamente, para
+    o prazo valer também com o servidor sem movimento.
+    Thread-safe: as sessões do Streamlit rodam em threads do mesmo processo.
+    """
+
+    def __init__(self, max_bytes: int, idle_seconds: float):
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._entries = {}
+        # RLock: o finalizador de um handle pode rodar (coleta de lixo) com o lock já tomado
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._sweeper = None
+
+    def _handle(self, entry: DatasetEntry) -> DatasetHandle:
+        # Chamado com o lock: a contagem sobe antes de a entrada poder ser descartada
+        entry.refs += 1
+        entry.last_used = time.monotonic()
+        return DatasetHandle(self, entry)
+
+    def _release(self, entry: DatasetEntry):
+        with self._lock:
+            entry.refs -= 1
+            entry.last_used = time.monotonic()
+            self._evict()
+
+    def acquire(self, key):
+        """Handle para o dataset já registrado com key, ou None"""
+        with self._lock:
+            self._evict()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._handle(entry)
+
+    def put(self, key, df: pd.DataFrame, id_lookup: dict, memory_report: dict, artifacts: dict = None) -> DatasetHandle:
+        """
+        Registra um dataset e retorna um handle para ele. Se outra sessão já
+        registrou a mesma chave, o handle aponta para a entrada existente e o
+        dataframe recebido é descartado.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = DatasetEntry(key, df, id_lookup, memory_report, artifacts, registry_lock=self._lock)
+                self._entries[key] = entry
+            handle = self._handle(entry)
+            self._evict()
+            self._start_sweeper()
+            return handle
+
+    def _start_sweeper(self):
+        """Inicia (uma vez, com o lock) a thread que descarta as entradas ociosas vencidas"""
+        if self._sweeper is None and self.idle_seconds:
+            interval = min(max(self.idle_seconds / 4, 1.0), 60.0)
+            self._sweeper = threading.Thread(
+                target=_sweep, args=(weakref.ref(self), interval), name='dataset-registry-sweeper', daemon=True
+            )
+            self._sweeper.start()
+
+    def _evict(self):
+        """Descarta entradas ociosas vencidas e, acima do limite, as menos usadas (com o lock)"""
+        now = time.monotonic()
+        idle = sorted((e for e in self._entries.values() if e.refs == 0), key=lambda e: e.last_used)
+        total = sum(e.nbytes for e in self._entries.values())
+        for entry in idle:
+            if now - entry.last_used < self.idle_seconds and total <= self.max_bytes:
+                break
+            if entry.refs > 0 or self._entries.get(entry.key) is not entry:
+                continue
+            del self._entries[entry.key]
+            total -= entry.nbytes
+            self.evictions += 1
+
+    def clear(self):
+        """Esquece todas as entradas (handles existentes continuam válidos)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'in_use': sum(1 for e in self._entries.values() if e.refs > 0),
+                'handles': sum(e.refs for e in self._entries.values()),
+                'bytes': sum(e.nbytes for e in self._entries.values()),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+def _sweep(registry_ref, interval: float):
+    """Laço da thread de limpeza; termina quando o registro deixa de existir"""
+    while True:
+        time.sleep(interval)
+        registry = registry_ref()
+        if registry is None:
+            return
+        with registry._lock:
+            registry._evict()
+        del registry
+
+# Compartilhado por todas as sessões do processo
+DATASETS = DatasetRegistry(REGISTRY_CONFIG['max_bytes'], REGISTRY_CONFIG['idle_seconds'])
@@ -0,0 +1,228 @@
+import os
+import re
+import shutil
+import sqlite3
+import time
+import unicodedata
+from contextlib import closing
+from pathlib import Path
+
+import pandas as pd
+
+from config.settings import STORE_CONFIG
+from utils.data_processor import PROCESSOR_VERSION
+# Sem pyarrow (engine do to_parquet/read_parquet) o armazenamento por empresa fica desativado
+from utils.dataset_cache import PARQUET_AVAILABLE
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS companies (
+    company_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    min_date TEXT,
+    max_date TEXT,
+    processor_version INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS partitions (
+    company_id TEXT NOT NULL,
+    month TEXT NOT NULL,
+    path TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    min_date TEXT NOT NULL,
+    max_date TEXT NOT NULL,
+    PRIMARY KEY (company_id, month)
+);
+"""
+
+def store_enabled() -> bool:
+    return PARQUET_AVAILABLE and STORE_CONFIG['enabled']
+
+def company_id(name: str) -> str:
+    """Identificador da empresa para pastas e catálogo ('Loja São João' -> 'loja-sao-joao')"""
+    text = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-') or 'empresa'
+
+def _root() -> Path:
+    path = Path(STORE_CONFIG['dir'])
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def _connect():
+    con = sqlite3.connect(_root() / 'catalog.sqlite', timeout=30)
+    con.executescript(_SCHEMA)
+    return con
+
+def _resolve_company_id(con, name: str) -> str:
+    """
+    company_id para o nome: o da empresa já salva com esse nome ou, se o slug
+    já pertence a outra empresa ('Loja A' e 'loja-a'), o slug com um sufixo
+    """
+    row = con.execute("SELECT company_id FROM companies WHERE name = ?", (name,)).fetchone()
+    if row is not None:
+        return row[0]
+    base = company_id(name)
+    cid, n = base, 1
+    while con.execute("SELECT 1 FROM companies WHERE company_id = ?", (cid,)).fetchone() is not None:
+        n += 1
+        cid = f"{base}-{n}"
+    return cid
+
+def _remove_old_versions(cid: str, keep: set):
+    """
+    Apaga versões substituídas há mais de STORE_CONFIG['old_version_seconds'].
+    Não é feito na hora da troca: quem já resolveu os caminhos da versão
+    anterior em company_partitions ainda consegue ler os arquivos.
+    """
+    company_dir = _root() / cid
+    if not company_dir.exists():
+        return
+    limit = time.time() - STORE_CONFIG['old_version_seconds']
+    for path in company_dir.iterdir():
+        if path.is_dir() and path.name not in keep and path.stat().st_mtime < limit:
+            shutil.rmtree(path, ignore_errors=True)
+
+def save_company_dataset(name: str, df: pd.DataFrame) -> dict:
+    """
+    Grava o dataset processado (process_dataframe) da empresa em partições
+    Parquet por mês e registra no catálogo. Substitui a versão anterior de
+    uma vez: os arquivos novos são gravados antes e o catálogo troca numa
+    transação, então quem lê nunca vê uma mistura das duas. A versão
+    anterior fica em disco por um tempo (ver _remove_old_versions).
+    """
+    with closing(_connect()) as con:
+        cid = _resolve_company_id(con, name)
+    version = f"v{time.time_ns()}"
+    version_dir = _root() / cid / version
+    version_dir.mkdir(parents=True)
+
+    dates = df['order_date']
+    months = dates.dt.to_period('M').astype(str)
+    partitions = []
+    try:
+        for month, part in df.groupby(months, sort=True):
+            path = version_dir / f"month={month}.parquet"
+            part.reset_index(drop=True).to_parquet(path, index=False)
+            partitions.append((
+                cid, month, str(path.relative_to(_root())), len(part),
+                part['order_date'].min().isoformat(), part['order_date'].max().isoformat()
+            ))
+    except BaseException:
+        # Versão incompleta nunca entra no catálogo; não deixa os arquivos para trás
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+
+    entry = {
+        'company_id': cid,
+        'name': name,
+        'version': version,
+        'rows': len(df),
+        'min_date': dates.min().isoformat() if len(df) else None,
+        'max_date': dates.max().isoformat() if len(df) else None,
+        'processor_version': PROCESSOR_VERSION,
+        'updated_at': time.time()
+    }
+    with closing(_connect()) as con, con:
+        con.execute("BEGIN IMMEDIATE")  # a checagem e a troca na mesma transação de escrita
+        old = con.execute("SELECT version, name FROM companies WHERE company_id = ?", (cid,)).fetchone()
+        if old is not None and old[1] != name:
+            # Outra empresa pegou o mesmo id entre a escolha e a gravação
+            shutil.rmtree(version_dir, ignore_errors=True)
+            raise ValueError(f"O identificador '{cid}' já pertence à empresa '{old[1]}'")
+        con.execute("DELETE FROM partitions WHERE company_id = ?", (cid,))
+        con.executemany("INSERT INTO partitions VALUES (?, ?, ?, ?, ?, ?)", partitions)
+        con.execute(
+            "INSERT OR REPLACE INTO companies VALUES (:company_id, :name, :version, :rows, :min_date, "
+            ":max_date, :processor_version, :updated_at)", entry
+        )
+    if old is not None:
+        os.utime(_root() / cid / old[0])  # marca quando a versão foi substituída
+    _remove_old_versions(cid, keep={version})
+    return entry
+
+def list_companies() -> pd.DataFrame:
+    """Empresas salvas (gravadas com a versão atual do processador), mais recentes primeiro"""
+    if not store_enabled():
+        return pd.DataFrame(columns=['company_id', 'name', 'version', 'rows', 'min_date', 'max_date'])
+    with closing(_connect()) as con:
+        companies = pd.read_sql_query(
+            "SELECT * FROM companies WHERE processor_version = ? ORDER BY updated_at DESC",
+            con, params=(PROCESSOR_VERSION,)
+        )
+    for col in ['min_date', 'max_date']:
+        companies[col] = pd.to_datetime(companies[col])
+    return companies
+
+def company_snapshot(cid: str):
+    """
+    (versão salva atual, partições dessa versão) lidas numa única transação:
+    um salvamento concorrente não mistura a versão de uma leitura com as
+    partições de outra.
+    """
+    with closing(_connect()) as con:
+        con.execute("BEGIN")
+        row = con.execute("SELECT version FROM companies WHERE company_id = ?", (cid,)).fetchone()
+        if row is None:
+            raise KeyError(f"Empresa não encontrada no armazenamento: {cid}")
+        partitions = pd.read_sql_query(
+            "SELECT month, path, rows, min_date, max_date FROM partitions WHERE company_id = ? ORDER BY month",
+            con, params=(cid,)
+        )
+    return row[0], partitions
+
+def prune_partitions(partitions: pd.DataFrame, start_date=None, end_date=None) -> pd.DataFrame:
+    """Partições que têm linhas no período (poda pelo catálogo, sem abrir arquivos)"""
+    # Datas em ISO: a comparação de texto segue a ordem cronológica
+    keep = pd.Series(True, index=partitions.index)
+    if start_date is not None:
+        keep &= partitions['max_date'] >= pd.Timestamp(start_date).isoformat()
+    if end_date is not None:
+        keep &= partitions['min_date'] < (pd.Timestamp(end_date) + pd.Timedelta(days=1)).isoformat()
+    return partitions[keep]
+
+def company_partitions(cid: str, start_date=None, end_date=None) -> pd.DataFrame:
+    """Partições da versão salva atual da empresa que têm linhas no período"""
+    return prune_partitions(company_snapshot(cid)[1], start_date, end_date)
+
+def company_dataset_key(cid: str, version: str, start_date=None, end_date=None) -> str:
+    """Chave do período da empresa numa versão salva (muda a cada novo salvamento)"""
+    return f"store-{cid}-{version}-{start_date}-{end_date}"
+
+def read_partitions(partitions: pd.DataFrame, start_date=None, end_date=None) -> pd.DataFrame:
+    """
+    Lê as partições (de company_snapshot) que o período toca e recorta os dias
+    de borda; sem período lê todas as partições recebidas.
+    """
+    selected = prune_partitions(partitions, start_date, end_date)
+    if len(selected) == 0:
+        # Período sem dados: mantém as colunas lendo o esquema de uma partição qualquer
+        if len(partitions) == 0:
+            return pd.DataFrame()
+        selected = partitions.iloc[:1]
+    df = pd.concat([pd.read_parquet(_root() / path) for path in selected['path']], ignore_index=True)
+
+    days = df['order_date'].dt.normalize()
+    keep = pd.Series(True, index=df.index)
+    if start_date is not None:
+        keep &= days >= pd.Timestamp(start_date)
+    if end_date is not None:
+        keep &= days <= pd.Timestamp(end_date)
+    df = df[keep]
+    return df.reset_index(drop=True)
+
+def load_company_dataset(cid: str, start_date=None, end_date=None):
+    """
+    Lê só as partições mensais que o período toca, da versão salva atual.
+    Retorna (df processado, dataset_key).
+    """
+    version, partitions = company_snapshot(cid)
+    df = read_partitions(partitions, start_date, end_date)
+    return df, company_dataset_key(cid, version, start_date, end_date)
+
+def delete_company(cid: str):
+    """Remove a empresa do catálogo e apaga as partições"""
+    with closing(_connect()) as con, con:
+        con.execute("DELETE FROM partitions WHERE company_id = ?", (cid,))
+        con.execute("DELETE FROM companies WHERE company_id = ?", (cid,))
+    shutil.rmtree(_root() / cid, ignore_errors=True)
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+def sort_by_date(df: pd.DataFrame, date_col: str = 'order_date') -> pd.DataFrame:
+    """Ordena o dataframe pela data (ordenação estável) se ainda não estiver ordenado"""
+    if date_col not in df.columns or df[date_col].is_monotonic_increasing:
+        return df
+    return df.sort_values(date_col, kind='mergesort').reset_index(drop=True)
+
+class DateStateIndex:
+    """
+    Índice de um dataframe ordenado por data: o período vira um intervalo de
+    posições via busca binária e cada estado guarda as posições das suas linhas.
+    Filtrar custa O(log n + k) e, sem filtro de estado, devolve uma fatia (sem cópia).
+    """
+
+    def __init__(self, df: pd.DataFrame, date_col: str = 'order_date', state_col: str = 'customer_state'):
+        dates = df[date_col]
+        if not dates.is_monotonic_increasing:
+            raise ValueError(f"O dataframe precisa estar ordenado por '{date_col}'")
+        self.date_col = date_col
+        self.state_col = state_col
+        self.dates = dates.to_numpy()
+        self.n_rows = len(df)
+        self.state_positions = {}
+        self.has_null_state = False
+
+        if state_col in df.columns:
+            states = df[state_col]
+            dtype = 'int32' if self.n_rows < np.iinfo('int32').max else 'int64'
+            for state, positions in states.groupby(states, observed=True).indices.items():
+                self.state_positions[state] = positions.astype(dtype)
+            self.has_null_state = bool(states.isna().any())
+
+    def extend(self, df: pd.DataFrame, start: int) -> 'DateStateIndex':
+        """
+        Índice de df cujas linhas antes de start são as mesmas já indexadas
+        (ex.: linhas anexadas no fim). Só o trecho df[start:] é reindexado.
+        """
+        start = min(start, self.n_rows)
+        tail = df.iloc[start:]
+        index = DateStateIndex(tail, self.date_col, self.state_col)
+        if start > 0 and len(tail) and index.dates[0] < self.dates[start - 1]:
+            raise ValueError(f"O dataframe precisa estar ordenado por '{self.date_col}'")
+
+        index.dates = np.concatenate([self.dates[:start], index.dates])
+        index.n_rows = len(df)
+        dtype = 'int32' if index.n_rows < np.iinfo('int32').max else 'int64'
+        state_positions = {}
+        for state in self.state_positions.keys() | index.state_positions.keys():
+            head = self.state_positions.get(state, np.empty(0, dtype=dtype))
+            head = head[:np.searchsorted(head, start)]
+            new = index.state_positions.get(state, np.empty(0, dtype=dtype)) + start
+            state_positions[state] = np.concatenate([head, new]).astype(dtype)
+        index.state_positions = state_positions
+        index.has_null_state = index.has_null_state or (
+            self.has_null_state and df[self.state_col].iloc[:start].isna().any()
+        )
+        return index
+
+    def date_bounds(self, start, end):
+        """
+        Intervalo [lo, hi) de posições com data entre os dias start e end,
+        inclusive o dia end inteiro (como o cubo e o CAST(... AS DATE) do DuckDB)
+        """
+        start = np.datetime64(pd.Timestamp(start).normalize(), 'ns')
+        end = np.datetime64(pd.Timestamp(end).normalize() + pd.Timedelta(days=1), 'ns')
+        lo = int(np.searchsorted(self.dates, start, side='left'))
+        hi = int(np.searchsorted(self.dates, end, side='left'))
+        return lo, max(lo, hi)
+
+    def _covers_all_states(self, states) -> bool:
+        # Sem estados nulos, selecionar todos equivale a não filtrar
+        return not self.has_null_state and set(self.state_positions).issubset(states)
+
+    def positions(self, start, end, states=None):
+        """Posições das linhas no filtro: um slice (só período) ou um array ordenado"""
+        lo, hi = self.date_bounds(start, end)
+        if not states or not self.state_positions or self._covers_all_states(states):
+            return slice(lo, hi)
+
+        parts = []
+        for state in states:
+            positions = self.state_positions.get(state)
+            if positions is None:
+                continue
+            a, b = np.searchsorted(positions, [lo, hi])
+            if b > a:
+                parts.append(positions[a:b])
+        if not parts:
+            return np.empty(0, dtype='int64')
+        if len(parts) == 1:
+            return parts[0]
+        return np.sort(np.concatenate(parts), kind='mergesort')
+
+    def filter(self, df: pd.DataFrame, start, end, states=None) -> pd.DataFrame:
+        """Aplica período e estados ao dataframe indexado"""
+        positions = self.positions(start, end, states)
+        if isinstance(positions, slice):
+            return df.iloc[positions]
+        return df.take(positions)
@@ -0,0 +1,36 @@
+import numpy as np
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """
+    Índices dos pontos escolhidos pelo LTTB (largest-triangle-three-buckets).
+    Mantém o primeiro e o último ponto e, em cada balde, o ponto que forma o
+    maior triângulo com o ponto escolhido antes e a média do balde seguinte,
+    preservando picos e vales da série. x precisa estar ordenado.
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = x - x[0]  # datas em ns perdem precisão em float sem o deslocamento
+    # Baldes do meio da série: [edges[i], edges[i+1]); o último ponto fica sozinho
+    every = (n - 2) / (n_out - 2)
+    edges = np.append((np.arange(n_out - 1) * every).astype('int64') + 1, n)
+
+    selected = np.empty(n_out, dtype='int64')
+    selected[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2]
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
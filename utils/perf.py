@@ -0,0 +1,127 @@
+import json
+import logging
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+from config.settings import PERF_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Cada sessão do Streamlit roda o script na sua própria thread
+_local = threading.local()
+
+# O tracemalloc é do processo inteiro: é ligado uma vez e nunca desligado, e
+# só mede memória a execução que roda sozinha (as demais ficam só com tempo).
+# reset_peak é chamado apenas por ela, dona de _memory_owner.
+_memory_owner = threading.Lock()
+_activity_lock = threading.Lock()
+_activity = {'running': 0, 'started': 0}
+
+class RerunProfile:
+    """Etapas medidas numa execução do script (ordem de início, com aninhamento)"""
+
+    def __init__(self, track_memory: bool):
+        self.rerun_id = uuid.uuid4().hex[:8]
+        self.track_memory = track_memory
+        self.started = time.perf_counter()
+        self.stages = []
+        self.total_seconds = None
+        self._stack = []
+        self._started_count = 0
+
+    def to_records(self) -> list:
+        return [dict(stage) for stage in self.stages]
+
+def _log(event: dict):
+    if not PERF_CONFIG['log']:
+        return
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    logger.info(json.dumps(event, ensure_ascii=False))
+
+def _running_alone(profile: RerunProfile) -> bool:
+    """Nenhuma outra execução começou ou está rodando desde o início desta"""
+    with _activity_lock:
+        return _activity['running'] == 1 and _activity['started'] == profile._started_count
+
+def current_profile():
+    """Perfil da execução atual (None com a instrumentação desligada)"""
+    return getattr(_local, 'profile', None)
+
+@contextmanager
+def rerun():
+    """Delimita uma execução do script; com a instrumentação desligada não faz nada"""
+    if not PERF_CONFIG['enabled']:
+        yield None
+        return
+
+    with _activity_lock:
+        _activity['running'] += 1
+        _activity['started'] += 1
+        started_count = _activity['started']
+        alone = _activity['running'] == 1
+    owner = PERF_CONFIG['track_memory'] and alone and _memory_owner.acquire(blocking=False)
+    profile = RerunProfile(owner)
+    profile._started_count = started_count
+    if owner and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _local.profile = profile
+    try:
+        yield profile
+    finally:
+        _local.profile = None
+        profile.total_seconds = time.perf_counter() - profile.started
+        if owner:
+            _memory_owner.release()
+        with _activity_lock:
+            _activity['running'] -= 1
+        for record in profile.stages:
+            _log({'event': 'stage', 'rerun': profile.rerun_id, **record})
+        _log({'event': 'rerun', 'rerun': profile.rerun_id,
+              'ms': round(profile.total_seconds * 1000, 2), 'stages': len(profile.stages)})
+
+@contextmanager
+def stage(name: str):
+    """Mede tempo (e pico de memória) de um trecho da execução atual"""
+    profile = getattr(_local, 'profile', None)
+    if profile is None:
+        yield
+        return
+
+    record = {'stage': name, 'depth': len(profile._stack)}
+    profile.stages.append(record)
+    frame = {'peak': 0, 'base': 0}
+    if profile.track_memory and not _running_alone(profile):
+        profile.track_memory = False  # outra sessão alocando ao mesmo tempo: os números seriam dela também
+    if profile.track_memory:
+        current, peak = tracemalloc.get_traced_memory()
+        # O pico acumulado até aqui pertence à etapa externa
+        if profile._stack:
+            parent = profile._stack[-1]
+            parent['peak'] = max(parent['peak'], peak)
+        tracemalloc.reset_peak()
+        frame['base'] = current
+    profile._stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        profile._stack.pop()
+        record['start_ms'] = round((start - profile.started) * 1000, 2)
+        record['ms'] = round((end - start) * 1000, 2)
+        if profile.track_memory and not _running_alone(profile):
+            profile.track_memory = False
+        if profile.track_memory:
+            peak = max(tracemalloc.get_traced_memory()[1], frame['peak'])
+            record['peak_mb'] = round((peak - frame['base']) / 1024 ** 2, 2)
+            if profile._stack:
+                parent = profile._stack[-1]
+                parent['peak'] = max(parent['peak'], peak)
@@ -1,62 +1,200 @@
+import argparse
+from pathlib import Path
+
 import pandas as pd
 import numpy as np
 
+CATEGORIES = ['Eletrônicos', 'Moda', 'Casa e Decoração', 'Livros', 'Esportes', 'Beleza']
+PRICE_RANGES = {
+    'Eletrônicos': (200, 3500),
+    'Moda': (30, 700),
+    'Casa e Decoração': (60, 1500),
+    'Livros': (15, 120),
+    'Esportes': (40, 900),
+    'Beleza': (20, 400)
+}
+STATES = ['SP', 'RJ', 'MG', 'RS', 'PR', 'SC', 'BA', 'PE']
+STATE_PROBS = [0.35, 0.20, 0.12, 0.08, 0.06, 0.05, 0.08, 0.06]
+CITIES_BY_STATE = {
+    'SP': ['São Paulo', 'Campinas', 'Santos', 'Ribeirão Preto'],
+    'RJ': ['Rio de Janeiro', 'Niterói'],
+    'MG': ['Belo Horizonte', 'Uberlândia'],
+    'RS': ['Porto Alegre', 'Caxias do Sul'],
+    'PR': ['Curitiba', 'Londrina'],
+    'SC': ['Florianópolis', 'Joinville'],
+    'BA': ['Salvador', 'Feira de Santana'],
+    'PE': ['Recife', 'Olinda'],
+}
+PAYMENT_METHODS = ['Cartão de Crédito', 'PIX', 'Boleto', 'Cartão de Débito']
+PAYMENT_PROBS = [0.45, 0.3, 0.15, 0.10]
+
+# Linhas geradas por chunk; cada chunk tem a sua semente (seed, índice do chunk)
+SAMPLE_CHUNK_ROWS = 1_000_000
+
 def create_sample_data(n_records=1000):
     """Gera dados de exemplo para o dashboard"""
-    np.random.seed(42)
-    
-    categories = ['Eletrônicos', 'Moda', 'Casa e Decoração', 'Livros', 'Esportes', 'Beleza']
-    states = ['SP', 'RJ', 'MG', 'RS', 'PR', 'SC', 'BA', 'PE']
-    cities_by_state = {
-        'SP': ['São Paulo', 'Campinas', 'Santos', 'Ribeirão Preto'],
-        'RJ': ['Rio de Janeiro', 'Niterói'],
-        'MG': ['Belo Horizonte', 'Uberlândia'],
-        'RS': ['Porto Alegre', 'Caxias do Sul'],
-        'PR': ['Curitiba', 'Londrina'],
-        'SC': ['Florianópolis', 'Joinville'],
-        'BA': ['Salvador', 'Feira de Santana'],
-        'PE': ['Recife', 'Olinda'],
+    return generate_sample_data(n_records, seed=42)
+
+def _format_ids(prefix: str, numbers: np.ndarray, width: int) -> np.ndarray:
+    """Formata IDs como prefixo + número com zeros à esquerda, sem laço em Python"""
+    prefix = np.frombuffer(prefix.encode(), dtype='uint8')
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype='int64')
+    chars = np.empty((len(numbers), len(prefix) + width), dtype='uint8')
+    chars[:, :len(prefix)] = prefix
+    chars[:, len(prefix):] = numbers[:, None] // powers % 10 + ord('0')
+    return chars.view(f'S{chars.shape[1]}').ravel().astype('U').astype(object)
+
+def _id_width(max_number: int) -> int:
+    return max(6, len(str(max_number)))
+
+def _catalog(extra_categories: int, extra_cities_per_state: int, seed: int):
+    """Categorias (com faixas de preço) e cidades, com valores sintéticos extras para alta cardinalidade"""
+    categories = list(CATEGORIES)
+    low = [PRICE_RANGES[c][0] for c in CATEGORIES]
+    high = [PRICE_RANGES[c][1] for c in CATEGORIES]
+    if extra_categories > 0:
+        rng = np.random.default_rng([seed, 0xCA7])
+        extra_low = np.round(rng.uniform(10, 500, extra_categories))
+        categories += [f'Categoria {i + 1:05d}' for i in range(extra_categories)]
+        low += extra_low.tolist()
+        high += np.round(extra_low * rng.uniform(2, 8, extra_categories)).tolist()
+
+    cities = []
+    city_offsets = []
+    city_counts = []
+    for state in STATES:
+        state_cities = CITIES_BY_STATE[state] + [
+            f'Cidade {state} {i + 1:05d}' for i in range(extra_cities_per_state)
+        ]
+        city_offsets.append(len(cities))
+        city_counts.append(len(state_cities))
+        cities += state_cities
+
+    return {
+        'categories': categories,
+        'price_low': np.array(low, dtype='float64'),
+        'price_high': np.array(high, dtype='float64'),
+        'cities': cities,
+        'city_offsets': np.array(city_offsets, dtype='int64'),
+        'city_counts': np.array(city_counts, dtype='int64')
     }
-    payment_methods = ['Cartão de Crédito', 'PIX', 'Boleto', 'Cartão de Débito']
-    
-    state_probs = np.array([0.35, 0.20, 0.12, 0.08, 0.06, 0.05, 0.08, 0.06])
-    state_probs = state_probs / state_probs.sum()
-    
-    dates = pd.date_range(start='2024-01-01', end='2024-10-31').to_pydatetime().tolist()
-    rows = []
-    
-    for i in range(n_records):
-        state = np.random.choice(states, p=state_probs)
-        city = np.random.choice(cities_by_state[state])
-        cat = np.random.choice(categories)
-        
-        price_ranges = {
-            'Eletrônicos': (200, 3500),
-            'Moda': (30, 700),
-            'Casa e Decoração': (60, 1500),
-            'Livros': (15, 120),
-            'Esportes': (40, 900),
-            'Beleza': (20, 400)
-        }
-        price = round(np.random.uniform(*price_ranges[cat]), 2)
-        
-        qty = int(np.random.randint(1, 5))
-        total = round(price * qty, 2)
-        datec = pd.Timestamp(np.random.choice(dates)).strftime('%Y-%m-%d')
-        
-        rows.append({
-            'order_id': f'ORD_{i+1:06d}',
-            'customer_id': f'CUST_{np.random.randint(1,2000):06d}',
-            'order_date': datec,
-            'product_category': cat,
+
+def _day_weights(days: pd.DatetimeIndex, seasonality: float) -> np.ndarray:
+    """Peso de cada dia: uniforme com seasonality=0; com seasonality>0 o pico fica no fim de novembro"""
+    day_of_year = days.dayofyear.to_numpy()
+    weights = 1 + seasonality * np.cos(2 * np.pi * (day_of_year - 333) / 365.25)
+    weights = np.clip(weights, 0.05, None)
+    return weights / weights.sum()
+
+def iter_sample_chunks(n_records=1000, seed=42, n_customers=2000, start_date='2024-01-01',
+                       end_date='2024-10-31', seasonality=0.0, extra_categories=0,
+                       extra_cities_per_state=0, chunk_rows=None):
+    """
+    Gera os dados de exemplo em chunks vetorizados (mesmo esquema e distribuições
+    de create_sample_data). Mesma seed e chunk_rows → mesmos dados.
+    """
+    chunk_rows = chunk_rows or SAMPLE_CHUNK_ROWS
+    catalog = _catalog(extra_categories, extra_cities_per_state, seed)
+    days = pd.date_range(start=start_date, end=end_date)
+    day_probs = _day_weights(days, seasonality)
+    state_probs = np.array(STATE_PROBS) / np.sum(STATE_PROBS)
+
+    # Categorias fixas em todos os chunks: concatenar mantém o dtype category
+    category_dtype = pd.CategoricalDtype(catalog['categories'])
+    state_dtype = pd.CategoricalDtype(STATES)
+    city_dtype = pd.CategoricalDtype(catalog['cities'])
+    payment_dtype = pd.CategoricalDtype(PAYMENT_METHODS)
+    customer_ids = _format_ids('CUST_', np.arange(n_customers + 1), _id_width(n_customers))
+    order_width = _id_width(n_records)
+
+    for chunk_index, start in enumerate(range(0, n_records, chunk_rows)):
+        rng = np.random.default_rng([seed, chunk_index])
+        n = min(chunk_rows, n_records - start)
+
+        state = rng.choice(len(STATES), size=n, p=state_probs)
+        city = catalog['city_offsets'][state] + (rng.random(n) * catalog['city_counts'][state]).astype('int64')
+        category = rng.integers(0, len(catalog['categories']), size=n)
+        low = catalog['price_low'][category]
+        price = np.round(low + rng.random(n) * (catalog['price_high'][category] - low), 2)
+        qty = rng.integers(1, 5, size=n)
+        day = rng.choice(len(days), size=n, p=day_probs)
+        customer = rng.integers(1, n_customers + 1, size=n)
+        payment = rng.choice(len(PAYMENT_METHODS), size=n, p=PAYMENT_PROBS)
+
+        yield pd.DataFrame({
+            'order_id': _format_ids('ORD_', np.arange(start + 1, start + n + 1), order_width),
+            'customer_id': customer_ids[customer],
+            'order_date': days.values[day],
+            'product_category': pd.Categorical.from_codes(category, dtype=category_dtype),
             'product_price': price,
             'quantity': qty,
-            'total_value': total,
-            'customer_state': state,
-            'customer_city': city,
-            'payment_method': np.random.choice(payment_methods, p=[0.45,0.3,0.15,0.10])
+            'total_value': np.round(price * qty, 2),
+            'customer_state': pd.Categorical.from_codes(state, dtype=state_dtype),
+            'customer_city': pd.Categorical.from_codes(city, dtype=city_dtype),
+            'payment_method': pd.Categorical.from_codes(payment, dtype=payment_dtype)
         })
-    
-    df = pd.DataFrame(rows)
-    df['order_date'] = pd.to_datetime(df['order_date'])
-    return df
\ No newline at end of file
+
+def generate_sample_data(n_records=1000, seed=42, **options) -> pd.DataFrame:
+    """Gera os dados de exemplo inteiros em memória (opções de iter_sample_chunks)"""
+    chunks = list(iter_sample_chunks(n_records, seed=seed, **options))
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
+
+def write_sample_data(path, n_records, seed=42, sep=',', decimal='.', encoding='utf-8', **options) -> int:
+    """
+    Grava os dados de exemplo chunk a chunk em CSV (sep/decimal/encoding configuráveis)
+    ou Parquet, conforme a extensão. Retorna o número de linhas gravadas.
+    """
+    path = Path(path)
+    chunks = iter_sample_chunks(n_records, seed=seed, **options)
+    written = 0
+
+    if path.suffix.lower() == '.parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                written += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+        return written
+
+    for chunk in chunks:
+        chunk.to_csv(
+            path, mode='w' if written == 0 else 'a', header=written == 0, index=False,
+            sep=sep, decimal=decimal, encoding=encoding, date_format='%Y-%m-%d'
+        )
+        written += len(chunk)
+    return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera um dataset sintético (CSV ou Parquet)")
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--customers', type=int, default=2000)
+    parser.add_argument('--start', default='2024-01-01')
+    parser.add_argument('--end', default='2024-10-31')
+    parser.add_argument('--seasonality', type=float, default=0.0)
+    parser.add_argument('--extra-categories', type=int, default=0)
+    parser.add_argument('--extra-cities', type=int, default=0)
+    parser.add_argument('--sep', default=',')
+    parser.add_argument('--decimal', default='.')
+    parser.add_argument('--encoding', default='utf-8')
+    args = parser.parse_args()
+
+    rows = write_sample_data(
+        args.path, args.rows, seed=args.seed, sep=args.sep, decimal=args.decimal,
+        encoding=args.encoding, n_customers=args.customers, start_date=args.start,
+        end_date=args.end, seasonality=args.seasonality,
+        extra_categories=args.extra_categories, extra_cities_per_state=args.extra_cities
+    )
+    print(f"{rows:,} linhas gravadas em {args.path}")